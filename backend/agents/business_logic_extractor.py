@@ -3,8 +3,9 @@ Agent 3: Business Logic Extractor
 Uses AI to reverse engineer code intent and add natural language descriptions
 """
 from typing import Dict, List, Optional, Tuple
-import httpx
+import asyncio
 from config.settings import settings
+from core.llm_client import post_json
 
 class BusinessLogicExtractor:
     def __init__(self):
@@ -23,29 +24,48 @@ class BusinessLogicExtractor:
         Returns:
             Annotated nodes with descriptions and confidence scores
         """
-        annotated_nodes = []
-        
-        for node in nodes:
-            # Check cache first
-            cache_key = f"{node['id']}_{node.get('name', '')}"
-            if cache_key in self.cache:
-                annotated_nodes.append(self.cache[cache_key])
-                continue
-            
-            # Extract description using AI
-            description, confidence = await self._get_ai_description(node, code_context)
-            
-            annotated_node = {
-                **node,
-                "description": description,
-                "confidence": confidence,
-                "business_logic": self._extract_business_keywords(description)
-            }
-            
-            annotated_nodes.append(annotated_node)
-            self.cache[cache_key] = annotated_node
-        
-        return annotated_nodes
+        # LLM_CONCURRENCY workers drain one shared iterator of nodes, so
+        # only that many annotations are in flight (or in memory) at once;
+        # results are read back in node order
+        keys = [self._cache_key(node) for node in nodes]
+        remaining = iter(nodes)
+        claimed = set()
+        
+        async def worker():
+            for node in remaining:
+                # Check cache first (and share one request among duplicates)
+                cache_key = self._cache_key(node)
+                if cache_key in self.cache or cache_key in claimed:
+                    continue
+                claimed.add(cache_key)
+                self.cache[cache_key] = await self._annotate(node, code_context)
+        
+        width = min(max(1, settings.LLM_CONCURRENCY), len(nodes))
+        workers = [asyncio.ensure_future(worker()) for _ in range(width)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        
+        return [self.cache[cache_key] for cache_key in keys]
+    
+    @staticmethod
+    def _cache_key(node: Dict) -> str:
+        return f"{node['id']}_{node.get('name', '')}"
+    
+    async def _annotate(self, node: Dict, code_context: Dict) -> Dict:
+        """Annotate one node"""
+        # Extract description using AI
+        description, confidence = await self._get_ai_description(node, code_context)
+        
+        return {
+            **node,
+            "description": description,
+            "confidence": confidence,
+            "business_logic": self._extract_business_keywords(description)
+        }
     
     async def _get_ai_description(self, node: Dict, context: Dict) -> Tuple[str, float]:
         """
@@ -90,24 +110,24 @@ Be specific and avoid generic descriptions.
             return "Unable to analyze: API key not configured"
         
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    f"https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent?key={self.api_key}",
-                    json={
-                        "contents": [{
-                            "parts": [{"text": prompt}]
-                        }],
-                        "generationConfig": {
-                            "temperature": settings.LLM_TEMPERATURE,
-                            "maxOutputTokens": settings.LLM_MAX_TOKENS
-                        }
-                    },
-                    timeout=30.0
-                )
-                if response.status_code == 200:
-                    data = response.json()
-                    if 'candidates' in data and len(data['candidates']) > 0:
-                        return data['candidates'][0]['content']['parts'][0]['text']
+            # Shared keep-alive client, paced and retried (see core.llm_client)
+            response = await post_json(
+                f"models/{self.model}:generateContent",
+                {
+                    "contents": [{
+                        "parts": [{"text": prompt}]
+                    }],
+                    "generationConfig": {
+                        "temperature": settings.LLM_TEMPERATURE,
+                        "maxOutputTokens": settings.LLM_MAX_TOKENS
+                    }
+                },
+                params={"key": self.api_key}
+            )
+            if response.status_code == 200:
+                data = response.json()
+                if 'candidates' in data and len(data['candidates']) > 0:
+                    return data['candidates'][0]['content']['parts'][0]['text']
         except Exception as e:
             pass
         
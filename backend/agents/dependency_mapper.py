@@ -2,13 +2,43 @@
 Agent 2: Dependency Mapper
 Builds dependency graphs and identifies issues (dead code, circular deps, hotspots)
 """
+import posixpath
 import networkx as nx
-from typing import Dict, List, Tuple
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Set, Tuple
 from collections import defaultdict
 
+from config.settings import settings
+from core.centrality import betweenness, pagerank
+from core.csr_graph import CSRGraph
+from core.cycles import cycle_report
+from core.graph_metrics import GraphMetrics
+from core.reachability import descendant_counts
+from core.risk import RISK_LEVELS, risk_ratings
+from core.rollup import LEVELS, GraphRollup
+from core.symbol_index import SymbolIndex
+from core.symbol_table import EdgeList, SymbolTable, SymbolView
+from core.token_index import TokenIndex
+
+# Node types treated as callables by the heuristics and dead-code check
+FUNCTION_TYPES = ('function', 'method')
+
+# Relationship types that are resolved into caller -> callee edges
+REFERENCE_TYPES = ('call', 'reference')
+
 class DependencyMapper:
     def __init__(self):
+        # Graph nodes are SymbolTable rows; attributes live in the table
         self.graph = nx.DiGraph()
+        self.metrics = GraphMetrics(self.graph)
+        self.symbols = SymbolTable()
+        self.index = SymbolIndex(self.symbols)
+        self.name_tokens = TokenIndex(settings.GRAPH_NAME_TOKEN_CAP)
+        # Whether edges are also guessed from line order, names and directories
+        self.heuristics = settings.GRAPH_HEURISTIC_EDGES
+        # Import map as RepoAnalyzer reports it, and call/reference sites by file
+        self.imports: Dict[str, List[str]] = {}
+        self.references: Dict[str, List[Dict]] = {}
     
     def build_graph(self, ast_data: Dict) -> Dict:
         """
@@ -20,87 +50,265 @@ class DependencyMapper:
         Returns:
             Graph with nodes, edges, and analysis results
         """
+        nodes = ast_data['nodes']
+        if not isinstance(nodes, SymbolTable):
+            nodes = SymbolTable.from_dicts(nodes)
+        self.begin(nodes)
+        self.add_rows(range(len(nodes)))
+        return self.finish(ast_data)
+    
+    def begin(self, symbols: SymbolTable):
+        """Start a new graph over a symbol table that may still be filling up"""
         self.graph.clear()
+        self.metrics = GraphMetrics(self.graph)
+        self.symbols = symbols
+        self.index = SymbolIndex(symbols)
+        self.name_tokens = TokenIndex(settings.GRAPH_NAME_TOKEN_CAP)
+        self.heuristics = settings.GRAPH_HEURISTIC_EDGES
+        self.references = {}
+    
+    def add_rows(self, rows: Iterable[int]):
+        """
+        Add a batch of symbol rows as they are parsed
         
+        Every symbol of a file arrives in the same batch, so the edges that
+        only depend on one file (the heuristic same-file chain) are added
+        here; cross-file edges wait for finish().
+        """
         # Add nodes
-        for node in ast_data['nodes']:
-            self.graph.add_node(
-                node['id'],
-                **{k: v for k, v in node.items() if k != 'id'}
-            )
-        
-        # Add edges based on imports and function calls
-        edges = []
-        imports = ast_data.get('imports', {})
-        
-        # Group nodes by file
+        rows = list(rows)
+        self._index_rows(rows)
+        self.graph.add_nodes_from(rows)
+        if not self.heuristics:
+            return
         nodes_by_file = defaultdict(list)
-        for node in ast_data['nodes']:
-            file_path = node.get('file', '')
-            nodes_by_file[file_path].append(node)
+        for row in rows:
+            nodes_by_file[self.symbols.file_ids[row]].append(self.symbols[row])
         
         # 1. Create edges between functions in the same file (create a chain)
-        for file_path, file_nodes in nodes_by_file.items():
+        for file_nodes in nodes_by_file.values():
             if len(file_nodes) < 2:
                 continue
             # Sort by line number
             sorted_nodes = sorted(file_nodes, key=lambda n: n.get('line_start', 0))
             # Connect each function to the next one (sequential flow)
             for i in range(len(sorted_nodes) - 1):
-                source_id = sorted_nodes[i]['id']
-                target_id = sorted_nodes[i + 1]['id']
-                if source_id in self.graph and target_id in self.graph:
-                    edges.append((source_id, target_id))
+                source_id = sorted_nodes[i].row
+                target_id = sorted_nodes[i + 1].row
+                self.graph.add_edge(source_id, target_id)
             # Also connect last to first to show they're related (optional, creates a cycle indicator)
             # Uncomment if you want circular connections within files
             # if len(sorted_nodes) > 2:
-            #     edges.append((sorted_nodes[-1]['id'], sorted_nodes[0]['id']))
+            #     self.graph.add_edge(sorted_nodes[-1].row, sorted_nodes[0].row)
+    
+    def finish(self, ast_data: Dict) -> Dict:
+        """Add cross-file edges once every batch is in, then analyze the graph"""
+        nodes = self.symbols
+        self.imports = dict(ast_data.get('imports', {}))
+        self._add_relationships(ast_data.get('relationships', []))
+        nodes_by_file = self._nodes_by_file()
+        
+        # Add edges based on imports and function calls
+        edges = []
+        edges += self._link_references(
+            rel for file_rels in self.references.values() for rel in file_rels
+        )
+        edges += self._link_imports(nodes_by_file, self.index.importing_files())
+        if self.heuristics:
+            edges += self._link_related_names(nodes.rows_of_type(*FUNCTION_TYPES))
+            edges += self._link_directories(nodes_by_file)
+        self._add_edges(edges)
+        self.metrics.rebuild()
         
-        # 2. Create edges based on function name patterns (smarter heuristic)
-        # Connect functions with related names (e.g., getProduct -> displayProduct -> deleteProduct)
-        for source_node in ast_data['nodes']:
-            if source_node.get('type') != 'function':
+        return self.graph_result()
+    
+    def apply_delta(self, stale_files: Iterable[str], ast_data: Dict) -> List[int]:
+        """
+        Update the graph in place after some files changed
+        
+        Every symbol of stale_files (added, modified and removed files) is
+        dropped, then the symbols in ast_data - RepoAnalyzer output for the
+        added and modified files only - are added back. Cross-file edges are
+        only recomputed for pairs that involve a new symbol or stale file;
+        everything else in the graph is left as it was, and the derived
+        metrics are updated from the edges that changed.
+        
+        Returns:
+            Rows of the symbols that were added
+        """
+        stale = set(stale_files)
+        removed_rows = self.symbols.remove_files(stale)
+        removed_edges = set(self.graph.in_edges(removed_rows)) | set(self.graph.out_edges(removed_rows))
+        self.graph.remove_nodes_from(removed_rows)
+        self.name_tokens.remove(removed_rows)
+        self.index.remove_files(stale)
+        for file_path in stale:
+            self.imports.pop(file_path, None)
+            self.references.pop(file_path, None)
+        self.imports.update(ast_data.get('imports', {}))
+        
+        nodes = ast_data['nodes']
+        if isinstance(nodes, SymbolTable):
+            nodes = nodes.to_dicts()
+        new_rows = list(dict.fromkeys(self.symbols.add_dict(node) for node in nodes))
+        self.add_rows(new_rows)
+        self._add_relationships(ast_data.get('relationships', []))
+        
+        # Only the stale files, the files that may import a new symbol and,
+        # with heuristic edges, the stale files' directory neighbors get new edges
+        new_names = {self.symbols.name(row) for row in new_rows}
+        importers = [f for f in self.index.files_importing(new_names) if f not in stale]
+        touched = stale.union(importers)
+        if self.heuristics:
+            stale_dirs = {posixpath.dirname(f) for f in stale}
+            touched.update(f for f in self.symbols.live_files() if posixpath.dirname(f) in stale_dirs)
+        nodes_by_file = self._nodes_by_file(touched)
+        
+        # Re-resolve the changed files' references, and those elsewhere whose
+        # last name segment matches a new symbol (the rest cannot have changed)
+        references = [rel for f in stale for rel in self.references.get(f, [])]
+        references += [
+            rel
+            for file_path, file_rels in self.references.items() if file_path not in stale
+            for rel in file_rels if rel['target'].rsplit('.', 1)[-1] in new_names
+        ]
+        
+        edges = []
+        edges += self._link_references(references)
+        edges += self._link_imports(nodes_by_file, sorted(stale))
+        edges += self._link_imports(nodes_by_file, importers, set(new_rows))
+        if self.heuristics:
+            edges += self._link_related_names(new_rows)
+            edges += self._link_related_names(new_rows, incoming=True)
+            edges += self._link_directories(nodes_by_file, stale)
+        added_edges = set(self._add_edges(edges))
+        # Every edge of a new row is new (rows are never reused)
+        added_edges.update(self.graph.in_edges(new_rows))
+        added_edges.update(self.graph.out_edges(new_rows))
+        self.metrics.update(removed_rows, removed_edges, new_rows, added_edges)
+        
+        return new_rows
+    
+    def graph_result(self) -> Dict:
+        """
+        Analyze the current graph and package it the way build_graph returns it
+        
+        "rollup" is the directory-level overview; finer levels are served
+        on demand (see core.rollup). "graph" is the CSRGraph the analysis
+        ran on, reachability index included, for the binary graph store;
+        it is not part of the JSON result.
+        """
+        csr = CSRGraph.from_networkx(self.graph, len(self.symbols))
+        analysis = self._analyze_graph(csr)
+        
+        return {
+            "nodes": self.symbols,
+            "edges": EdgeList.from_pairs(self.symbols, self.graph.edges()),
+            "analysis": analysis,
+            "rollup": GraphRollup(self.symbols, *csr.edge_arrays()).level(LEVELS[0]),
+            "graph": csr
+        }
+    
+    def _nodes_by_file(self, files: Optional[Set[str]] = None) -> Dict[str, List[SymbolView]]:
+        """
+        Group nodes by file (sorted, so edges don't depend on batch arrival order)
+        With files, only the nodes of those files
+        """
+        rows = self.symbols.live_rows() if files is None else self.symbols.rows_of_files(files)
+        nodes_by_file = defaultdict(list)
+        for row in rows:
+            nodes_by_file[self.symbols.file(row)].append(self.symbols[row])
+        return dict(sorted(nodes_by_file.items()))
+    
+    def _index_rows(self, rows: List[int]):
+        """Add rows to the symbol index, and the name token index for heuristic edges"""
+        self.index.add_rows(rows)
+        if not self.heuristics:
+            return
+        for row in rows:
+            if self.symbols.type(row) in FUNCTION_TYPES:
+                self.name_tokens.add(row, self.symbols.name(row))
+    
+    def _add_relationships(self, relationships: Iterable[Dict]):
+        """Index import bindings and keep call/reference sites by file"""
+        relationships = list(relationships)
+        self.index.add_relationships(relationships)
+        for rel in relationships:
+            if rel.get('type') in REFERENCE_TYPES and rel.get('source'):
+                self.references.setdefault(rel['file'], []).append(rel)
+    
+    def _link_references(self, relationships: Iterable[Dict]) -> List[Tuple[int, int]]:
+        """
+        0. Real caller -> callee edges
+        Resolve each call site or attribute reference through the symbol index
+        """
+        edges = []
+        for rel in relationships:
+            caller = self.symbols.row_of(f"{rel['file']}::{rel['source']}")
+            if caller is None:
                 continue
-                
-            source_name = source_node.get('name', '').lower()
-            source_file = source_node.get('file', '')
-            
-            # Extract base name (e.g., "getProduct" -> "product")
-            base_words = [w for w in source_name.replace('get', '').replace('set', '').replace('delete', '').replace('update', '').replace('display', '').replace('show', '').replace('save', '').replace('load', '').split() if len(w) > 2]
-            
-            for target_node in ast_data['nodes']:
-                if target_node.get('type') != 'function':
-                    continue
-                    
-                # Skip self or same file (already connected by sequential order)
-                if source_node['id'] == target_node['id'] or source_node.get('file') == target_node.get('file'):
+            callee = self.index.resolve(rel['file'], rel['target'], caller)
+            if callee is not None and callee != caller:
+                edges.append((caller, callee))
+        return edges
+    
+    def _link_related_names(self, rows: Iterable[int], incoming: bool = False) -> List[Tuple[int, int]]:
+        """
+        2. Create edges based on function name patterns (smarter heuristic)
+        Connect functions with related names (e.g., getProduct -> displayProduct -> deleteProduct):
+        each function points at the functions in other files whose names contain
+        all of its words, looked up in the name token index. With incoming, the
+        edges pointing at rows are found instead.
+        """
+        edges = []
+        file_ids = self.symbols.file_ids
+        for row in rows:
+            if incoming:
+                pairs = [(other, row) for other in self.name_tokens.related_from(row)]
+            else:
+                pairs = [(row, other) for other in self.name_tokens.related_to(row)]
+            for source, target in pairs:
+                # Skip same file (already connected by sequential order)
+                if file_ids[source] != file_ids[target]:
+                    edges.append((source, target))
+        return edges
+    
+    def _link_imports(
+        self,
+        nodes_by_file: Dict[str, List[SymbolView]],
+        files: Iterable[str],
+        targets: Optional[Set[int]] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        3. Map imports to nodes
+        Each import of files resolves through the module resolver and export
+        tables to the symbols it actually brings in. With targets, only edges
+        into those rows are kept.
+        """
+        edges = []
+        for file_path in files:
+            sources = nodes_by_file.get(file_path, [])
+            if not sources:
+                continue
+            for node_id in self.index.imported_rows(file_path):
+                if targets is not None and node_id not in targets:
                     continue
-                
-                target_name = target_node.get('name', '').lower()
-                
-                # Connect if they share a common base word (e.g., both have "product")
-                for base_word in base_words:
-                    if base_word in target_name and len(base_word) > 3:
-                        if source_node['id'] in self.graph and target_node['id'] in self.graph:
-                            edges.append((source_node['id'], target_node['id']))
-                        break
-        
-        # 3. Map imports to nodes (original logic, improved)
-        for file_path, import_list in imports.items():
-            for imp in import_list:
-                # Find nodes that match this import
-                for node in ast_data['nodes']:
-                    node_id = node['id']
-                    # Match by import name in node name or file
-                    if (imp.lower() in node.get('name', '').lower() or 
-                        imp.lower() in node.get('file', '').lower() or
-                        node.get('file', '') == imp):
-                        # Connect all nodes in the importing file to the imported node
-                        for source_node in nodes_by_file.get(file_path, []):
-                            if source_node['id'] in self.graph and node_id in self.graph:
-                                edges.append((source_node['id'], node_id))
-        
-        # 4. Create edges based on file structure (files in same directory)
+                # Connect all nodes in the importing file to the imported node
+                for source_node in sources:
+                    if source_node.row != node_id:
+                        edges.append((source_node.row, node_id))
+        return edges
+    
+    def _link_directories(
+        self,
+        nodes_by_file: Dict[str, List[SymbolView]],
+        only_files: Optional[Set[str]] = None
+    ) -> List[Tuple[int, int]]:
+        """
+        4. Create edges based on file structure (files in same directory)
+        With only_files, just the pairs that involve one of those files
+        """
+        edges = []
         files_by_dir = defaultdict(list)
         for file_path in nodes_by_file.keys():
             dir_path = '/'.join(file_path.split('/')[:-1]) if '/' in file_path else ''
@@ -111,82 +319,162 @@ class DependencyMapper:
             if len(related_files) > 1:
                 for i, file1 in enumerate(related_files):
                     for file2 in related_files[i+1:]:
+                        if only_files is not None and file1 not in only_files and file2 not in only_files:
+                            continue
                         nodes1 = nodes_by_file[file1]
                         nodes2 = nodes_by_file[file2]
                         # Connect first node of each file
                         if nodes1 and nodes2:
-                            id1 = nodes1[0]['id']
-                            id2 = nodes2[0]['id']
+                            id1 = nodes1[0].row
+                            id2 = nodes2[0].row
                             if id1 in self.graph and id2 in self.graph:
                                 edges.append((id1, id2))
-        
-        # Add edges to graph (avoid duplicates)
-        added_edges = set()
+        return edges
+    
+    def _add_edges(self, edges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Add edges to graph (avoid duplicates) and return the ones it did not have"""
+        new_edges = []
         for source, target in edges:
-            edge_key = (source, target)
-            if edge_key not in added_edges and source in self.graph and target in self.graph:
+            if source in self.graph and target in self.graph and not self.graph.has_edge(source, target):
                 self.graph.add_edge(source, target)
-                added_edges.add(edge_key)
+                new_edges.append((source, target))
+        return new_edges
+    
+    def load_graph(self, graph_data: Dict, ast_data: Optional[Dict] = None):
+        """
+        Rebuild the graph from a stored dependency_mapper result
         
-        # Analyze graph
-        analysis = self._analyze_graph()
+        ast_data (the stored repo_analyzer result, for its imports and
+        relationships) is only needed when the graph will be updated with
+        apply_delta afterwards.
+        """
+        self.begin(SymbolTable.from_dicts(graph_data.get("nodes", [])))
+        self._index_rows(list(range(len(self.symbols))))
+        ast_data = ast_data or {}
+        self.imports = dict(ast_data.get("imports", {}))
+        self._add_relationships(ast_data.get("relationships", []))
+        self.graph.add_nodes_from(range(len(self.symbols)))
+        for edge in graph_data.get("edges", []):
+            source = self.symbols.row_of(edge["source"])
+            target = self.symbols.row_of(edge["target"])
+            if source is not None and target is not None:
+                self.graph.add_edge(source, target)
+        self.metrics.rebuild()
+    
+    def load_csr(self, graph_data: Dict) -> CSRGraph:
+        """
+        Read-only graph from a stored dependency_mapper result
         
-        return {
-            "nodes": [
-                {
-                    "id": node_id,
-                    **self.graph.nodes[node_id]
-                }
-                for node_id in self.graph.nodes()
-            ],
-            "edges": [
-                {
-                    "source": source,
-                    "target": target,
-                    "weight": self.graph[source][target].get('weight', 1)
-                }
-                for source, target in self.graph.edges()
-            ],
-            "analysis": analysis
+        Skips the name indexes and the mutable nx graph that load_graph
+        builds, for callers that only traverse (impact analysis).
+        """
+        self.symbols = SymbolTable.from_dicts(graph_data.get("nodes", []))
+        sources, targets = [], []
+        for edge in graph_data.get("edges", []):
+            source = self.symbols.row_of(edge["source"])
+            target = self.symbols.row_of(edge["target"])
+            if source is not None and target is not None:
+                sources.append(source)
+                targets.append(target)
+        num_nodes = len(self.symbols)
+        return CSRGraph(num_nodes, sources, targets, np.ones(num_nodes, dtype=bool))
+    
+    def _score_nodes(self, csr: CSRGraph) -> Dict[str, np.ndarray]:
+        """
+        Fan-in, fan-out, PageRank, betweenness, affected count and risk
+        rating of every node, computed in bulk and stored as symbol table
+        columns so they travel with the nodes in the result
+        """
+        samples = settings.GRAPH_BETWEENNESS_SAMPLES or None
+        affected, approximate = descendant_counts(csr)
+        is_class = np.zeros(csr.num_nodes, dtype=bool)
+        class_type = self.symbols.types.index.get('class')
+        if class_type is not None:
+            is_class[:len(self.symbols)] = np.asarray(self.symbols.type_ids) == class_type
+        scores = {
+            "fan_in": csr.in_degrees(),
+            "fan_out": csr.out_degrees(),
+            "pagerank": pagerank(csr),
+            "betweenness": betweenness(csr, samples),
+            "affected_count": affected,
+            "risk": risk_ratings(affected, csr.in_degrees(), csr.out_degrees(), is_class)
         }
+        present = csr.present.tolist()
+        for key, values in scores.items():
+            self.symbols.set_column(key, [
+                value if is_node else None for value, is_node in zip(values.tolist(), present)
+            ])
+        scores["approximate"] = approximate
+        return scores
     
-    def _analyze_graph(self) -> Dict:
+    def _analyze_graph(self, csr: CSRGraph) -> Dict:
         """Analyze graph for issues"""
         analysis = {
             "dead_functions": [],
             "circular_dependencies": [],
+            "cycle_components": [],
+            "cycle_summary": {},
             "high_coupling": [],
-            "hotspots": []
+            "hotspots": [],
+            "central_nodes": [],
+            "brokers": [],
+            "risk_summary": {}
         }
         
+        scores = self._score_nodes(csr)
+        
         # Find dead functions (no incoming edges)
-        for node_id in self.graph.nodes():
-            if self.graph.in_degree(node_id) == 0 and self.graph.out_degree(node_id) == 0:
-                node_data = self.graph.nodes[node_id]
-                if node_data.get('type') == 'function':
-                    analysis["dead_functions"].append(node_id)
-        
-        # Find circular dependencies
-        try:
-            cycles = list(nx.simple_cycles(self.graph))
-            analysis["circular_dependencies"] = cycles[:10]  # Limit to first 10
-        except:
-            pass
-        
-        # Find high coupling (many connections)
-        coupling_scores = {}
-        for node_id in self.graph.nodes():
-            coupling = self.graph.degree(node_id)
-            coupling_scores[node_id] = coupling
-        
-        # Top 10 high coupling nodes
-        high_coupling = sorted(coupling_scores.items(), key=lambda x: x[1], reverse=True)[:10]
-        analysis["high_coupling"] = [node_id for node_id, _ in high_coupling]
+        for node_id in self.metrics.isolated():
+            if self.symbols.type(node_id) in FUNCTION_TYPES:
+                analysis["dead_functions"].append(self.symbols.id(node_id))
+        
+        # Find circular dependencies: strongly connected components are
+        # found in linear time, then a few short cycles are listed for each
+        report = cycle_report(
+            self.graph,
+            settings.GRAPH_CYCLES_PER_SCC,
+            settings.GRAPH_CYCLE_TIME_BUDGET_MS / 1000,
+            self.metrics.components(),
+            self.metrics.cycle_cache
+        )
+        components = []
+        for component in report["components"]:
+            components.append({
+                "size": len(component["members"]),
+                "members": [self.symbols.id(node_id) for node_id in component["members"]],
+                "cycles": [
+                    [self.symbols.id(node_id) for node_id in cycle]
+                    for cycle in component["cycles"]
+                ]
+            })
+        analysis["circular_dependencies"] = [
+            cycle for component in components for cycle in component["cycles"]
+        ][:10]  # Limit to first 10
+        analysis["cycle_components"] = components
+        analysis["cycle_summary"] = {
+            "component_count": len(components),
+            "nodes_in_cycles": sum(component["size"] for component in components),
+            "largest_component": components[0]["size"] if components else 0,
+            "truncated": report["truncated"]
+        }
+        
+        # Find high coupling (many connections): top 10, ties in node order
+        analysis["high_coupling"] = [self.symbols.id(node_id) for node_id in self.metrics.degree.top(10)]
         
         # Find hotspots (many incoming calls)
-        in_degrees = dict(self.graph.in_degree())
-        hotspots = sorted(in_degrees.items(), key=lambda x: x[1], reverse=True)[:10]
-        analysis["hotspots"] = [node_id for node_id, _ in hotspots]
+        analysis["hotspots"] = [self.symbols.id(node_id) for node_id in self.metrics.in_degree.top(10)]
+        
+        # Centrality ranking: top 10 by PageRank, and by betweenness (nodes
+        # that many shortest dependency paths pass through)
+        nodes = csr.node_array()
+        for key, score in (("central_nodes", "pagerank"), ("brokers", "betweenness")):
+            ranked = nodes[np.argsort(-scores[score][nodes], kind='stable')[:10]]
+            analysis[key] = [self.symbols.id(node_id) for node_id in ranked.tolist()]
+        
+        # Risk heatmap totals; per-node ratings are in each node's "risk"
+        risk = scores["risk"][nodes]
+        analysis["risk_summary"] = {level: int((risk == level).sum()) for level in RISK_LEVELS}
+        analysis["risk_summary"]["approximate"] = scores["approximate"]
         
         return analysis
 
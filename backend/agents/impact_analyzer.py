@@ -2,104 +2,248 @@
 Agent 4: Impact Analyzer
 Analyzes what breaks if a component is deleted or modified
 """
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Sized, Tuple, Union
 import networkx as nx
+import numpy as np
+
+from config.settings import settings
+from core.csr_graph import CSRGraph, expand, sorted_unique
+from core.reachability import batch_descendants
+from core.risk import risk_rating
+from core.rollup import aggregate_path, weighted_pairs
+from core.symbol_table import SymbolTable
 
 class ImpactAnalyzer:
-    def __init__(self, graph: nx.DiGraph):
+    def __init__(self, graph: Union[CSRGraph, nx.DiGraph], symbols: SymbolTable):
+        # Graph nodes are rows of the symbol table; traversals run on CSR arrays
+        if not isinstance(graph, CSRGraph):
+            graph = CSRGraph.from_networkx(graph, len(symbols))
         self.graph = graph
+        self.symbols = symbols
     
-    def analyze_impact(self, target_node_id: str, action: str = "delete") -> Dict:
+    def analyze_impact(
+        self,
+        target_node_id: str,
+        action: str = "delete",
+        max_depth: Optional[int] = None,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        count_only: bool = False
+    ) -> Dict:
         """
         Analyze impact of deleting or modifying a node
         
+        Affected nodes are ordered by distance from the target (ties by
+        node order) and returned a page at a time, so the nearest ones can
+        be shown however large the whole set is. The report and the
+        visualization come with the first page only.
+        
         Args:
             target_node_id: ID of the node to analyze
             action: "delete" or "modify"
+            max_depth: Only follow dependencies this many hops out (None = all)
+            cursor: next_cursor of the previous page
+            limit: Page size (default IMPACT_PAGE_SIZE)
+            count_only: Only return the counts and risk rating
         
         Returns:
             Impact analysis report
+        
+        Raises:
+            ValueError: If the cursor is not an affected node of this target
         """
-        if target_node_id not in self.graph:
+        target = self.symbols.row_of(target_node_id)
+        if target is None or target not in self.graph:
             return {
                 "error": f"Node {target_node_id} not found in graph",
                 "risk": "UNKNOWN"
             }
         
-        # Find all affected nodes
-        affected_nodes = self._find_affected_nodes(target_node_id)
+        # Find all affected nodes, nearest first
+        affected_nodes, distances = self._find_affected_nodes(target, max_depth)
+        impact = self._summarize(target, target_node_id, action, max_depth, affected_nodes, distances)
+        if count_only:
+            return impact
+        
+        start = self._page_start(cursor, affected_nodes)
+        end = start + (limit or settings.IMPACT_PAGE_SIZE)
+        page = affected_nodes[start:end].tolist()
+        impact.update({
+            "affected_nodes": [self.symbols.id(node) for node in page],
+            "affected_distances": distances[start:end].tolist(),
+            "next_cursor": self.symbols.id(page[-1]) if end < len(affected_nodes) else None,
+            "sole_dependents": [self.symbols.id(node) for node in self._find_sole_dependents(target)]
+        })
+        if cursor is None:
+            impact["report"] = self._generate_report(target, affected_nodes, impact["risk_rating"], action, max_depth)
+            impact["visualization"] = self._generate_visualization_data(target, affected_nodes, distances)
+        return impact
+    
+    def stream_impact(self, target_node_id: str, action: str = "delete", max_depth: Optional[int] = None) -> Iterator[Dict]:
+        """
+        Impact as a sequence of records for NDJSON streaming: the summary
+        returned by analyze_impact(count_only=True), then one
+        {"id", "distance"} record per affected node, nearest first
+        """
+        target = self.symbols.row_of(target_node_id)
+        if target is None or target not in self.graph:
+            yield {
+                "error": f"Node {target_node_id} not found in graph",
+                "risk": "UNKNOWN"
+            }
+            return
+        
+        affected_nodes, distances = self._find_affected_nodes(target, max_depth)
+        yield self._summarize(target, target_node_id, action, max_depth, affected_nodes, distances)
+        for node, distance in zip(affected_nodes.tolist(), distances.tolist()):
+            yield {"id": self.symbols.id(node), "distance": distance}
+    
+    def analyze_batch(self, target_node_ids: List[str]) -> Dict:
+        """
+        Impact of many targets at once
+        
+        Affected sets for all targets come out of one pass over the
+        condensed graph (see core.reachability) rather than one traversal
+        each.
+        
+        Returns:
+            {"targets": {id: {"affected_nodes", "affected_count", "risk_rating"}},
+             "union": {"affected_nodes", "affected_count"},  # targets excluded
+             "missing": [ids not in the graph]}
+        """
+        targets, missing = [], []
+        for target_node_id in dict.fromkeys(target_node_ids):
+            target = self.symbols.row_of(target_node_id)
+            if target is None or target not in self.graph:
+                missing.append(target_node_id)
+            else:
+                targets.append(target)
+        
+        results = {}
+        for target, affected in zip(targets, batch_descendants(self.graph, targets)):
+            affected = affected.tolist()
+            results[self.symbols.id(target)] = {
+                "affected_nodes": [self.symbols.id(node) for node in affected],
+                "affected_count": len(affected),
+                "risk_rating": self._calculate_risk(target, affected)
+            }
+        union = sorted(self.affected_by(targets))
+        return {
+            "targets": results,
+            "union": {
+                "affected_nodes": [self.symbols.id(node) for node in union],
+                "affected_count": len(union)
+            },
+            "missing": missing
+        }
+    
+    def analyze_reachability(self, pairs: List[Tuple[str, str]], node_ids: List[str]) -> Dict:
+        """
+        Whether changing each pair's source can affect its target, and the
+        affected count of each node, from the graph's reachability index
+        (core.reachability) instead of traversals
+        
+        Returns:
+            {"pairs": [{"source", "target", "affects"}],
+             "affected_counts": {id: count},
+             "missing": [ids not in the graph]}
+        """
+        missing = {}
+        
+        def row(node_id: str):
+            node = self.symbols.row_of(node_id)
+            if node is None or node not in self.graph:
+                missing[node_id] = None
+                return None
+            return node
         
-        # Calculate risk rating
-        risk = self._calculate_risk(target_node_id, affected_nodes)
+        index = self.graph.reachability
+        known = []
+        for source_id, target_id in pairs:
+            source, target = row(source_id), row(target_id)
+            if source is not None and target is not None:
+                known.append((source_id, target_id, source, target))
+        affects = index.reaches_many([pair[2] for pair in known], [pair[3] for pair in known])
         
-        # Generate report
-        report = self._generate_report(target_node_id, affected_nodes, risk, action)
+        counts = {}
+        for node_id in node_ids:
+            node = row(node_id)
+            if node is not None:
+                counts[node_id] = index.affected_count(node)
         
         return {
-            "target_node": target_node_id,
+            "pairs": [
+                {"source": source_id, "target": target_id, "affects": bool(result)}
+                for (source_id, target_id, _, _), result in zip(known, affects.tolist())
+            ],
+            "affected_counts": counts,
+            "missing": list(missing)
+        }
+    
+    def affected_by(self, targets: Iterable[int]) -> Set[int]:
+        """Nodes affected by changing any of the target rows, targets themselves excluded"""
+        targets = [target for target in set(targets) if target in self.graph]
+        if not targets:
+            return set()
+        # One traversal from all targets together
+        affected = set(np.flatnonzero(self.graph.reachable(targets)).tolist())
+        return affected - set(targets)
+    
+    def _find_affected_nodes(self, target_node_id: int, max_depth: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Nodes that would be affected by deleting target_node, within
+        max_depth hops, ordered by distance (ties by node), and their distances
+        """
+        # Forward traversal: nodes that depend on target, directly or not
+        distances = self.graph.bfs_distances([target_node_id], max_depth=max_depth)
+        nodes = np.flatnonzero(distances > 0)
+        nodes = nodes[np.argsort(distances[nodes], kind='stable')]
+        return nodes, distances[nodes]
+    
+    def _summarize(self, target_node_id: int, target_id: str, action: str, max_depth: Optional[int],
+                   affected_nodes: np.ndarray, distances: np.ndarray) -> Dict:
+        """Counts and risk rating of an impact, without the affected nodes themselves"""
+        return {
+            "target_node": target_id,
             "action": action,
-            "affected_nodes": list(affected_nodes),
+            "max_depth": max_depth,
             "affected_count": len(affected_nodes),
-            "risk_rating": risk,
-            "report": report,
-            "visualization": self._generate_visualization_data(target_node_id, affected_nodes)
+            # Affected nodes 1, 2, ... hops away
+            "depth_counts": np.bincount(distances)[1:].tolist(),
+            "risk_rating": self._calculate_risk(target_node_id, affected_nodes)
         }
     
-    def _find_affected_nodes(self, target_node_id: str) -> Set[str]:
-        """Find all nodes that would be affected by deleting target_node"""
-        affected = set()
-        
-        # Forward traversal: nodes that depend on target
-        if self.graph.has_node(target_node_id):
-            # Find all descendants (nodes reachable from target)
-            descendants = set(nx.descendants(self.graph, target_node_id))
-            affected.update(descendants)
-            
-            # Find all ancestors (nodes that target depends on)
-            ancestors = set(nx.ancestors(self.graph, target_node_id))
-            
-            # Nodes that would break if target is deleted
-            # (nodes that have target as their only dependency)
-            for node in self.graph.nodes():
-                if node == target_node_id:
-                    continue
-                predecessors = list(self.graph.predecessors(node))
-                if target_node_id in predecessors and len(predecessors) == 1:
-                    affected.add(node)
-        
-        return affected
+    def _page_start(self, cursor: Optional[str], affected_nodes: np.ndarray) -> int:
+        """Position after the cursor node in the affected order"""
+        if cursor is None:
+            return 0
+        row = self.symbols.row_of(cursor)
+        position = np.flatnonzero(affected_nodes == row) if row is not None else ()
+        if not len(position):
+            raise ValueError(f"Invalid cursor {cursor}: not an affected node of this target")
+        return int(position[0]) + 1
+    
+    def _find_sole_dependents(self, target_node_id: int) -> List[int]:
+        """Nodes that depend on nothing but the target, so break outright without it"""
+        return [node for node in self.graph.sole_successors(target_node_id).tolist() if node != target_node_id]
     
-    def _calculate_risk(self, target_node_id: str, affected_nodes: Set[str]) -> str:
+    def _calculate_risk(self, target_node_id: int, affected_nodes: Sized) -> str:
         """Calculate risk rating: HIGH, MEDIUM, or LOW"""
         if not self.graph.has_node(target_node_id):
             return "UNKNOWN"
         
-        node_data = self.graph.nodes[target_node_id]
-        in_degree = self.graph.in_degree(target_node_id)
-        out_degree = self.graph.out_degree(target_node_id)
-        
-        # High risk factors
-        if len(affected_nodes) > 20:
-            return "HIGH"
-        if in_degree > 10:  # Many things depend on this
-            return "HIGH"
-        if node_data.get('type') == 'class' and out_degree > 5:
-            return "HIGH"
-        
-        # Medium risk factors
-        if len(affected_nodes) > 5:
-            return "MEDIUM"
-        if in_degree > 3:
-            return "MEDIUM"
-        
-        # Low risk
-        return "LOW"
+        return risk_rating(
+            len(affected_nodes),
+            self.graph.in_degree(target_node_id),
+            self.graph.out_degree(target_node_id),
+            self.symbols.type(target_node_id)
+        )
     
-    def _generate_report(self, target_node_id: str, affected_nodes: Set[str], risk: str, action: str) -> str:
+    def _generate_report(self, target_node_id: int, affected_nodes: np.ndarray, risk: str, action: str,
+                         max_depth: Optional[int] = None) -> str:
         """Generate markdown report"""
-        node_data = self.graph.nodes[target_node_id]
-        node_name = node_data.get('name', target_node_id)
-        node_type = node_data.get('type', 'element')
+        node_name = self.symbols.name(target_node_id)
+        node_type = self.symbols.type(target_node_id) or 'element'
         
         report = f"""# Impact Analysis Report
 
@@ -109,15 +253,15 @@ class ImpactAnalyzer:
 **Risk Rating**: **{risk}**
 
 ### Summary
-{action.capitalize()}ing this {node_type} will affect **{len(affected_nodes)}** other components.
+{action.capitalize()}ing this {node_type} will affect **{len(affected_nodes)}** other components{f" within {max_depth} hops" if max_depth is not None else ""}.
 
-### Affected Components
+### Affected Components (nearest first)
 """
         
-        if affected_nodes:
-            for i, node_id in enumerate(list(affected_nodes)[:20], 1):  # Limit to 20
+        if len(affected_nodes):
+            for i, node_id in enumerate(affected_nodes[:20].tolist(), 1):  # Limit to 20
                 if self.graph.has_node(node_id):
-                    affected_data = self.graph.nodes[node_id]
+                    affected_data = self.symbols[node_id]
                     report += f"{i}. `{affected_data.get('name', node_id)}` ({affected_data.get('type', 'unknown')}) in `{affected_data.get('file', 'unknown')}`\n"
             
             if len(affected_nodes) > 20:
@@ -139,28 +283,96 @@ class ImpactAnalyzer:
         
         return report
     
-    def _generate_visualization_data(self, target_node_id: str, affected_nodes: Set[str]) -> Dict:
-        """Generate data for visualization"""
-        # Get subgraph of affected nodes
-        nodes_to_include = {target_node_id} | affected_nodes
+    def _generate_visualization_data(self, target_node_id: int, affected_nodes: np.ndarray, distances: np.ndarray) -> Dict:
+        """
+        Generate data for visualization
+        
+        At most IMPACT_VISUALIZATION_MAX_NODES nodes: when the target and
+        its affected nodes don't fit, the nearest half stay symbols and
+        the rest are collapsed into file, package or directory nodes
+        (whichever level fits; ids as in the rollup, so they can be
+        expanded), with edges weighted by the symbol edges they stand for.
+        """
+        max_nodes = max(settings.IMPACT_VISUALIZATION_MAX_NODES, 2)
+        rows = np.concatenate(([target_node_id], affected_nodes)).astype(np.int64)
+        row_distances = np.concatenate(([0], distances)).astype(np.int64)
+        detailed = len(rows) if len(rows) <= max_nodes else max_nodes // 2
+        
+        # Node codes: detailed rows first, then one per aggregate (-1 = hidden)
+        codes = np.arange(len(rows), dtype=np.int64)
+        level, paths = 'symbol', []
+        collapsed = rows[detailed:]
+        if len(collapsed):
+            file_ids = np.asarray(self.symbols.file_ids, dtype=np.int64)[collapsed]
+            files = sorted_unique(file_ids)
+            budget = max_nodes - detailed
+            for level in ('file', 'package', 'directory'):
+                if level == 'file' and len(files) > budget:
+                    continue
+                # Stop early once a level has more aggregates than fit
+                groups: Dict[str, int] = {}
+                per_file = np.empty(len(files), dtype=np.int64)
+                for index, file_id in enumerate(files.tolist()):
+                    per_file[index] = groups.setdefault(
+                        aggregate_path(level, self.symbols.files.values[file_id]), len(groups)
+                    )
+                    if len(groups) > budget and level != 'directory':
+                        break
+                else:
+                    break
+            group_of = per_file[np.searchsorted(files, file_ids)]
+            # Largest aggregates first; any beyond the budget are left out
+            sizes = np.bincount(group_of, minlength=len(groups))
+            ranked = np.argsort(-sizes, kind='stable')[:budget]
+            slot = np.full(len(groups), -1, dtype=np.int64)
+            slot[ranked] = detailed + np.arange(len(ranked))
+            codes[detailed:] = slot[group_of]
+            paths = list(groups)
+            groups_shown = ranked.tolist()
+        
+        code_of = np.full(self.graph.num_nodes, -1, dtype=np.int64)
+        code_of[rows] = codes
+        sources, targets = expand(self.graph.fwd_offsets, self.graph.fwd_targets, rows)
+        sources, targets = code_of[sources], code_of[targets]
+        keep = (sources >= 0) & (targets >= 0) & (sources != targets)
+        sources, targets, weights = weighted_pairs(sources[keep], targets[keep])
         
-        subgraph = self.graph.subgraph(nodes_to_include)
+        nodes = [
+            {
+                "id": self.symbols.id(row),
+                "name": self.symbols.name(row),
+                "type": self.symbols.type(row),
+                "file": self.symbols.file(row),
+                "level": "symbol",
+                "distance": distance,
+                "is_target": row == target_node_id
+            }
+            for row, distance in zip(rows[:detailed].tolist(), row_distances[:detailed].tolist())
+        ]
+        ids = [node["id"] for node in nodes]
+        if len(collapsed):
+            shown = codes[detailed:] >= 0
+            aggregate_codes = codes[detailed:][shown] - detailed
+            counts = np.bincount(aggregate_codes, minlength=len(groups_shown))
+            nearest = np.full(len(groups_shown), np.iinfo(np.int64).max, dtype=np.int64)
+            np.minimum.at(nearest, aggregate_codes, row_distances[detailed:][shown])
+            for index, group in enumerate(groups_shown):
+                ids.append(f"{level}:{paths[group]}")
+                nodes.append({
+                    "id": ids[-1],
+                    "name": paths[group],
+                    "level": level,
+                    "symbol_count": int(counts[index]),
+                    "distance": int(nearest[index])
+                })
         
         return {
-            "nodes": [
-                {
-                    "id": node_id,
-                    "is_target": node_id == target_node_id,
-                    **self.graph.nodes[node_id]
-                }
-                for node_id in subgraph.nodes()
-            ],
+            "level": level,
+            "nodes": nodes,
             "edges": [
-                {
-                    "source": source,
-                    "target": target
-                }
-                for source, target in subgraph.edges()
-            ]
+                {"source": ids[source], "target": ids[target], "weight": weight}
+                for source, target, weight in zip(sources.tolist(), targets.tolist(), weights.tolist())
+            ],
+            # Affected symbols in neither a symbol nor an aggregate node
+            "hidden_count": int((codes < 0).sum())
         }
-
@@ -2,7 +2,7 @@
 Agent 5: Orchestrator
 Manages state between agents, handles errors, caches results, streams progress
 """
-from typing import Dict, Optional, AsyncGenerator
+from typing import Dict, List, Optional, AsyncGenerator, Tuple
 import asyncio
 
 from agents.repo_analyzer import RepoAnalyzer
@@ -47,14 +47,25 @@ class Orchestrator:
         state.repo_url = repo_url
         
         try:
-            # Agent 1: Repo Analyzer
+            # Agent 1: Repo Analyzer, streamed into Agent 2 batch by batch
             await self._send_progress("Repo Analyzer", 0.1, "Cloning repository and extracting AST...")
-            state.ast_data = await self.repo_analyzer.analyze_repo(repo_url)
+            mapper_started = False
+            async for event in self.repo_analyzer.stream_repo(repo_url):
+                if event["type"] == "complete":
+                    state.ast_data = event["data"]
+                    continue
+                if not mapper_started:
+                    self.dependency_mapper.begin(event["nodes"])
+                    mapper_started = True
+                self.dependency_mapper.add_rows(event["rows"])
+                await self._send_batch(event)
             yield {"agent": "repo_analyzer", "status": "completed", "data": state.ast_data}
             
             # Agent 2: Dependency Mapper
             await self._send_progress("Dependency Mapper", 0.3, "Building dependency graph...")
-            state.graph_data = self.dependency_mapper.build_graph(state.ast_data)
+            if not mapper_started:
+                self.dependency_mapper.begin(state.ast_data["nodes"])
+            state.graph_data = self.dependency_mapper.finish(state.ast_data)
             yield {"agent": "dependency_mapper", "status": "completed", "data": state.graph_data}
             
             # Agent 3: Business Logic Extractor
@@ -68,7 +79,7 @@ class Orchestrator:
             # Agent 4: Impact Analyzer (if target provided)
             if impact_target:
                 await self._send_progress("Impact Analyzer", 0.8, f"Analyzing impact of {impact_target}...")
-                impact_analyzer = ImpactAnalyzer(self.dependency_mapper.graph)
+                impact_analyzer = ImpactAnalyzer(self.dependency_mapper.graph, self.dependency_mapper.symbols)
                 state.impact_analysis = impact_analyzer.analyze_impact(impact_target)
                 yield {"agent": "impact_analyzer", "status": "completed", "data": state.impact_analysis}
             
@@ -90,11 +101,170 @@ class Orchestrator:
             await self._send_progress("Error", 0.0, f"Error: {str(e)}")
             yield {"agent": "error", "status": "failed", "error": str(e)}
     
+    async def analyze_diff(
+        self,
+        repo_url: str,
+        base_commit: str,
+        head_commit: str,
+        base_results: Dict[str, Dict]
+    ) -> AsyncGenerator[Dict, None]:
+        """
+        Update a stored analysis with the changes between two commits
+        
+        Only the files changed in base_commit..head_commit are parsed; the
+        stored graph is patched in place and the impact of the changed symbols
+        is reported, so the cost follows the size of the diff.
+        
+        Args:
+            repo_url: Repository URL to analyze
+            base_commit: Commit the stored analysis was made at
+            head_commit: Commit to bring the analysis up to
+            base_results: Stored results by agent name; needs "dependency_mapper"
+                and, for the import map, "repo_analyzer"
+        
+        Yields:
+            Updated repo_analyzer and dependency_mapper results, then a
+            diff_analysis result with the changed symbols and their impact
+        """
+        state = AnalysisState()
+        state.repo_url = repo_url
+        
+        try:
+            stored_ast = base_results.get("repo_analyzer") or {}
+            stored_graph = base_results.get("dependency_mapper")
+            if not stored_graph:
+                raise Exception("No stored dependency graph for this project; run a full analysis first")
+            
+            # Agent 1: Repo Analyzer, changed files only
+            await self._send_progress("Repo Analyzer", 0.1, f"Extracting AST for {base_commit}..{head_commit}...")
+            diff = await self.repo_analyzer.analyze_diff(repo_url, base_commit, head_commit)
+            stored_commit = stored_ast.get("commit")
+            if stored_commit and stored_commit != diff["base_commit"]:
+                raise Exception(
+                    f"Stored analysis is for commit {stored_commit[:12]}, "
+                    f"not base commit {diff['base_commit'][:12]}"
+                )
+            
+            # Agent 2: Dependency Mapper, patched in place
+            await self._send_progress("Dependency Mapper", 0.3, "Updating dependency graph...")
+            mapper = self.dependency_mapper
+            mapper.load_graph(stored_graph, stored_ast)
+            stale = diff["added"] + diff["modified"] + diff["removed"]
+            new_ast = diff["ast_data"]
+            new_ids = {node.id for node in new_ast["nodes"]}
+            
+            old_rows = mapper.symbols.rows_of_files(stale)
+            old_ids = {mapper.symbols.id(row) for row in old_rows}
+            removed_rows = [row for row in old_rows if mapper.symbols.id(row) not in new_ids]
+            removed_ids = [mapper.symbols.id(row) for row in removed_rows]
+            # Removed symbols only exist in the base graph, so measure their impact there
+            base_impact = {
+                mapper.symbols.id(row)
+                for row in ImpactAnalyzer(mapper.graph, mapper.symbols).affected_by(removed_rows)
+            }
+            
+            new_rows = mapper.apply_delta(stale, new_ast)
+            added_rows = [row for row in new_rows if mapper.symbols.id(row) not in old_ids]
+            modified_rows = [
+                row for row in new_rows
+                if mapper.symbols.id(row) in old_ids
+                and self._touches(mapper.symbols, row, diff["changed_lines"])
+            ]
+            head_impact = {
+                mapper.symbols.id(row)
+                for row in ImpactAnalyzer(mapper.graph, mapper.symbols).affected_by(added_rows + modified_rows)
+            }
+            
+            stale_files = set(stale)
+            state.ast_data = {
+                "nodes": mapper.symbols,
+                "relationships": [
+                    rel for rel in stored_ast.get("relationships", [])
+                    if rel.get("file") not in stale_files
+                ] + new_ast["relationships"],
+                "imports": mapper.imports,
+                "commit": diff["head_commit"],
+                "total_files": mapper.symbols.file_count(),
+                "total_functions": len(mapper.symbols.rows_of_type('function', 'method')),
+                "total_classes": len(mapper.symbols.rows_of_type('class'))
+            }
+            yield {"agent": "repo_analyzer", "status": "completed", "data": state.ast_data}
+            
+            state.graph_data = mapper.graph_result()
+            yield {"agent": "dependency_mapper", "status": "completed", "data": state.graph_data}
+            
+            # Agent 4: Impact Analyzer over every changed symbol
+            await self._send_progress("Impact Analyzer", 0.8, "Analyzing impact of changed symbols...")
+            changed_ids = set(removed_ids) | {mapper.symbols.id(row) for row in added_rows + modified_rows}
+            affected = sorted(
+                node_id for node_id in base_impact | head_impact
+                if node_id not in changed_ids and mapper.symbols.row_of(node_id) is not None
+            )
+            state.impact_analysis = {
+                "base_commit": diff["base_commit"],
+                "head_commit": diff["head_commit"],
+                "files": {
+                    "added": diff["added"],
+                    "modified": diff["modified"],
+                    "removed": diff["removed"]
+                },
+                "changed_symbols": {
+                    "added": [mapper.symbols.id(row) for row in added_rows],
+                    "modified": [mapper.symbols.id(row) for row in modified_rows],
+                    "removed": removed_ids
+                },
+                "affected_nodes": affected,
+                "affected_count": len(affected)
+            }
+            yield {"agent": "diff_analysis", "status": "completed", "data": state.impact_analysis}
+            
+            await self._send_progress("Orchestrator", 1.0, "Analysis complete!")
+            yield {
+                "agent": "orchestrator",
+                "status": "completed",
+                "summary": {
+                    "changed_files": len(stale),
+                    "changed_symbols": len(changed_ids),
+                    "affected_nodes": len(affected),
+                    "graph_nodes": mapper.graph.number_of_nodes(),
+                    "graph_edges": mapper.graph.number_of_edges()
+                }
+            }
+        
+        except Exception as e:
+            state.errors.append(str(e))
+            await self._send_progress("Error", 0.0, f"Error: {str(e)}")
+            yield {"agent": "error", "status": "failed", "error": str(e)}
+    
+    @staticmethod
+    def _touches(symbols, row: int, changed_lines: Dict[str, List[Tuple[int, int]]]) -> bool:
+        """Whether a symbol's line span overlaps a changed line range of its file"""
+        start, end = symbols.line_start[row], symbols.line_end[row]
+        return any(
+            first <= end and last >= start
+            for first, last in changed_lines.get(symbols.file(row), [])
+        )
+    
     async def _send_progress(self, agent: str, progress: float, message: str):
         """Send progress update via WebSocket if available"""
         if self.ws_manager and self.client_id:
             await self.ws_manager.send_progress(self.client_id, agent, progress, message)
     
+    async def _send_batch(self, event: Dict):
+        """Forward a parsed batch: progress counts plus the new nodes"""
+        if not (self.ws_manager and self.client_id):
+            return
+        done, total = event["files_done"], event["files_total"]
+        progress = 0.1 + 0.2 * (done / total if total else 1.0)
+        await self._send_progress("Repo Analyzer", progress, f"Parsed {done}/{total} files")
+        nodes = event["nodes"]
+        await self.ws_manager.send_partial(self.client_id, "repo_analyzer", {
+            "files_done": done,
+            "files_total": total,
+            "total_nodes": len(nodes),
+            "nodes": [nodes.to_dict(row) for row in event["rows"]]
+        })
+    
     def get_cached_result(self, repo_url: str) -> Optional[Dict]:
         """Get cached analysis result"""
         return self.cache.get(repo_url)
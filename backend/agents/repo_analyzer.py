@@ -4,45 +4,87 @@ Clones repos and extracts AST (functions, classes, imports, dependencies)
 """
 import os
 import json
+import asyncio
 import tempfile
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
 from git import Repo
 import tree_sitter_python as tspython
 import tree_sitter_javascript as tsjavascript
 import tree_sitter_typescript as tstypescript
 from tree_sitter import Language, Parser
 
+from core.parse_engine import ParseEngine
+from core.parse_cache import ParseCache, blob_hashes, get_parse_cache, pack_result, unpack_result
+from core.repo_cache import RepoMirrorCache, get_repo_cache
+from core.file_walker import walk_source_files
+from core.symbol_table import SymbolTable
+from core.queries import (
+    CALL_KIND, DEFINITION_KINDS, EXPORT_KIND, IMPORT_KIND, REFERENCE_KIND, get_query, run_query
+)
+from config.settings import settings
+
+# Bump whenever _parse_file output changes so stale parse cache entries are ignored
+PARSER_VERSION = 5
+
+# Supported file extensions
+EXTENSIONS = {
+    '.py': 'python',
+    '.js': 'javascript',
+    '.jsx': 'javascript',
+    '.ts': 'typescript',
+    '.tsx': 'tsx'
+}
+
+def load_languages() -> Dict[str, Language]:
+    """Load tree-sitter grammars for different languages"""
+    languages = {}
+    
+    # Python grammar
+    try:
+        languages['python'] = Language(tspython.language())
+    except:
+        pass
+    
+    # JavaScript grammar (also covers JSX)
+    try:
+        languages['javascript'] = Language(tsjavascript.language())
+    except:
+        pass
+    
+    # TypeScript and TSX grammars
+    try:
+        languages['typescript'] = Language(tstypescript.language_typescript())
+        languages['tsx'] = Language(tstypescript.language_tsx())
+    except:
+        pass
+    
+    return languages
+
+def build_parsers() -> Tuple[Dict[str, Language], Dict[str, Parser]]:
+    """Grammars and one parser per language, with the extraction queries compiled"""
+    languages = load_languages()
+    for name, language in languages.items():
+        get_query(name, language)
+    return languages, {name: Parser(lang) for name, lang in languages.items()}
+
 class RepoAnalyzer:
     def __init__(self):
-        self.parsers = self._init_parsers()
+        self.languages, self.parsers = build_parsers()
+        self.parse_cache = get_parse_cache()
+        self.repo_cache = get_repo_cache()
     
-    def _init_parsers(self) -> Dict[str, Parser]:
-        """Initialize tree-sitter parsers for different languages"""
-        parsers = {}
-        
-        # Python parser
-        try:
-            py_lang = Language(tspython.language())
-            parsers['python'] = Parser(py_lang)
-        except:
-            pass
-        
-        # JavaScript parser
-        try:
-            js_lang = Language(tsjavascript.language())
-            parsers['javascript'] = Parser(js_lang)
-        except:
-            pass
-        
-        # TypeScript parser
-        try:
-            ts_lang = Language(tstypescript.language())
-            parsers['typescript'] = Parser(ts_lang)
-        except:
-            pass
-        
-        return parsers
+    @classmethod
+    def parser_only(cls) -> 'RepoAnalyzer':
+        """
+        An analyzer that can only parse files (_parse_file), for parse
+        workers: no parse or repo cache is opened
+        """
+        analyzer = cls.__new__(cls)
+        analyzer.languages, analyzer.parsers = build_parsers()
+        analyzer.parse_cache = None
+        analyzer.repo_cache = None
+        return analyzer
     
     async def analyze_repo(self, repo_url: str, use_mcp: bool = False) -> Dict:
         """
@@ -55,67 +97,244 @@ class RepoAnalyzer:
         Returns:
             Dictionary with nodes and relationships
         """
+        result = {}
+        async for event in self.stream_repo(repo_url, use_mcp):
+            if event["type"] == "complete":
+                result = event["data"]
+        return result
+    
+    async def stream_repo(self, repo_url: str, use_mcp: bool = False) -> AsyncGenerator[Dict, None]:
+        """
+        Analyze a repository, yielding results as batches of files are parsed
+        
+        Yields:
+            {"type": "batch", ...} events while parsing, then one
+            {"type": "complete", "data": ...} event with the same data
+            analyze_repo returns
+        """
         if use_mcp:
             # TODO: Integrate with Repo Prompt MCP
             pass
         
-        # Clone repository to temporary directory
+        # Check out repository into temporary directory
         with tempfile.TemporaryDirectory() as tmpdir:
+            commit = None
             try:
-                repo = Repo.clone_from(repo_url, tmpdir)
-                return await self._extract_ast(tmpdir)
+                commit = await asyncio.to_thread(self._checkout, repo_url, tmpdir)
+                repo_path = tmpdir
             except Exception as e:
                 # Fallback: analyze local directory if clone fails
-                if os.path.exists(repo_url):
-                    return await self._extract_ast(repo_url)
-                raise Exception(f"Failed to clone repository: {str(e)}")
+                if not os.path.exists(repo_url):
+                    raise Exception(f"Failed to clone repository: {str(e)}")
+                repo_path = repo_url
+            
+            async for event in self._iter_ast(repo_path):
+                if event["type"] == "complete":
+                    # Lets a later diff analysis check it starts from this commit
+                    event["data"]["commit"] = commit
+                yield event
+    
+    def _checkout(self, repo_url: str, dest: str) -> str:
+        """
+        Sparse checkout from the local mirror cache, or a plain clone when it is disabled
+        
+        Returns:
+            The checked-out commit hash
+        """
+        if self.repo_cache is None:
+            repo = Repo.clone_from(repo_url, dest)
+        else:
+            repo = self.repo_cache.checkout(repo_url, dest, EXTENSIONS.keys(), settings.ANALYSIS_EXCLUDE_DIRS)
+        return repo.head.commit.hexsha
+    
+    async def analyze_diff(self, repo_url: str, base_commit: str, head_commit: str) -> Dict:
+        """
+        Extract AST for only the source files that changed between two commits
+        
+        Changed files are read straight out of the mirror's object store at
+        head_commit; nothing else in the repository is checked out or parsed.
+        
+        Returns:
+            Dictionary with the resolved commits, the added/modified/removed
+            source files, the changed line ranges per file, and the AST of the
+            added and modified files as "ast_data"
+        """
+        if self.repo_cache is None:
+            raise Exception("Diff analysis requires the repository mirror cache (REPO_CACHE_ENABLED)")
+        
+        def collect(tmpdir: str) -> Dict:
+            with self.repo_cache.lease(repo_url) as mirror:
+                base = RepoMirrorCache.resolve(mirror, base_commit)
+                head = RepoMirrorCache.resolve(mirror, head_commit)
+                changes = {
+                    path: status
+                    for path, status in RepoMirrorCache.changed_files(mirror, base, head).items()
+                    if self._is_source_path(path)
+                }
+                changed_lines = RepoMirrorCache.changed_lines(mirror, base, head)
+                RepoMirrorCache.export_files(mirror, head, [p for p, s in changes.items() if s != 'D'], tmpdir)
+            return {
+                "base_commit": base,
+                "head_commit": head,
+                "added": sorted(p for p, s in changes.items() if s == 'A'),
+                "modified": sorted(p for p, s in changes.items() if s == 'M'),
+                "removed": sorted(p for p, s in changes.items() if s == 'D'),
+                "changed_lines": {p: changed_lines.get(p, []) for p, s in changes.items() if s == 'M'}
+            }
+        
+        with tempfile.TemporaryDirectory() as tmpdir:
+            diff = await asyncio.to_thread(collect, tmpdir)
+            diff["ast_data"] = await self._extract_ast(tmpdir)
+        diff["ast_data"]["commit"] = diff["head_commit"]
+        return diff
+    
+    def _is_source_path(self, rel_path: str) -> bool:
+        """Whether a full analysis would pick up rel_path (extension and excluded dirs)"""
+        if os.path.splitext(rel_path)[1] not in EXTENSIONS:
+            return False
+        return not set(settings.ANALYSIS_EXCLUDE_DIRS).intersection(rel_path.split('/')[:-1])
     
     async def _extract_ast(self, repo_path: str) -> Dict:
         """Extract AST from repository files"""
-        nodes = []
+        result = {}
+        async for event in self._iter_ast(repo_path):
+            if event["type"] == "complete":
+                result = event["data"]
+        return result
+    
+    async def _iter_ast(self, repo_path: str) -> AsyncGenerator[Dict, None]:
+        """
+        Extract AST from repository files, one event per parsed batch
+        
+        Batch events carry the shared SymbolTable and the range of rows the
+        batch added to it, so consumers can start on partial results.
+        """
+        nodes = SymbolTable()
         relationships = []
         imports_map = {}
         
         repo_path_obj = Path(repo_path)
         
-        # Supported file extensions
-        extensions = {
-            '.py': 'python',
-            '.js': 'javascript',
-            '.jsx': 'javascript',
-            '.ts': 'typescript',
-            '.tsx': 'typescript'
-        }
+        tasks = [
+            (rel_path, lang)
+            for rel_path, lang, _ in walk_source_files(
+                str(repo_path_obj),
+                EXTENSIONS,
+                settings.ANALYSIS_EXCLUDE_DIRS,
+                settings.ANALYSIS_USE_GITIGNORE
+            )
+        ]
+        files_done = 0
         
-        for ext, lang in extensions.items():
-            for file_path in repo_path_obj.rglob(f"*{ext}"):
-                if any(skip in str(file_path) for skip in ['node_modules', '.git', 'venv', '__pycache__']):
-                    continue
-                
-                try:
-                    content = file_path.read_text(encoding='utf-8', errors='ignore')
-                    file_nodes, file_rels, file_imports = self._parse_file(
-                        str(file_path.relative_to(repo_path_obj)),
-                        content,
-                        lang
-                    )
-                    nodes.extend(file_nodes)
-                    relationships.extend(file_rels)
-                    imports_map.update(file_imports)
-                except Exception as e:
+        def merge(results: List[Optional[tuple]]) -> Dict:
+            first_row = len(nodes)
+            for result in results:
+                if result is None:
                     continue
+                file_nodes, file_rels, file_imports = result
+                for node in file_nodes:
+                    nodes.add_dict(node)
+                relationships.extend(file_rels)
+                imports_map.update(file_imports)
+            return {
+                "type": "batch",
+                "nodes": nodes,
+                "rows": range(first_row, len(nodes)),
+                "files_done": files_done,
+                "files_total": len(tasks)
+            }
+        
+        # Results are merged strictly in task order, whatever mix of cache
+        # hits and parse batches (which the pool finishes in any order)
+        # they come from, so row numbers never depend on cache state or timing
+        results: Dict[str, Optional[tuple]] = {}
+        released = 0
+        
+        def release() -> Optional[Dict]:
+            """Merge the longest run of next tasks whose results are all in"""
+            nonlocal released
+            start = released
+            while released < len(tasks) and tasks[released][0] in results:
+                released += 1
+            if released == start:
+                return None
+            return merge([results.pop(path) for path, _ in tasks[start:released]])
+        
+        # Reuse cached results for files whose content was parsed before
+        cached, cache_keys = await asyncio.to_thread(self._lookup_parse_cache, str(repo_path_obj), tasks)
+        misses = [task for task in tasks if task[0] not in cached]
+        results.update(cached)
+        files_done += len(cached)
+        event = release()
+        if event is not None:
+            yield event
+        
+        # Parse in-process for small repos, on the process pool otherwise
+        engine = ParseEngine()
+        async for batch, batch_results in engine.iter_batches(str(repo_path_obj), misses):
+            await asyncio.to_thread(self._store_parse_cache, dict(zip(batch, batch_results)), cache_keys)
+            files_done += len(batch)
+            results.update(zip((path for path, _ in batch), batch_results))
+            event = release()
+            if event is not None:
+                yield event
         
-        return {
-            "nodes": nodes,
-            "relationships": relationships,
-            "imports": imports_map,
-            "total_files": len(set(n['file'] for n in nodes)),
-            "total_functions": len([n for n in nodes if n['type'] == 'function']),
-            "total_classes": len([n for n in nodes if n['type'] == 'class'])
+        yield {
+            "type": "complete",
+            "data": {
+                "nodes": nodes,
+                "relationships": relationships,
+                "imports": imports_map,
+                "total_files": len(nodes.files),
+                "total_functions": len(nodes.rows_of_type('function', 'method')),
+                "total_classes": len(nodes.rows_of_type('class'))
+            }
         }
     
-    def _parse_file(self, file_path: str, content: str, language: str) -> tuple:
-        """Parse a single file and extract AST nodes"""
+    def _lookup_parse_cache(self, repo_path: str, tasks: List[tuple]) -> Tuple[Dict, Dict]:
+        """
+        Look up tasks in the parse cache by git blob hash
+        
+        Returns:
+            (cached results by path, cache keys by path for every cacheable task)
+        """
+        if self.parse_cache is None:
+            return {}, {}
+        
+        # Files without a parser produce empty results that must not be cached
+        cacheable = [(path, lang) for path, lang in tasks if lang in self.parsers]
+        hashes = blob_hashes(repo_path, [path for path, _ in cacheable])
+        cache_keys = {
+            path: ParseCache.make_key(hashes[path], lang, PARSER_VERSION)
+            for path, lang in cacheable
+            if path in hashes
+        }
+        
+        entries = self.parse_cache.get_many(list(set(cache_keys.values())))
+        cached = {
+            path: unpack_result(entries[key], path)
+            for path, key in cache_keys.items()
+            if key in entries
+        }
+        return cached, cache_keys
+    
+    def _store_parse_cache(self, parsed: Dict[tuple, Optional[tuple]], cache_keys: Dict[str, str]):
+        """Write freshly parsed results back to the parse cache"""
+        if self.parse_cache is None:
+            return
+        self.parse_cache.put_many({
+            cache_keys[path]: pack_result(result, path)
+            for (path, _), result in parsed.items()
+            if result is not None and path in cache_keys
+        })
+    
+    def _parse_file(self, file_path: str, source: bytes, language: str) -> tuple:
+        """
+        Parse a single file and extract AST nodes
+        
+        source is the file's raw bytes (or a memory map of them); only the
+        identifier spans that end up in the output are decoded.
+        """
         nodes = []
         relationships = []
         imports = {}
@@ -123,74 +342,203 @@ class RepoAnalyzer:
         if language not in self.parsers:
             return nodes, relationships, imports
         
-        parser = self.parsers[language]
-        tree = parser.parse(bytes(content, 'utf8'))
+        tree = self.parsers[language].parse(source)
+        query = get_query(language, self.languages[language])
         
-        # Extract functions, classes, and imports
-        cursor = tree.walk()
+        # Definitions still open at the current position, innermost last,
+        # as (end_byte, name); used to attribute call sites to their caller
+        scopes = []
+        # Attribute references are only recorded once per (caller, target)
+        seen_references = set()
         
-        def traverse(node, depth=0):
-            if depth > 20:  # Prevent infinite recursion
-                return
+        # Captures arrive in source order, so one flat pass covers any depth
+        for node, kind in run_query(query, tree.root_node):
+            while scopes and scopes[-1][0] <= node.start_byte:
+                scopes.pop()
             
-            node_type = node.type
-            
-            if node_type == 'function_definition' or node_type == 'function_declaration':
-                name = self._get_node_name(node, content)
+            if kind in DEFINITION_KINDS:
+                name = self._get_node_name(node, source)
                 if name:
                     nodes.append({
                         "id": f"{file_path}::{name}",
                         "name": name,
-                        "type": "function",
+                        "type": kind,
                         "file": file_path,
                         "line_start": node.start_point[0] + 1,
                         "line_end": node.end_point[0] + 1
                     })
+                    scopes.append((node.end_byte, name))
             
-            elif node_type == 'class_definition' or node_type == 'class_declaration':
-                name = self._get_node_name(node, content)
-                if name:
-                    nodes.append({
-                        "id": f"{file_path}::{name}",
+            elif kind == IMPORT_KIND:
+                import_name = self._extract_import(node, source)
+                if import_name:
+                    imports[file_path] = imports.get(file_path, []) + [import_name]
+                for alias, module, name in self._extract_bindings(node, source):
+                    relationships.append({
+                        "type": "import",
+                        "file": file_path,
+                        "alias": alias,
+                        "module": module,
                         "name": name,
-                        "type": "class",
+                        "line": node.start_point[0] + 1
+                    })
+            
+            elif kind == EXPORT_KIND:
+                for alias, name in self._extract_exports(node, source):
+                    relationships.append({
+                        "type": "export",
                         "file": file_path,
-                        "line_start": node.start_point[0] + 1,
-                        "line_end": node.end_point[0] + 1
+                        "alias": alias,
+                        "name": name,
+                        "line": node.start_point[0] + 1
                     })
             
-            elif node_type == 'import_statement' or node_type == 'import_from_statement':
-                import_name = self._extract_import(node, content)
-                if import_name:
-                    imports[file_path] = imports.get(file_path, []) + [import_name]
+            elif kind == CALL_KIND:
+                relationships.append({
+                    "type": "call",
+                    "file": file_path,
+                    "source": scopes[-1][1] if scopes else None,
+                    "target": self._node_text(node, source),
+                    "line": node.start_point[0] + 1
+                })
             
-            # Traverse children
-            if node.child_count > 0:
-                cursor.goto_first_child()
-                traverse(cursor.node, depth + 1)
-                while cursor.goto_next_sibling():
-                    traverse(cursor.node, depth + 1)
-                cursor.goto_parent()
-        
-        traverse(tree.root_node)
+            elif kind == REFERENCE_KIND:
+                caller = scopes[-1][1] if scopes else None
+                target = self._node_text(node, source)
+                if caller is None or (caller, target) in seen_references:
+                    continue
+                seen_references.add((caller, target))
+                relationships.append({
+                    "type": "reference",
+                    "file": file_path,
+                    "source": caller,
+                    "target": target,
+                    "line": node.start_point[0] + 1
+                })
         
         return nodes, relationships, imports
     
-    def _get_node_name(self, node, content: str) -> Optional[str]:
+    def _node_text(self, node, source: bytes) -> str:
+        """Decode the source bytes spanned by a node (tree-sitter offsets are byte offsets)"""
+        return source[node.start_byte:node.end_byte].decode('utf8', errors='ignore')
+    
+    def _get_node_name(self, node, source: bytes) -> Optional[str]:
         """Extract name from a node"""
+        name_node = node.child_by_field_name('name')
+        if name_node is not None:
+            return self._node_text(name_node, source)
         for child in node.children:
             if child.type == 'identifier' or child.type == 'type_identifier':
-                start = child.start_byte
-                end = child.end_byte
-                return content[start:end]
+                return self._node_text(child, source)
         return None
     
-    def _extract_import(self, node, content: str) -> Optional[str]:
+    def _extract_bindings(self, node, source: bytes) -> List[Tuple[str, str, Optional[str]]]:
+        """
+        Local names bound by an import node, as (alias, module, name)
+        
+        name is None when the alias refers to the module itself, "*" for a
+        wildcard import and "default" for a JS/TS default import. module is
+        the specifier as written (dotted, relative or a path string).
+        """
+        text = lambda n: self._node_text(n, source)
+        bindings = []
+        
+        module_node = node.child_by_field_name('source')
+        if module_node is not None:
+            # JavaScript / TypeScript: import x, {a as b}, * as ns from '...'
+            module = text(module_node).strip('"\'`')
+            for clause in node.children:
+                if clause.type != 'import_clause':
+                    continue
+                for child in clause.children:
+                    if child.type == 'identifier':
+                        bindings.append((text(child), module, 'default'))
+                    elif child.type == 'namespace_import':
+                        for part in child.children:
+                            if part.type == 'identifier':
+                                bindings.append((text(part), module, None))
+                    elif child.type == 'named_imports':
+                        for spec in child.children:
+                            if spec.type != 'import_specifier':
+                                continue
+                            name = spec.child_by_field_name('name')
+                            alias = spec.child_by_field_name('alias') or name
+                            bindings.append((text(alias), module, text(name)))
+        
+        elif node.type == 'import_statement':
+            # Python: import a.b, c as d
+            for child in node.children_by_field_name('name'):
+                if child.type == 'aliased_import':
+                    bindings.append((
+                        text(child.child_by_field_name('alias')),
+                        text(child.child_by_field_name('name')),
+                        None
+                    ))
+                else:
+                    # "import a.b" binds "a"
+                    head = text(child).split('.')[0]
+                    bindings.append((head, head, None))
+        
+        elif node.type == 'import_from_statement':
+            # Python: from m import a, b as c / from . import d / from m import *
+            module = text(node.child_by_field_name('module_name'))
+            if any(child.type == 'wildcard_import' for child in node.children):
+                bindings.append(('*', module, '*'))
+            for child in node.children_by_field_name('name'):
+                if child.type == 'aliased_import':
+                    name = text(child.child_by_field_name('name'))
+                    bindings.append((text(child.child_by_field_name('alias')), module, name))
+                else:
+                    bindings.append((text(child), module, text(child)))
+        
+        return bindings
+    
+    def _extract_exports(self, node, source: bytes) -> List[Tuple[str, str]]:
+        """
+        Names a JS/TS export statement makes importable, as (exported, local)
+        
+        Default exports are reported under "default". Re-exports from other
+        modules are skipped.
+        """
+        if node.child_by_field_name('source') is not None:
+            return []
+        text = lambda n: self._node_text(n, source)
+        is_default = any(child.type == 'default' for child in node.children)
+        exports = []
+        
+        declaration = node.child_by_field_name('declaration')
+        if declaration is not None:
+            if declaration.type in ('lexical_declaration', 'variable_declaration'):
+                names = [
+                    child.child_by_field_name('name')
+                    for child in declaration.children
+                    if child.type == 'variable_declarator'
+                ]
+            else:
+                names = [declaration.child_by_field_name('name')]
+            for name in names:
+                if name is not None:
+                    exports.append(('default' if is_default else text(name), text(name)))
+        
+        value = node.child_by_field_name('value')
+        if is_default and value is not None and value.type == 'identifier':
+            exports.append(('default', text(value)))
+        
+        for clause in node.children:
+            if clause.type != 'export_clause':
+                continue
+            for spec in clause.children:
+                if spec.type != 'export_specifier':
+                    continue
+                name = spec.child_by_field_name('name')
+                alias = spec.child_by_field_name('alias') or name
+                exports.append((text(alias), text(name)))
+        
+        return exports
+    
+    def _extract_import(self, node, source: bytes) -> Optional[str]:
         """Extract import name from import node"""
         for child in node.children:
             if child.type in ['dotted_name', 'identifier', 'string']:
-                start = child.start_byte
-                end = child.end_byte
-                return content[start:end].strip('"\'')
+                return self._node_text(child, source).strip('"\'')
         return None
-
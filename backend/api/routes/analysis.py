@@ -2,14 +2,24 @@
 Analysis API routes
 """
 from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, List
+from typing import Callable, Optional, Dict, Iterator, List, Tuple
 from sqlalchemy.orm import Session
+import asyncio
+import json
+import numpy as np
 
-from database.database import get_db
-from database.models import Project, Analysis
+from config.settings import settings
+from database.database import SessionLocal, get_db
+from database.models import Project, Analysis, DependencyGraph
 from agents.orchestrator import Orchestrator
-from core.websocket_manager import ConnectionManager
+from core.websocket_manager import manager
+from core.csr_graph import CSRGraph
+from core.graph_cache import get_graph_cache
+from core.graph_store import FORMAT_VERSION, StoredGraph, encode_graph
+from core.rollup import GraphRollup
+from core.symbol_table import SymbolTable, to_json
 
 router = APIRouter()
 
@@ -17,11 +27,116 @@ class AnalysisRequest(BaseModel):
     repo_url: str
     impact_target: Optional[str] = None
     client_id: Optional[str] = None
+    # Set both to analyze only the changes between two commits
+    base_commit: Optional[str] = None
+    head_commit: Optional[str] = None
 
 class AnalysisResponse(BaseModel):
     project_id: int
     status: str
     message: str
+    # Changed symbols and their impact set, for diff analyses
+    diff: Optional[Dict] = None
+
+def _latest_results(db: Session, project_id: int, agents: List[str]) -> Dict[str, Dict]:
+    """Most recent completed result of each agent for a project"""
+    results = {}
+    for agent in agents:
+        analysis = db.query(Analysis).filter(
+            Analysis.project_id == project_id,
+            Analysis.agent_name == agent,
+            Analysis.status == "completed"
+        ).order_by(Analysis.id.desc()).first()
+        if analysis and analysis.result:
+            results[agent] = analysis.result
+    return results
+
+def _encode_graph(graph_data: Dict, graph: Optional[CSRGraph]) -> bytes:
+    """
+    Binary form (core.graph_store) of a dependency_mapper result, with its
+    reachability index unless disabled
+    
+    graph is the CSR the mapper analyzed, whose reachability index is
+    already built; it is only rebuilt from the edge list when missing.
+    """
+    symbols, edges = graph_data["nodes"], graph_data["edges"]
+    if graph is None:
+        graph = CSRGraph(len(symbols), edges.sources, edges.targets, np.asarray(symbols.alive, dtype=bool))
+    reachability = graph.reachability if settings.GRAPH_REACHABILITY_INDEX else None
+    return encode_graph(symbols, graph, reachability)
+
+async def _store_graph(db: Session, project_id: int, analysis_id: int, graph_data: Dict, graph: Optional[CSRGraph]):
+    """Save a dependency_mapper result in binary form for fast reloads"""
+    data = await asyncio.to_thread(_encode_graph, graph_data, graph)
+    symbols = graph_data["nodes"]
+    db.add(DependencyGraph(
+        project_id=project_id,
+        analysis_id=analysis_id,
+        graph_metadata={
+            "nodes": symbols.live_count(),
+            "edges": len(graph_data["edges"]),
+            "size": len(data)
+        },
+        format_version=FORMAT_VERSION,
+        data=data
+    ))
+    db.commit()
+
+def _load_graph(project_id: int) -> Tuple[SymbolTable, CSRGraph]:
+    """
+    Symbol table and read-only graph of the latest dependency_mapper
+    analysis, from the process-wide graph cache when it has them
+    
+    Runs in a worker thread (asyncio.to_thread), so it opens its own
+    session rather than sharing the request's.
+    """
+    return _from_graph_cache(project_id, get_graph_cache().get)
+
+def _load_rollup(project_id: int) -> GraphRollup:
+    """Rollup of the latest stored dependency graph, cached with the graph (see _load_graph)"""
+    return _from_graph_cache(project_id, get_graph_cache().rollup)
+
+def _from_graph_cache(project_id: int, lookup: Callable):
+    """lookup (a GraphCache method) for the project's latest dependency_mapper analysis"""
+    db = SessionLocal()
+    try:
+        latest = db.query(Analysis.id).filter(
+            Analysis.project_id == project_id,
+            Analysis.agent_name == "dependency_mapper",
+            Analysis.status == "completed"
+        ).order_by(Analysis.id.desc()).first()
+        if not latest:
+            raise HTTPException(status_code=404, detail="Dependency graph not found")
+        return lookup((project_id, latest.id), lambda: _read_graph(db, latest.id))
+    finally:
+        db.close()
+
+def _read_graph(db: Session, analysis_id: int) -> Tuple[SymbolTable, CSRGraph]:
+    """
+    Load one analysis's graph from its binary copy when there is one in
+    the current format; analyses stored before that (or in an older
+    format) are rebuilt from their JSON result
+    """
+    stored = db.query(DependencyGraph).filter(
+        DependencyGraph.analysis_id == analysis_id,
+        DependencyGraph.format_version == FORMAT_VERSION
+    ).first()
+    if stored:
+        graph = StoredGraph(stored.data)
+        return graph.symbols, graph.graph
+    
+    from agents.dependency_mapper import DependencyMapper
+    
+    analysis = db.query(Analysis).filter(Analysis.id == analysis_id).first()
+    if not analysis.result:
+        raise HTTPException(status_code=404, detail="Dependency graph not found")
+    mapper = DependencyMapper()
+    graph = mapper.load_csr(analysis.result)
+    if settings.GRAPH_REACHABILITY_INDEX:
+        # Built now, like a stored index is loaded now, so the graph cache
+        # sizes the entry with it
+        graph.reachability
+    return mapper.symbols, graph
 
 @router.post("/start", response_model=AnalysisResponse)
 async def start_analysis(
@@ -29,7 +144,16 @@ async def start_analysis(
     background_tasks: BackgroundTasks,
     db: Session = Depends(get_db)
 ):
-    """Start a new analysis"""
+    """
+    Start a new analysis
+    
+    With base_commit and head_commit, only the files changed between them
+    are analyzed against the project's stored graph. That runs inline and
+    the response carries the changed symbols and their impact set.
+    """
+    if bool(request.base_commit) != bool(request.head_commit):
+        raise HTTPException(status_code=400, detail="base_commit and head_commit must be given together")
+    
     try:
         # Create or get project
         project = db.query(Project).filter(Project.repo_url == request.repo_url).first()
@@ -43,10 +167,28 @@ async def start_analysis(
             db.commit()
             db.refresh(project)
         
-        # Start analysis in background
-        ws_manager = ConnectionManager()
-        orchestrator = Orchestrator(ws_manager, request.client_id)
+        orchestrator = Orchestrator(manager, request.client_id)
+        
+        if request.base_commit:
+            results = await run_analysis(
+                project.id,
+                request.repo_url,
+                None,
+                orchestrator,
+                None,
+                request.base_commit,
+                request.head_commit
+            )
+            if "diff_analysis" not in results:
+                raise HTTPException(status_code=500, detail=results.get("error", "Diff analysis failed"))
+            return AnalysisResponse(
+                project_id=project.id,
+                status="completed",
+                message="Diff analysis complete",
+                diff=results["diff_analysis"]
+            )
         
+        # Start analysis in background
         background_tasks.add_task(
             run_analysis,
             project.id,
@@ -61,6 +203,8 @@ async def start_analysis(
             status="started",
             message="Analysis started"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -69,10 +213,11 @@ async def run_analysis(
     repo_url: str,
     impact_target: Optional[str],
     orchestrator: Orchestrator,
-    db_session_factory
-):
+    db_session_factory,
+    base_commit: Optional[str] = None,
+    head_commit: Optional[str] = None
+) -> Dict:
     """Run analysis and save results"""
-    from database.database import SessionLocal
     db = SessionLocal()
     try:
         # Update project status
@@ -81,22 +226,40 @@ async def run_analysis(
             project.status = "analyzing"
             db.commit()
         
-        # Run analysis
+        # Run analysis (diff mode patches the latest stored results)
+        if base_commit and head_commit:
+            stream = orchestrator.analyze_diff(
+                repo_url,
+                base_commit,
+                head_commit,
+                _latest_results(db, project_id, ["repo_analyzer", "dependency_mapper"])
+            )
+        else:
+            stream = orchestrator.analyze(repo_url, impact_target)
+        
         results = {}
-        async for result in orchestrator.analyze(repo_url, impact_target):
+        async for result in stream:
             agent = result.get("agent")
-            if agent and agent != "error":
+            if agent == "error":
+                results["error"] = result.get("error")
+            elif agent:
+                data = result.get("data")
+                # The mapper's in-memory graph is stored in binary form below, not as JSON
+                graph = data.pop("graph", None) if agent == "dependency_mapper" else None
                 # Save analysis result
                 analysis = Analysis(
                     project_id=project_id,
                     agent_name=agent,
                     status="completed",
-                    result=result.get("data"),
+                    result=to_json(data),
                     confidence_score=0.8
                 )
                 db.add(analysis)
                 db.commit()
-                results[agent] = result.get("data")
+                if agent == "dependency_mapper":
+                    await _store_graph(db, project_id, analysis.id, data, graph)
+                    get_graph_cache().invalidate(project_id)
+                results[agent] = analysis.result
         
         # Update project status
         if project:
@@ -105,6 +268,7 @@ async def run_analysis(
         
         # Cache result
         orchestrator.cache_result(repo_url, results)
+        return results
     
     except Exception as e:
         # Update project status on error
@@ -122,6 +286,7 @@ async def run_analysis(
         )
         db.add(analysis)
         db.commit()
+        return {"error": str(e)}
     finally:
         db.close()
 
@@ -147,9 +312,25 @@ async def get_analysis_status(project_id: int, db: Session = Depends(get_db)):
         ]
     }
 
+def _graph_summary(graph_data: Dict) -> Dict:
+    """
+    A dependency_mapper result without its full node and edge lists,
+    which only get large: their counts, the analysis and the
+    directory-level rollup stay (finer levels come from /graph)
+    """
+    summary = {key: value for key, value in graph_data.items() if key not in ("nodes", "edges")}
+    summary["node_count"] = len(graph_data.get("nodes", []))
+    summary["edge_count"] = len(graph_data.get("edges", []))
+    return summary
+
 @router.get("/results/{project_id}")
-async def get_analysis_results(project_id: int, db: Session = Depends(get_db)):
-    """Get analysis results"""
+async def get_analysis_results(project_id: int, include_graph: bool = False, db: Session = Depends(get_db)):
+    """
+    Get analysis results
+    
+    The dependency_mapper result comes without its symbol-level node and
+    edge lists unless include_graph is set.
+    """
     project = db.query(Project).filter(Project.id == project_id).first()
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
@@ -157,11 +338,14 @@ async def get_analysis_results(project_id: int, db: Session = Depends(get_db)):
     analyses = db.query(Analysis).filter(
         Analysis.project_id == project_id,
         Analysis.status == "completed"
-    ).all()
+    ).order_by(Analysis.id).all()
     
+    # Later analyses (e.g. diff updates) overwrite earlier ones
     results = {}
     for analysis in analyses:
         results[analysis.agent_name] = analysis.result
+    if not include_graph and results.get("dependency_mapper"):
+        results["dependency_mapper"] = _graph_summary(results["dependency_mapper"])
     
     return {
         "project_id": project.id,
@@ -170,41 +354,120 @@ async def get_analysis_results(project_id: int, db: Session = Depends(get_db)):
     }
 
 @router.post("/impact")
-async def analyze_impact(
-    request: Dict,
-    db: Session = Depends(get_db)
-):
-    """Analyze impact of deleting/modifying a component"""
+async def analyze_impact(request: Dict):
+    """
+    Analyze impact of deleting/modifying a component
+    
+    Affected nodes come nearest first, a page at a time: pass the
+    response's next_cursor as "cursor" for the next page. "max_depth"
+    bounds how many hops are followed; "mode" is "page" (default),
+    "count" (counts and risk only) or "stream" (NDJSON: the summary,
+    then one line per affected node).
+    """
     project_id = request.get("project_id")
     target_node = request.get("target_node")
+    action = request.get("action", "delete")
+    mode = request.get("mode", "page")
+    cursor = request.get("cursor")
+    max_depth = request.get("max_depth")
+    limit = request.get("limit")
     
     if not project_id or not target_node:
         raise HTTPException(status_code=400, detail="project_id and target_node required")
+    if mode not in ("page", "count", "stream"):
+        raise HTTPException(status_code=400, detail="mode must be page, count or stream")
+    if cursor is not None and not isinstance(cursor, str):
+        raise HTTPException(status_code=400, detail="cursor must be a string")
+    for name, value, low in (("max_depth", max_depth, 0), ("limit", limit, 1)):
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < low):
+            raise HTTPException(status_code=400, detail=f"{name} must be an integer >= {low}")
+    if limit is not None:
+        limit = min(limit, settings.IMPACT_PAGE_MAX)
     
-    # Get graph data from previous analysis
-    analysis = db.query(Analysis).filter(
-        Analysis.project_id == project_id,
-        Analysis.agent_name == "dependency_mapper"
-    ).first()
+    # Graph of the latest analysis (loaded off the event loop on a cache miss)
+    symbols, graph = await asyncio.to_thread(_load_graph, project_id)
     
-    if not analysis or not analysis.result:
-        raise HTTPException(status_code=404, detail="Dependency graph not found")
+    from agents.impact_analyzer import ImpactAnalyzer
+    
+    analyzer = ImpactAnalyzer(graph, symbols)
+    if mode == "stream":
+        # Sync iterator: Starlette steps it in a worker thread
+        records = analyzer.stream_impact(target_node, action, max_depth)
+        return StreamingResponse(_ndjson(records, settings.IMPACT_PAGE_SIZE), media_type="application/x-ndjson")
+    try:
+        return await asyncio.to_thread(
+            analyzer.analyze_impact, target_node, action, max_depth, cursor, limit, mode == "count"
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _ndjson(records: Iterator[Dict], batch: int) -> Iterator[str]:
+    """Records as NDJSON, written batch lines at a time"""
+    lines = []
+    for record in records:
+        lines.append(json.dumps(record))
+        if len(lines) >= batch:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+@router.post("/impact/batch")
+async def analyze_impact_batch(request: Dict):
+    """Analyze impact of changing many components, per target and combined"""
+    project_id = request.get("project_id")
+    targets = request.get("targets")
+    
+    if not project_id or not isinstance(targets, list) or not targets:
+        raise HTTPException(status_code=400, detail="project_id and a non-empty targets list required")
+    
+    symbols, graph = await asyncio.to_thread(_load_graph, project_id)
     
-    # Rebuild graph and analyze impact
-    from agents.dependency_mapper import DependencyMapper
     from agents.impact_analyzer import ImpactAnalyzer
-    import networkx as nx
     
-    mapper = DependencyMapper()
-    # Reconstruct graph from saved data
-    graph_data = analysis.result
-    for node in graph_data.get("nodes", []):
-        mapper.graph.add_node(node["id"], **{k: v for k, v in node.items() if k != "id"})
-    for edge in graph_data.get("edges", []):
-        mapper.graph.add_edge(edge["source"], edge["target"])
+    analyzer = ImpactAnalyzer(graph, symbols)
+    return await asyncio.to_thread(analyzer.analyze_batch, [str(target) for target in targets])
+
+@router.post("/impact/reachability")
+async def analyze_reachability(request: Dict):
+    """
+    Answer "can changing A affect B" for many pairs, and affected counts
+    for many nodes, from the graph's reachability index
+    """
+    project_id = request.get("project_id")
+    pairs = request.get("pairs") or []
+    nodes = request.get("nodes") or []
+    
+    if not project_id or not isinstance(pairs, list) or not isinstance(nodes, list) or not (pairs or nodes):
+        raise HTTPException(status_code=400, detail="project_id and pairs and/or nodes lists required")
+    if any(not isinstance(pair, (list, tuple)) or len(pair) != 2 for pair in pairs):
+        raise HTTPException(status_code=400, detail="pairs must be [source, target] lists")
     
-    analyzer = ImpactAnalyzer(mapper.graph)
-    impact = analyzer.analyze_impact(target_node)
+    symbols, graph = await asyncio.to_thread(_load_graph, project_id)
+    
+    from agents.impact_analyzer import ImpactAnalyzer
     
-    return impact
+    analyzer = ImpactAnalyzer(graph, symbols)
+    return await asyncio.to_thread(
+        analyzer.analyze_reachability,
+        [(str(source), str(target)) for source, target in pairs],
+        [str(node) for node in nodes]
+    )
 
+@router.get("/graph/{project_id}")
+async def get_graph_level(project_id: int, level: str = "directory"):
+    """Dependency graph aggregated at one level: directory, package, file or symbol"""
+    rollup = await asyncio.to_thread(_load_rollup, project_id)
+    try:
+        return rollup.level(level)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/graph/{project_id}/expand")
+async def expand_graph_node(project_id: int, node: str):
+    """Children of one aggregate node (e.g. "package:backend/agents"), with their edges"""
+    rollup = await asyncio.to_thread(_load_rollup, project_id)
+    try:
+        return rollup.expand(node)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=e.args[0])
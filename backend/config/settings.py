@@ -24,7 +24,7 @@ class Settings(BaseSettings):
     ]
     
     
-    @field_validator('CORS_ORIGINS', mode='before')
+    @field_validator('CORS_ORIGINS', 'ANALYSIS_EXCLUDE_DIRS', mode='before')
     @classmethod
     def parse_cors_origins(cls, v):
         if isinstance(v, str):
@@ -34,13 +34,56 @@ class Settings(BaseSettings):
     
     # Analysis settings
     MAX_REPO_SIZE_MB: int = 100
+    # Directory names never walked during analysis (comma-separated in env)
+    ANALYSIS_EXCLUDE_DIRS: Union[str, List[str]] = [
+        "node_modules",
+        ".git",
+        "venv",
+        ".venv",
+        "__pycache__"
+    ]
+    ANALYSIS_USE_GITIGNORE: bool = True
     ANALYSIS_TIMEOUT_SECONDS: int = 300
     CACHE_TTL_SECONDS: int = 3600
     
+    # Parsing settings
+    PARSE_WORKERS: int = 0  # 0 = one worker per CPU core
+    PARSE_BATCH_SIZE: int = 64  # Files per process pool task
+    PARSE_PARALLEL_THRESHOLD: int = 200  # Repos with fewer files are parsed in-process
+    PARSE_MMAP_THRESHOLD_KB: int = 256  # Larger files are memory-mapped, not read
+    PARSE_CACHE_ENABLED: bool = True
+    PARSE_CACHE_DIR: str = "./.cache/parse"
+    PARSE_CACHE_MAX_MB: int = 512
+    
+    # Repository mirror cache
+    REPO_CACHE_ENABLED: bool = True
+    REPO_CACHE_DIR: str = "./.cache/repos"
+    REPO_CACHE_MAX_MB: int = 4096
+    
+    # Dependency graph settings
+    GRAPH_HEURISTIC_EDGES: bool = False  # Also guess edges from line order, shared name words and directories
+    GRAPH_NAME_TOKEN_CAP: int = 50  # Name words shared by more functions don't link them
+    GRAPH_CYCLES_PER_SCC: int = 3  # Representative cycles listed per strongly connected component
+    GRAPH_CYCLE_TIME_BUDGET_MS: int = 200  # Time spent listing cycles across all components
+    GRAPH_BETWEENNESS_SAMPLES: int = 32  # Source nodes sampled for betweenness (0 = exact)
+    GRAPH_CACHE_MAX_MB: int = 512  # Loaded graphs kept in memory for impact queries (0 = none)
+    GRAPH_REACHABILITY_INDEX: bool = True  # Store a reachability index with each analysis
+    GRAPH_REACHABILITY_CLOSURE_MAX: int = 8192  # Largest condensation (components) given a full closure
+    
+    # Impact analysis results
+    IMPACT_PAGE_SIZE: int = 200  # Affected nodes per page unless the request asks for another limit
+    IMPACT_PAGE_MAX: int = 5000  # Largest page a request may ask for
+    IMPACT_VISUALIZATION_MAX_NODES: int = 150  # Nodes in the impact subgraph before collapsing into files
+    
     # LLM settings
     LLM_MODEL: str = "gemini-1.5-flash"  # Updated to latest model
     LLM_TEMPERATURE: float = 0.3
     LLM_MAX_TOKENS: int = 2000
+    LLM_API_BASE: str = "https://generativelanguage.googleapis.com/v1beta"  # Point at a local mock to test
+    LLM_CONCURRENCY: int = 16  # Annotation requests in flight at once (and pooled connections)
+    LLM_REQUESTS_PER_MINUTE: int = 0  # Provider rate limit to pace requests to (0 = no pacing)
+    LLM_MAX_RETRIES: int = 3  # Retries of rate-limited (429) or unavailable (503) responses
+    LLM_TIMEOUT_SECONDS: float = 30.0
     
     class Config:
         env_file = ".env"
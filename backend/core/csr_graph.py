@@ -0,0 +1,351 @@
+"""
+CSR graph
+Read-only directed graph over integer node ids, stored as forward and
+reverse compressed sparse row arrays. Degrees, breadth-first traversal
+and subgraph extraction work on whole arrays at a time.
+"""
+from functools import cached_property
+from typing import Iterable, Iterator, Optional, Tuple
+
+import networkx as nx
+import numpy as np
+
+# Distance of nodes a traversal did not reach
+UNREACHED = -1
+
+
+def _compress(num_nodes: int, keys: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Offsets and neighbor array for edges given as (key -> value), sorted by key"""
+    order = np.argsort(keys, kind='stable')
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_nodes), out=offsets[1:])
+    return offsets, values[order].astype(np.int32)
+
+
+def sorted_unique(values: np.ndarray) -> np.ndarray:
+    """Sorted distinct values, by sort and mask (cheaper than np.unique on large arrays)"""
+    values = np.sort(values)
+    if len(values) < 2:
+        return values
+    keep = np.empty(len(values), dtype=bool)
+    keep[0] = True
+    np.not_equal(values[1:], values[:-1], out=keep[1:])
+    return values[keep]
+
+
+def _as_ids(nodes: Iterable[int]) -> np.ndarray:
+    if not isinstance(nodes, np.ndarray):
+        nodes = np.fromiter(nodes, dtype=np.int64)
+    return nodes.astype(np.int64, copy=False)
+
+
+def expand(offsets: np.ndarray, neighbors: np.ndarray, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Every edge out of the frontier nodes, as (tails, heads) arrays"""
+    starts = offsets[frontier]
+    counts = offsets[frontier + 1] - starts
+    total = int(counts.sum())
+    if not total:
+        return frontier[:0], neighbors[:0]
+    # Position of each output slot inside its node's neighbor list
+    shifts = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return np.repeat(frontier, counts), neighbors[np.arange(total, dtype=np.int64) + shifts]
+
+
+def strong_components(num_nodes: int, offsets: np.ndarray, neighbors: np.ndarray,
+                      nodes: Iterable[int]) -> Tuple[np.ndarray, int]:
+    """
+    Strongly connected components of the given nodes (iterative Tarjan)
+
+    Returns (component id per node id, UNREACHED for ids not in nodes;
+    number of components). Components are numbered in the order Tarjan
+    completes them, which is reverse topological: every edge between two
+    components goes from the higher id to the lower.
+    """
+    offsets, neighbors = offsets.tolist(), neighbors.tolist()
+    index = [UNREACHED] * num_nodes
+    low = [0] * num_nodes
+    on_stack = [False] * num_nodes
+    component = np.full(num_nodes, UNREACHED, dtype=np.int64)
+    stack = []
+    counter = components = 0
+    for root in nodes:
+        if index[root] != UNREACHED:
+            continue
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        # (node, position of its next unvisited edge)
+        work = [(root, offsets[root])]
+        while work:
+            node, pos = work[-1]
+            end = offsets[node + 1]
+            while pos < end:
+                neighbor = neighbors[pos]
+                pos += 1
+                if index[neighbor] == UNREACHED:
+                    work[-1] = (node, pos)
+                    index[neighbor] = low[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack[neighbor] = True
+                    work.append((neighbor, offsets[neighbor]))
+                    break
+                if on_stack[neighbor] and index[neighbor] < low[node]:
+                    low[node] = index[neighbor]
+            else:
+                work.pop()
+                if work and low[node] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[node]
+                if low[node] == index[node]:
+                    while True:
+                        member = stack.pop()
+                        on_stack[member] = False
+                        component[member] = components
+                        if member == node:
+                            break
+                    components += 1
+    return component, components
+
+
+class Condensation:
+    """
+    A graph with each strongly connected component collapsed to one node
+
+    `dag` is a CSRGraph over component ids (no self-loops), numbered in
+    reverse topological order; members of a component are read back with
+    members(). Components are found with Tarjan unless given (e.g. when
+    loaded from core.graph_store); everything else is derived on first use.
+    """
+
+    def __init__(self, graph: 'CSRGraph', components: Optional[Tuple[np.ndarray, int]] = None):
+        self.graph = graph
+        if components is None:
+            components = strong_components(
+                graph.num_nodes, graph.fwd_offsets, graph.fwd_targets, graph.node_array().tolist()
+            )
+        self.component_of, self.count = components
+
+    @cached_property
+    def dag(self) -> 'CSRGraph':
+        sources, targets = self.graph.edge_arrays()
+        sources, targets = self.component_of[sources], self.component_of[targets]
+        crossing = sources != targets
+        return CSRGraph(self.count, sources[crossing], targets[crossing], np.ones(self.count, dtype=bool))
+
+    @cached_property
+    def _members(self) -> Tuple[np.ndarray, np.ndarray]:
+        nodes = self.graph.node_array()
+        return _compress(self.count, self.component_of[nodes], nodes)
+
+    @property
+    def member_offsets(self) -> np.ndarray:
+        return self._members[0]
+
+    def sizes(self) -> np.ndarray:
+        """Number of members of every component"""
+        return np.diff(self.member_offsets)
+
+    def members(self, components: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Every node of the given components, as (component, node) arrays"""
+        return expand(*self._members, _as_ids(components))
+
+
+class CSRGraph:
+    """
+    Compact directed graph
+
+    Node ids are symbol table rows, so the id space can have gaps (rows
+    that are not in the graph); `present` marks the ones that are.
+    Parallel edges are merged. About 8 bytes per edge (4 forward, 4
+    reverse) plus 16 bytes per id, so 2M edges fit in well under 50 MB.
+
+    The networkx read methods the agents use (nodes, edges, degrees,
+    successors, predecessors, subgraph, ...) are provided so code written
+    against nx.DiGraph can take a CSRGraph unchanged.
+    """
+
+    def __init__(self, num_nodes: int, sources: Iterable[int] = (), targets: Iterable[int] = (),
+                 present: Optional[np.ndarray] = None):
+        sources = np.asarray(sources, dtype=np.int64).ravel()
+        targets = np.asarray(targets, dtype=np.int64).ravel()
+        if len(sources):
+            # Merge parallel edges
+            keys = sorted_unique(sources * num_nodes + targets)
+            sources, targets = keys // num_nodes, keys % num_nodes
+        if present is None:
+            present = np.zeros(num_nodes, dtype=bool)
+            present[sources] = True
+            present[targets] = True
+        self.num_nodes = num_nodes
+        self.present = np.asarray(present, dtype=bool)
+        self.fwd_offsets, self.fwd_targets = _compress(num_nodes, sources, targets)
+        self.rev_offsets, self.rev_sources = _compress(num_nodes, targets, sources)
+
+    @classmethod
+    def from_networkx(cls, graph: nx.DiGraph, num_nodes: Optional[int] = None) -> 'CSRGraph':
+        """Freeze an nx.DiGraph whose nodes are integers below num_nodes"""
+        if num_nodes is None:
+            num_nodes = max(graph.nodes(), default=-1) + 1
+        count = graph.number_of_edges()
+        edges = np.fromiter(
+            (node for edge in graph.edges() for node in edge), dtype=np.int64, count=2 * count
+        ).reshape(count, 2)
+        present = np.zeros(num_nodes, dtype=bool)
+        present[np.fromiter(graph.nodes(), dtype=np.int64, count=graph.number_of_nodes())] = True
+        return cls(num_nodes, edges[:, 0], edges[:, 1], present)
+
+    @classmethod
+    def from_arrays(cls, present: np.ndarray, fwd_offsets: np.ndarray, fwd_targets: np.ndarray,
+                    rev_offsets: np.ndarray, rev_sources: np.ndarray) -> 'CSRGraph':
+        """Wrap arrays that are already in CSR form (e.g. from core.graph_store) without copying"""
+        graph = cls.__new__(cls)
+        graph.num_nodes = len(present)
+        graph.present = present
+        graph.fwd_offsets, graph.fwd_targets = fwd_offsets, fwd_targets
+        graph.rev_offsets, graph.rev_sources = rev_offsets, rev_sources
+        return graph
+
+    # Array API
+
+    def out_degrees(self) -> np.ndarray:
+        return np.diff(self.fwd_offsets)
+
+    def in_degrees(self) -> np.ndarray:
+        return np.diff(self.rev_offsets)
+
+    def degrees(self) -> np.ndarray:
+        return self.out_degrees() + self.in_degrees()
+
+    def node_array(self) -> np.ndarray:
+        return np.flatnonzero(self.present)
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(sources, targets), sorted by source then target"""
+        sources = np.repeat(np.arange(self.num_nodes, dtype=np.int32), self.out_degrees())
+        return sources, self.fwd_targets
+
+    def bfs_distances(self, sources: Iterable[int], reverse: bool = False,
+                      max_depth: Optional[int] = None) -> np.ndarray:
+        """
+        Hop count from the nearest source to every node (UNREACHED if none)
+
+        Follows edges forward, or backward when reverse is set; each level
+        is expanded with a handful of array operations.
+        """
+        offsets, neighbors = (self.rev_offsets, self.rev_sources) if reverse else (self.fwd_offsets, self.fwd_targets)
+        distance = np.full(self.num_nodes, UNREACHED, dtype=np.int32)
+        frontier = sorted_unique(_as_ids(sources))
+        distance[frontier] = 0
+        depth = 0
+        while len(frontier) and (max_depth is None or depth < max_depth):
+            depth += 1
+            _, reached = expand(offsets, neighbors, frontier)
+            reached = sorted_unique(reached[distance[reached] == UNREACHED])
+            distance[reached] = depth
+            frontier = reached
+        return distance
+
+    def reachable(self, sources: Iterable[int], reverse: bool = False) -> np.ndarray:
+        """Boolean mask of nodes reachable from sources, sources included"""
+        return self.bfs_distances(sources, reverse) != UNREACHED
+
+    def descendants(self, node: int) -> np.ndarray:
+        """Nodes reachable from node, not counting node itself (like nx.descendants)"""
+        mask = self.reachable([node])
+        mask[node] = False
+        return np.flatnonzero(mask)
+
+    def ancestors(self, node: int) -> np.ndarray:
+        """Nodes that reach node, not counting node itself (like nx.ancestors)"""
+        mask = self.reachable([node], reverse=True)
+        mask[node] = False
+        return np.flatnonzero(mask)
+
+    def sole_successors(self, node: int) -> np.ndarray:
+        """Successors of node that have no other predecessor, sorted"""
+        offsets, nodes = self._sole_successor_index
+        return nodes[offsets[node]:offsets[node + 1]]
+
+    @cached_property
+    def _sole_successor_index(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Nodes with in-degree 1 grouped by their predecessor, as CSR arrays (built on first use)"""
+        nodes = np.flatnonzero(self.in_degrees() == 1)
+        return _compress(self.num_nodes, self.rev_sources[self.rev_offsets[nodes]], nodes)
+
+    @cached_property
+    def condensation(self) -> Condensation:
+        """Strongly connected components and the DAG between them (built on first use)"""
+        return Condensation(self)
+
+    @cached_property
+    def reachability(self) -> 'ReachabilityIndex':
+        """Reachability index over the condensation (built on first use unless loaded with the graph)"""
+        from core.reachability import ReachabilityIndex
+        return ReachabilityIndex.build(self)
+
+    def subgraph(self, nodes: Iterable[int]) -> 'CSRGraph':
+        """Induced subgraph in the same id space; only the given nodes' edges are read"""
+        keep = np.zeros(self.num_nodes, dtype=bool)
+        keep[_as_ids(nodes)] = True
+        keep &= self.present
+        sources, targets = expand(self.fwd_offsets, self.fwd_targets, np.flatnonzero(keep))
+        inside = keep[targets]
+        return CSRGraph(self.num_nodes, sources[inside], targets[inside], keep)
+
+    # networkx-compatible API
+
+    def __contains__(self, node: int) -> bool:
+        return self.has_node(node)
+
+    def __len__(self) -> int:
+        return self.number_of_nodes()
+
+    def has_node(self, node: int) -> bool:
+        return 0 <= node < self.num_nodes and bool(self.present[node])
+
+    def has_edge(self, source: int, target: int) -> bool:
+        if not self.has_node(source):
+            return False
+        neighbors = self.fwd_targets[self.fwd_offsets[source]:self.fwd_offsets[source + 1]]
+        # Neighbor lists are sorted
+        pos = np.searchsorted(neighbors, target)
+        return bool(pos < len(neighbors) and neighbors[pos] == target)
+
+    def number_of_nodes(self) -> int:
+        return int(self.present.sum())
+
+    def number_of_edges(self) -> int:
+        return len(self.fwd_targets)
+
+    def nodes(self) -> Iterator[int]:
+        return iter(self.node_array().tolist())
+
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        sources, targets = self.edge_arrays()
+        return zip(sources.tolist(), targets.tolist())
+
+    def successors(self, node: int) -> Iterator[int]:
+        return iter(self.fwd_targets[self.fwd_offsets[node]:self.fwd_offsets[node + 1]].tolist())
+
+    def predecessors(self, node: int) -> Iterator[int]:
+        return iter(self.rev_sources[self.rev_offsets[node]:self.rev_offsets[node + 1]].tolist())
+
+    def out_degree(self, node: Optional[int] = None):
+        if node is None:
+            return self._degree_pairs(self.out_degrees())
+        return int(self.fwd_offsets[node + 1] - self.fwd_offsets[node])
+
+    def in_degree(self, node: Optional[int] = None):
+        if node is None:
+            return self._degree_pairs(self.in_degrees())
+        return int(self.rev_offsets[node + 1] - self.rev_offsets[node])
+
+    def degree(self, node: Optional[int] = None):
+        if node is None:
+            return self._degree_pairs(self.degrees())
+        return self.out_degree(node) + self.in_degree(node)
+
+    def _degree_pairs(self, degrees: np.ndarray) -> Iterator[Tuple[int, int]]:
+        nodes = self.node_array()
+        return zip(nodes.tolist(), degrees[nodes].tolist())
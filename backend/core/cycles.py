@@ -0,0 +1,159 @@
+"""
+Cycle detection
+Strongly connected components in linear time, plus a few short
+representative cycles per component from a lazy, time-boxed search
+"""
+import time
+from typing import Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+import networkx as nx
+
+# How often (in visited nodes) the cycle search looks at the clock
+_CLOCK_INTERVAL = 1024
+
+
+def cyclic_components(graph: nx.DiGraph) -> List[List[int]]:
+    """
+    Strongly connected components that contain a cycle, largest first
+
+    That is every component with more than one member, plus single nodes
+    with a self-loop. Members are sorted, and so is the component order
+    among components of equal size, so the numbering is stable.
+    """
+    components = []
+    for component in nx.strongly_connected_components(graph):
+        if len(component) > 1:
+            components.append(sorted(component))
+        else:
+            (node,) = component
+            if graph.has_edge(node, node):
+                components.append([node])
+    components.sort(key=lambda members: (-len(members), members[0]))
+    return components
+
+
+def _cycle_through(graph: nx.DiGraph, start: int, inside: Set[int], deadline: float) -> Optional[List[int]]:
+    """
+    Shortest cycle through start inside one component, or None on timeout
+
+    Searches forward from start and backward into start at the same time,
+    always growing the smaller frontier, so a giant component is explored
+    to about half the cycle's length from each side instead of all of it.
+    """
+    if graph.has_edge(start, start):
+        return [start]
+    # node -> next node towards start (forward: parent, backward: child)
+    forward: Dict[int, Optional[int]] = {start: None}
+    backward: Dict[int, Optional[int]] = {start: None}
+    forward_frontier, backward_frontier = [start], [start]
+    visited = 0
+
+    while forward_frontier and backward_frontier:
+        grow_forward = len(forward_frontier) <= len(backward_frontier)
+        frontier = forward_frontier if grow_forward else backward_frontier
+        reached, other = (forward, backward) if grow_forward else (backward, forward)
+        neighbors = graph.successors if grow_forward else graph.predecessors
+        next_frontier = []
+        for node in frontier:
+            visited += 1
+            if visited % _CLOCK_INTERVAL == 0 and time.perf_counter() > deadline:
+                return None
+            for neighbor in neighbors(node):
+                if neighbor in other:
+                    # The edge node -> neighbor (or neighbor -> node) closes the cycle
+                    if grow_forward:
+                        return _join(forward, backward, node, neighbor)
+                    return _join(forward, backward, neighbor, node)
+                if neighbor in inside and neighbor not in reached:
+                    reached[neighbor] = node
+                    next_frontier.append(neighbor)
+        if grow_forward:
+            forward_frontier = next_frontier
+        else:
+            backward_frontier = next_frontier
+    return None
+
+
+def _join(forward: Dict[int, Optional[int]], backward: Dict[int, Optional[int]], tail: int, head: int) -> List[int]:
+    """Cycle start -> ... -> tail -> head -> ... -> (start) from the two search trees"""
+    cycle = []
+    node = tail
+    while node is not None:
+        cycle.append(node)
+        node = forward[node]
+    cycle.reverse()
+    node = head
+    while node is not None and node != cycle[0]:
+        cycle.append(node)
+        node = backward[node]
+    return cycle
+
+
+def shortest_cycles(graph: nx.DiGraph, members: List[int], deadline: float) -> Iterator[List[int]]:
+    """
+    Lazily yield distinct cycles inside one component, shortest per start node
+
+    Nothing is computed until the caller asks for the next cycle, and the
+    search stops once the deadline (a time.perf_counter() value) passes.
+    """
+    inside: Set[int] = set(members)
+    seen = set()
+    for start in members:
+        if time.perf_counter() > deadline:
+            return
+        cycle = _cycle_through(graph, start, inside, deadline)
+        if cycle is None:
+            return
+        # The same cycle is found again from each of its members
+        key = frozenset(cycle)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield cycle
+
+
+def cycle_report(
+    graph: nx.DiGraph,
+    cycles_per_component: int,
+    time_budget: float,
+    components: Optional[List[Tuple[Hashable, List[int]]]] = None,
+    cache: Optional[Dict[Hashable, List[List[int]]]] = None
+) -> Dict:
+    """
+    Cyclic components with up to cycles_per_component short cycles each
+
+    Components are always complete. Listing cycles then shares
+    time_budget seconds across components, largest first, and
+    "truncated" says whether it ran out.
+
+    components are (key, members) pairs, largest first, from a source that
+    keeps them up to date (core.graph_metrics); they are found here when
+    omitted. cache maps those keys to cycles listed by earlier reports, so
+    only new components are searched; keys that are gone are dropped.
+
+    Returns:
+        {"components": [{"members": [...], "cycles": [[...], ...]}, ...],
+         "truncated": bool}
+    """
+    if components is None:
+        components = list(enumerate(cyclic_components(graph)))
+    if cache is not None:
+        for key in set(cache) - {key for key, _ in components}:
+            del cache[key]
+    deadline = time.perf_counter() + time_budget
+    report = []
+    truncated = False
+    for key, members in components:
+        cycles = cache.get(key) if cache is not None else None
+        if cycles is None:
+            cycles = []
+            if not truncated:
+                for cycle in shortest_cycles(graph, members, deadline):
+                    cycles.append(cycle)
+                    if len(cycles) >= cycles_per_component:
+                        break
+                truncated = time.perf_counter() > deadline
+                if not truncated and cache is not None:
+                    cache[key] = cycles
+        report.append({"members": members, "cycles": cycles})
+    return {"components": report, "truncated": truncated}
@@ -0,0 +1,157 @@
+"""
+Source file walker
+Single os.scandir pass over a repository that prunes excluded and
+.gitignore'd directories before descending into them
+"""
+import os
+import re
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+# (path relative to repo root, language, size in bytes)
+SourceFile = Tuple[str, str, int]
+
+
+class IgnoreRule:
+    """One .gitignore pattern, relative to the directory that declared it"""
+
+    __slots__ = ('base', 'regex', 'negate', 'dir_only', 'anchored')
+
+    def __init__(self, base: str, pattern: str):
+        self.base = base
+        self.negate = pattern.startswith('!')
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # A slash anywhere but the end anchors the pattern to its directory
+        self.anchored = '/' in pattern
+        self.regex = re.compile(_translate(pattern.lstrip('/')))
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + '/'):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        target = rel_path if self.anchored else rel_path.rsplit('/', 1)[-1]
+        return self.regex.fullmatch(target) is not None
+
+
+def _translate(pattern: str) -> str:
+    """Translate a gitignore glob into a regular expression"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            out.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('/**', i) and i + 3 == n:
+            out.append('/.*')
+            i += 3
+        elif pattern.startswith('**', i):
+            out.append('.*')
+            i += 2
+        elif c == '*':
+            out.append('[^/]*')
+            i += 1
+        elif c == '?':
+            out.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = pattern.find(']', i + 1)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith('!'):
+                    body = '^' + body[1:]
+                out.append(f'[{body}]')
+                i = end + 1
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return ''.join(out)
+
+
+def load_gitignore(dir_path: str, rel_dir: str) -> List[IgnoreRule]:
+    """Parse dir_path/.gitignore, if present"""
+    rules = []
+    try:
+        with open(os.path.join(dir_path, '.gitignore'), encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                line = line.rstrip('\n').rstrip()
+                if not line or line.startswith('#'):
+                    continue
+                rules.append(IgnoreRule(rel_dir, line))
+    except OSError:
+        pass
+    return rules
+
+
+def is_ignored(rules: List[IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+    """Last matching rule wins, as in git"""
+    ignored = False
+    for rule in rules:
+        if rule.matches(rel_path, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+def walk_source_files(
+    root: str,
+    extensions: Dict[str, str],
+    exclude_dirs: Iterable[str] = (),
+    use_gitignore: bool = True
+) -> Iterator[SourceFile]:
+    """
+    Lazily yield (relative path, language, size) for every source file
+
+    Args:
+        root: Repository root
+        extensions: Map of file extension to language
+        exclude_dirs: Directory names that are never descended into
+        use_gitignore: Whether to honour .gitignore files along the way
+    """
+    exclude = set(exclude_dirs)
+    # (absolute dir, path relative to root, rules in effect)
+    stack: List[Tuple[str, str, List[IgnoreRule]]] = [(root, '', [])]
+
+    while stack:
+        dir_path, rel_dir, rules = stack.pop()
+        if use_gitignore:
+            local = load_gitignore(dir_path, rel_dir)
+            if local:
+                rules = rules + local
+
+        try:
+            with os.scandir(dir_path) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in exclude or (rules and is_ignored(rules, rel_path, True)):
+                        continue
+                    subdirs.append((entry.path, rel_path, rules))
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                language = extensions.get(os.path.splitext(entry.name)[1])
+                if language is None or (rules and is_ignored(rules, rel_path, False)):
+                    continue
+                yield rel_path, language, entry.stat(follow_symlinks=False).st_size
+            except OSError:
+                continue
+
+        # Push in reverse so directories are visited in sorted order
+        stack.extend(reversed(subdirs))
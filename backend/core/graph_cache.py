@@ -0,0 +1,202 @@
+"""
+Graph cache
+Process-wide, memory-bounded LRU of loaded dependency graphs (and their
+rollups), so interactive queries (impact, rollups) skip the database and
+decoding after the first request for a project's analysis
+"""
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterator, Optional, Set, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from core.csr_graph import CSRGraph, Condensation
+from core.reachability import ReachabilityIndex
+from core.rollup import GraphRollup
+from core.symbol_table import SymbolTable
+
+# (project id, dependency_mapper analysis id)
+GraphKey = Tuple[int, int]
+LoadedGraph = Tuple[SymbolTable, CSRGraph]
+
+# Rough heap cost of a loaded symbol table row: its row-key dict entry,
+# name string and array slots, plus one boxed value per optional column
+_ROW_BYTES = 150
+_COLUMN_VALUE_BYTES = 40
+# Rough heap cost of a rollup aggregate: its path, list slot and index entry
+_AGGREGATE_BYTES = 150
+
+
+def _arrays(value, seen: Set[int]) -> Iterator[np.ndarray]:
+    """Every numpy array a graph holds, including its condensation and
+    reachability index (and their lazily built parts) once built"""
+    if id(value) in seen:
+        return
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        yield value
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            yield from _arrays(item, seen)
+    elif isinstance(value, (CSRGraph, Condensation, ReachabilityIndex)):
+        for item in vars(value).values():
+            yield from _arrays(item, seen)
+
+
+def _buffer(array: np.ndarray):
+    """The object that owns an array's memory (e.g. a stored graph blob)"""
+    while isinstance(array, np.ndarray) and array.base is not None:
+        array = array.base
+    return array.obj if isinstance(array, memoryview) else array
+
+
+def graph_nbytes(symbols: SymbolTable, graph: CSRGraph) -> int:
+    """
+    Approximate memory held by a loaded graph
+
+    Arrays are counted by the buffer that owns them, so a graph decoded
+    from core.graph_store counts its whole blob once, however many
+    arrays are views into it.
+    """
+    buffers = {}
+    for array in _arrays(graph, set()):
+        owner = _buffer(array)
+        buffers[id(owner)] = owner.nbytes if isinstance(owner, np.ndarray) else len(memoryview(owner).cast('B'))
+    return sum(buffers.values()) + len(symbols) * (
+        _ROW_BYTES + _COLUMN_VALUE_BYTES * len(symbols.columns)
+    )
+
+
+def rollup_nbytes(rollup: GraphRollup) -> int:
+    """Approximate memory held by a rollup on top of its graph"""
+    arrays = (rollup.rows, rollup.sources, rollup.targets, *rollup.codes.values())
+    return sum(array.nbytes for array in arrays) + _AGGREGATE_BYTES * sum(
+        len(names) for names in rollup.names.values()
+    )
+
+
+class _Flight:
+    """One in-progress load that other callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[LoadedGraph] = None
+        self.error: Optional[BaseException] = None
+
+
+class GraphCache:
+    """
+    LRU of (symbols, graph) pairs bounded by their approximate size
+
+    Each entry can also keep the graph's GraphRollup (see rollup()),
+    counted in its size and dropped with it.
+
+    Keys carry the analysis id, so a newer analysis is never answered
+    from an older graph; invalidate() additionally frees a project's
+    entries as soon as its next analysis completes. Concurrent get()
+    calls for the same key share one load.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        # key -> (graph, size, rollup or None)
+        self._entries: 'OrderedDict[GraphKey, Tuple[LoadedGraph, int, Optional[GraphRollup]]]' = OrderedDict()
+        self._loading: Dict[GraphKey, _Flight] = {}
+        # Bumped by invalidate(), so loads that started before it are not kept
+        self._generations: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: GraphKey, load: Callable[[], LoadedGraph]) -> LoadedGraph:
+        """Cached graph for key, calling load (once, whoever asks meanwhile) on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry[0]
+            flight = self._loading.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._loading[key] = _Flight()
+                generation = self._generations.get(key[0], 0)
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = load()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._loading[key]
+                if flight.error is None and self._generations.get(key[0], 0) == generation:
+                    self._put(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def rollup(self, key: GraphKey, load: Callable[[], LoadedGraph]) -> GraphRollup:
+        """Rollup of the graph for key, built on first use and then kept with the cached graph"""
+        value = self.get(key, load)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is value and entry[2] is not None:
+                return entry[2]
+
+        rollup = GraphRollup(value[0], *value[1].edge_arrays())
+        with self._lock:
+            entry = self._entries.get(key)
+            # Only attach to the entry it was built from (not a reloaded one)
+            if entry is not None and entry[0] is value and entry[2] is None:
+                size = entry[1] + rollup_nbytes(rollup)
+                if size > self.max_bytes:
+                    return rollup
+                self._entries[key] = (value, size, rollup)
+                self._entries.move_to_end(key)
+                self.size += size - entry[1]
+                self._evict()
+        return rollup
+
+    def invalidate(self, project_id: int):
+        """Drop every cached graph of a project"""
+        with self._lock:
+            self._generations[project_id] = self._generations.get(project_id, 0) + 1
+            for key in [key for key in self._entries if key[0] == project_id]:
+                self.size -= self._entries.pop(key)[1]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _put(self, key: GraphKey, value: LoadedGraph):
+        size = graph_nbytes(*value)
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (value, size, None)
+        self.size += size
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits"""
+        while self.size > self.max_bytes:
+            _, (_, evicted, _) = self._entries.popitem(last=False)
+            self.size -= evicted
+
+
+_graph_cache: Optional[GraphCache] = None
+_graph_cache_lock = threading.Lock()
+
+
+def get_graph_cache() -> GraphCache:
+    """Return the process-wide graph cache (GRAPH_CACHE_MAX_MB=0 keeps nothing)"""
+    global _graph_cache
+    with _graph_cache_lock:
+        if _graph_cache is None:
+            _graph_cache = GraphCache(settings.GRAPH_CACHE_MAX_MB * 1024 * 1024)
+    return _graph_cache
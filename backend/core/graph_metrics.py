@@ -0,0 +1,351 @@
+"""
+Graph metrics
+Degree rankings and strongly connected components of a dependency graph,
+kept up to date from node and edge changes instead of recomputed
+"""
+import heapq
+from collections import Counter, deque
+from itertools import count
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import networkx as nx
+
+Edge = Tuple[int, int]
+Neighbors = Callable[[int], Iterable[int]]
+
+
+def _reach(
+    starts: Iterable[int],
+    neighbors: Neighbors,
+    within: Optional[Set[int]] = None,
+    goals: Optional[Set[int]] = None
+) -> Set[int]:
+    """
+    Nodes reachable from starts (included), optionally only inside within;
+    stops early once every node of goals has been seen
+    """
+    seen = {node for node in starts if within is None or node in within}
+    missing = len(goals - seen) if goals is not None else -1
+    queue = deque(seen)
+    while queue and missing:
+        node = queue.popleft()
+        for neighbor in neighbors(node):
+            if neighbor not in seen and (within is None or neighbor in within):
+                seen.add(neighbor)
+                queue.append(neighbor)
+                if goals is not None and neighbor in goals:
+                    missing -= 1
+    return seen
+
+
+def _strong_components(nodes: Set[int], successors: Neighbors) -> List[Set[int]]:
+    """Strongly connected components of the subgraph induced by nodes (iterative Tarjan)"""
+    index: Dict[int, int] = {}
+    low: Dict[int, int] = {}
+    stack: List[int] = []
+    on_stack: Set[int] = set()
+    components = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in nodes:
+                    continue
+                if neighbor not in index:
+                    index[neighbor] = low[neighbor] = len(index)
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(successors(neighbor))))
+                    break
+                if neighbor in on_stack and index[neighbor] < low[node]:
+                    low[node] = index[neighbor]
+            else:
+                work.pop()
+                if work and low[node] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[node]
+                if low[node] == index[node]:
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+class _DegreeBuckets:
+    """degree -> nodes, so the top of the ranking is read without sorting every node"""
+
+    def __init__(self):
+        self.degree: Dict[int, int] = {}
+        self.buckets: Dict[int, Set[int]] = {}
+
+    def place(self, node: int, degree: int):
+        old = self.degree.get(node)
+        if old == degree:
+            return
+        if old is not None:
+            self._discard(node, old)
+        self.degree[node] = degree
+        self.buckets.setdefault(degree, set()).add(node)
+
+    def drop(self, node: int):
+        old = self.degree.pop(node, None)
+        if old is not None:
+            self._discard(node, old)
+
+    def _discard(self, node: int, degree: int):
+        bucket = self.buckets[degree]
+        bucket.discard(node)
+        if not bucket:
+            del self.buckets[degree]
+
+    def top(self, k: int) -> List[int]:
+        """k highest-degree nodes, ties broken by node id"""
+        result = []
+        for degree in sorted(self.buckets, reverse=True):
+            result.extend(heapq.nsmallest(k - len(result), self.buckets[degree]))
+            if len(result) >= k:
+                break
+        return result
+
+    def nodes_with(self, degree: int) -> List[int]:
+        return sorted(self.buckets.get(degree, ()))
+
+
+class GraphMetrics:
+    """
+    Derived metrics of an nx.DiGraph, maintained under deltas
+
+    rebuild() computes everything in one linear pass; update() then takes
+    the nodes and edges a delta removed and added (after the graph itself
+    was changed) and only revisits what those can affect:
+
+    - degrees: the endpoints of changed edges move between buckets
+    - components: a removed edge or node can only split its own
+      component, and it did not if the surviving endpoints of the removed
+      edges still reach each other. An added edge u -> v can only merge
+      the components on paths from v back to u; those are found on the
+      condensation, where a component is one unit whose neighbors are
+      its counted external edges, so its internal edges are never walked.
+
+    Only components that contain a cycle are tracked.
+    """
+
+    def __init__(self, graph: nx.DiGraph):
+        self.graph = graph
+        self.in_degree = _DegreeBuckets()
+        self.degree = _DegreeBuckets()
+        # node -> component id, and component id -> members
+        self.component_of: Dict[int, int] = {}
+        self.members: Dict[int, Set[int]] = {}
+        # component id -> outside node -> number of edges to / from it
+        self.out_edges: Dict[int, Counter[int]] = {}
+        self.in_edges: Dict[int, Counter[int]] = {}
+        self._ids = count()
+        # Component id -> representative cycles (see core.cycles.cycle_report);
+        # a component gets a new id whenever it may have lost an edge
+        self.cycle_cache: Dict[int, List[List[int]]] = {}
+
+    def rebuild(self):
+        self.in_degree = _DegreeBuckets()
+        self.degree = _DegreeBuckets()
+        self.component_of = {}
+        self.members = {}
+        self.out_edges = {}
+        self.in_edges = {}
+        self.cycle_cache = {}
+        for node in self.graph.nodes():
+            self._place(node)
+        self._add_components(nx.strongly_connected_components(self.graph))
+
+    def update(
+        self,
+        removed_nodes: Iterable[int],
+        removed_edges: Iterable[Edge],
+        added_nodes: Iterable[int],
+        added_edges: Iterable[Edge]
+    ):
+        removed_nodes, removed_edges = list(removed_nodes), list(removed_edges)
+        added_nodes, added_edges = list(added_nodes), list(added_edges)
+
+        # Degrees
+        for node in removed_nodes:
+            self.in_degree.drop(node)
+            self.degree.drop(node)
+        touched = set(added_nodes)
+        touched.update(node for edge in removed_edges + added_edges for node in edge)
+        for node in touched:
+            if node in self.graph:
+                self._place(node)
+
+        # External edge counts, against the components as they were
+        for source, target in removed_edges:
+            self._count_edge(source, target, -1)
+        for source, target in added_edges:
+            self._count_edge(source, target, 1)
+
+        # Components that lost an edge: still strongly connected if the
+        # surviving endpoints of the lost edges all reach each other (any
+        # old path can detour between them), otherwise split them up
+        ends: Dict[int, Set[int]] = {}
+        for node in removed_nodes:
+            if node in self.component_of:
+                ends.setdefault(self.component_of[node], set())
+        for source, target in removed_edges:
+            component = self.component_of.get(source)
+            if component is not None and component == self.component_of.get(target):
+                ends.setdefault(component, set()).update(
+                    node for node in (source, target) if node in self.graph
+                )
+        for component, component_ends in ends.items():
+            members = self._pop_component(component)
+            out_edges, in_edges = self.out_edges.pop(component), self.in_edges.pop(component)
+            members = {node for node in members if node in self.graph}
+            if len(members) > 1 and component_ends and self._still_connected(members, component_ends):
+                self._new_component(members, out_edges, in_edges)
+            else:
+                self._add_components(_strong_components(members, self.graph.successors))
+
+        # Components merged by added edges: units reachable from an edge's
+        # target and reaching its source (backward first, then forward
+        # inside that set), then grouped by strong connectivity
+        crossing = [
+            (source, target) for source, target in added_edges
+            if source == target
+            or source not in self.component_of
+            or self.component_of[source] != self.component_of.get(target)
+        ]
+        if not crossing:
+            return
+        backward = _reach({self._unit(source) for source, _ in crossing}, self._unit_predecessors)
+        region = _reach({self._unit(target) for _, target in crossing}, self._unit_successors, backward)
+        for units in _strong_components(region, self._unit_successors):
+            unit = next(iter(units))
+            if len(units) > 1 or (unit >= 0 and self.graph.has_edge(unit, unit)):
+                self._merge(units)
+
+    def components(self) -> List[Tuple[int, List[int]]]:
+        """Cyclic components as (id, sorted members), largest first"""
+        components = [(component, sorted(members)) for component, members in self.members.items()]
+        components.sort(key=lambda item: (-len(item[1]), item[1][0]))
+        return components
+
+    def isolated(self) -> List[int]:
+        """Nodes without any edge"""
+        return self.degree.nodes_with(0)
+
+    def _place(self, node: int):
+        self.in_degree.place(node, self.graph.in_degree(node))
+        self.degree.place(node, self.graph.degree(node))
+
+    def _count_edge(self, source: int, target: int, delta: int):
+        source_component = self.component_of.get(source)
+        target_component = self.component_of.get(target)
+        if source_component == target_component:
+            return
+        if source_component is not None:
+            self._bump(self.out_edges[source_component], target, delta)
+        if target_component is not None:
+            self._bump(self.in_edges[target_component], source, delta)
+
+    @staticmethod
+    def _bump(counts: Counter[int], node: int, delta: int):
+        counts[node] += delta
+        if counts[node] <= 0:
+            del counts[node]
+
+    def _still_connected(self, members: Set[int], ends: Set[int]) -> bool:
+        """Whether every node of ends reaches, and is reached from, one of them inside members"""
+        root = next(iter(ends))
+        return (
+            ends <= _reach([root], self.graph.successors, members, ends)
+            and ends <= _reach([root], self.graph.predecessors, members, ends)
+        )
+
+    # Condensation units: a node outside any component is itself (>= 0),
+    # a component is ~id (< 0)
+
+    def _unit(self, node: int) -> int:
+        component = self.component_of.get(node)
+        return node if component is None else ~component
+
+    def _unit_successors(self, unit: int) -> Iterator[int]:
+        nodes = self.out_edges[~unit] if unit < 0 else self.graph.successors(unit)
+        return (self._unit(node) for node in nodes)
+
+    def _unit_predecessors(self, unit: int) -> Iterator[int]:
+        nodes = self.in_edges[~unit] if unit < 0 else self.graph.predecessors(unit)
+        return (self._unit(node) for node in nodes)
+
+    def _merge(self, units: Set[int]):
+        """Join units into the largest component among them, keeping its id"""
+        components = sorted((~unit for unit in units if unit < 0), key=lambda c: -len(self.members[c]))
+        if components:
+            base = components[0]
+            components = components[1:]
+        else:
+            base = self._new_component(set(), Counter(), Counter())
+        absorbed = [unit for unit in units if unit >= 0]
+        for component in components:
+            absorbed.extend(self._pop_component(component))
+        members, out_edges, in_edges = self.members[base], self.out_edges[base], self.in_edges[base]
+        for node in absorbed:
+            self.component_of[node] = base
+        members.update(absorbed)
+
+        # Edges between the base and absorbed nodes are internal now
+        for node in absorbed:
+            out_edges.pop(node, None)
+            in_edges.pop(node, None)
+        for component in components:
+            for node, edges in self.out_edges.pop(component).items():
+                if node not in members:
+                    out_edges[node] += edges
+            for node, edges in self.in_edges.pop(component).items():
+                if node not in members:
+                    in_edges[node] += edges
+        for node in (unit for unit in units if unit >= 0):
+            for neighbor in self.graph.successors(node):
+                if neighbor not in members:
+                    out_edges[neighbor] += 1
+            for neighbor in self.graph.predecessors(node):
+                if neighbor not in members:
+                    in_edges[neighbor] += 1
+
+    def _pop_component(self, component: int) -> Set[int]:
+        members = self.members.pop(component)
+        for node in members:
+            del self.component_of[node]
+        return members
+
+    def _new_component(self, members: Set[int], out_edges: Counter[int], in_edges: Counter[int]) -> int:
+        component = next(self._ids)
+        self.members[component] = members
+        self.out_edges[component] = out_edges
+        self.in_edges[component] = in_edges
+        for node in members:
+            self.component_of[node] = component
+        return component
+
+    def _add_components(self, components: Iterable[Set[int]]):
+        """Track the cyclic ones among freshly computed components, counting their external edges"""
+        for members in components:
+            if len(members) == 1:
+                (node,) = members
+                if not self.graph.has_edge(node, node):
+                    continue
+            members = set(members)
+            out_edges, in_edges = Counter(), Counter()
+            for node in members:
+                out_edges.update(n for n in self.graph.successors(node) if n not in members)
+                in_edges.update(n for n in self.graph.predecessors(node) if n not in members)
+            self._new_component(members, out_edges, in_edges)
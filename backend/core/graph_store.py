@@ -0,0 +1,233 @@
+"""
+Graph store
+Compact binary encoding of a dependency graph (symbol table plus CSR
+arrays) for the dependency_graphs table, so loading a stored graph is a
+few buffer views instead of parsing JSON and rebuilding a graph
+"""
+import json
+import struct
+import zlib
+from functools import cached_property
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.csr_graph import CSRGraph, Condensation
+from core.reachability import ReachabilityIndex
+from core.symbol_table import SymbolTable
+
+MAGIC = b'CAGRAPH\0'
+# Bump whenever the layout changes; rows with another version are ignored
+FORMAT_VERSION = 1
+
+# magic, format version, manifest length
+_HEADER = struct.Struct('<8sII')
+_ALIGN = 8
+
+# Symbol table and CSR arrays: stored raw so loading is zero-copy
+_NODE_ARRAYS = (
+    ('file_ids', np.uint32),
+    ('name_ids', np.uint32),
+    ('type_ids', np.uint8),
+    ('line_start', np.uint32),
+    ('line_end', np.uint32),
+    ('alive', np.uint8),
+)
+_GRAPH_ARRAYS = (
+    ('present', np.bool_),
+    ('fwd_offsets', np.int64),
+    ('fwd_targets', np.int32),
+    ('rev_offsets', np.int64),
+    ('rev_sources', np.int32),
+)
+# Optional reachability index (core.reachability); closure and counts only when small
+_REACH_ARRAYS = (
+    ('reach_components', np.int32),
+    ('reach_ranks', np.int32),
+    ('reach_lows', np.int32),
+    ('reach_closure', np.uint64),
+    ('reach_counts', np.int64),
+)
+_DTYPES = dict(_NODE_ARRAYS + _GRAPH_ARRAYS + _REACH_ARRAYS)
+_STRINGS = ('files', 'names', 'types')
+_NUMERIC = {'int': np.int64, 'float': np.float64}
+
+
+class GraphFormatError(ValueError):
+    """Blob is not a stored graph, or was written by another format version"""
+
+
+def _column_kind(values: List[Any]) -> str:
+    """'int' or 'float' for numeric columns (stored as arrays), else 'json'"""
+    kind = 'int'
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            return 'json'
+        if isinstance(value, float):
+            kind = 'float'
+    return kind
+
+
+def _encode_column(kind: str, values: List[Any]) -> bytes:
+    """Numeric columns: set-mask bytes then values; others: JSON. Compressed either way."""
+    if kind == 'json':
+        raw = json.dumps(values, separators=(',', ':')).encode()
+    else:
+        mask = np.array([value is not None for value in values], dtype=np.uint8)
+        numbers = np.array([0 if value is None else value for value in values], dtype=_NUMERIC[kind])
+        raw = mask.tobytes() + numbers.tobytes()
+    return zlib.compress(raw)
+
+
+def _decode_column(kind: str, data: bytes, count: int) -> List[Any]:
+    raw = zlib.decompress(data)
+    if kind == 'json':
+        return json.loads(raw)
+    mask = np.frombuffer(raw, dtype=np.uint8, count=count)
+    values = np.frombuffer(raw, dtype=_NUMERIC[kind], offset=count).tolist()
+    for row in np.flatnonzero(mask == 0).tolist():
+        values[row] = None
+    return values
+
+
+def encode_graph(symbols: SymbolTable, graph: CSRGraph,
+                 reachability: Optional[ReachabilityIndex] = None) -> bytes:
+    """
+    Serialize a symbol table and its graph (node ids = table rows), and
+    optionally the graph's reachability index
+
+    Layout: header, JSON manifest, then 8-byte aligned sections. Fixed-
+    width arrays are raw little-endian, string tables and optional
+    columns are zlib-compressed.
+    """
+    if graph.num_nodes != len(symbols):
+        raise ValueError(f"Graph has {graph.num_nodes} node ids for {len(symbols)} rows")
+    sections: List[Tuple[str, bytes, str]] = []
+    strings = {}
+    for name in _STRINGS:
+        values = getattr(symbols, name).values
+        strings[name] = len(values)
+        sections.append((name, zlib.compress('\0'.join(values).encode()), 'zlib'))
+    for source, arrays in ((symbols, _NODE_ARRAYS), (graph, _GRAPH_ARRAYS)):
+        for name, dtype in arrays:
+            sections.append((name, np.asarray(getattr(source, name), dtype=dtype).tobytes(), 'raw'))
+    columns = {}
+    for name, values in symbols.columns.items():
+        columns[name] = _column_kind(values)
+        sections.append((f"column:{name}", _encode_column(columns[name], values), 'zlib'))
+
+    manifest: Dict[str, Any] = {
+        "num_nodes": graph.num_nodes,
+        "num_edges": graph.number_of_edges(),
+        "strings": strings,
+        "columns": columns,
+        "sections": {}
+    }
+    if reachability is not None:
+        for (name, dtype), array in zip(_REACH_ARRAYS, reachability.arrays()):
+            if array is not None:
+                sections.append((name, np.asarray(array, dtype=dtype).tobytes(), 'raw'))
+        manifest["reachability"] = {
+            "components": reachability.condensation.count,
+            "labels": reachability.ranks.shape[1]
+        }
+    # Offsets depend on the manifest's length, which depends on the offsets
+    offsets_width = 0
+    while True:
+        start = _HEADER.size + offsets_width
+        start += -start % _ALIGN
+        offset = start
+        for name, data, codec in sections:
+            manifest["sections"][name] = [offset, len(data), codec]
+            offset += len(data) + (-len(data) % _ALIGN)
+        encoded = json.dumps(manifest, separators=(',', ':')).encode()
+        if len(encoded) <= offsets_width:
+            break
+        offsets_width = len(encoded)
+
+    blob = bytearray(start)
+    blob[:_HEADER.size] = _HEADER.pack(MAGIC, FORMAT_VERSION, offsets_width)
+    blob[_HEADER.size:_HEADER.size + len(encoded)] = encoded
+    for name, data, _ in sections:
+        blob += data
+        blob += bytes(-len(data) % _ALIGN)
+    return bytes(blob)
+
+
+class StoredGraph:
+    """
+    Lazily decoded view of an encode_graph blob
+
+    Only the header and manifest are read up front. `graph` wraps the
+    stored CSR arrays in place (numpy views of the buffer, no copy), with
+    the stored reachability index (if any) attached the same way, and
+    `symbols` rebuilds the symbol table on first access. Any buffer
+    works, including an mmap of a file holding the blob.
+    """
+
+    def __init__(self, data):
+        self.buffer = memoryview(data).cast('B')
+        if len(self.buffer) < _HEADER.size:
+            raise GraphFormatError("Stored graph is truncated")
+        magic, version, manifest_length = _HEADER.unpack_from(self.buffer)
+        if magic != MAGIC:
+            raise GraphFormatError("Not a stored graph")
+        if version != FORMAT_VERSION:
+            raise GraphFormatError(f"Stored graph format {version}, expected {FORMAT_VERSION}")
+        manifest = bytes(self.buffer[_HEADER.size:_HEADER.size + manifest_length]).rstrip(b'\0')
+        self.manifest = json.loads(manifest)
+        self.num_nodes: int = self.manifest["num_nodes"]
+        self.num_edges: int = self.manifest["num_edges"]
+
+    def _section(self, name: str) -> memoryview:
+        offset, length, _ = self.manifest["sections"][name]
+        return self.buffer[offset:offset + length]
+
+    def _array(self, name: str) -> np.ndarray:
+        return np.frombuffer(self._section(name), dtype=_DTYPES[name])
+
+    @cached_property
+    def graph(self) -> CSRGraph:
+        graph = CSRGraph.from_arrays(
+            self._array('present'),
+            self._array('fwd_offsets'),
+            self._array('fwd_targets'),
+            self._array('rev_offsets'),
+            self._array('rev_sources')
+        )
+        reach = self.manifest.get("reachability")
+        if reach:
+            count, labels = reach["components"], reach["labels"]
+            # Pre-fill the graph's lazily built properties
+            graph.condensation = Condensation(graph, (self._array('reach_components'), count))
+            closure = None
+            if 'reach_closure' in self.manifest["sections"]:
+                closure = self._array('reach_closure').reshape(count, (count + 63) // 64)
+            graph.reachability = ReachabilityIndex(
+                graph.condensation,
+                self._array('reach_ranks').reshape(count, labels),
+                self._array('reach_lows').reshape(count, labels),
+                closure,
+                self._array('reach_counts') if 'reach_counts' in self.manifest["sections"] else None
+            )
+        return graph
+
+    @cached_property
+    def symbols(self) -> SymbolTable:
+        strings = {}
+        for name, count in self.manifest["strings"].items():
+            # Joined with NUL, so no strings and one empty string look alike
+            strings[name] = zlib.decompress(self._section(name)).decode().split('\0') if count else []
+        columns = {
+            name: _decode_column(kind, self._section(f"column:{name}"), self.num_nodes)
+            for name, kind in self.manifest["columns"].items()
+        }
+        return SymbolTable.from_columns(
+            strings['files'],
+            strings['names'],
+            strings['types'],
+            *(self._array(name) for name, _ in _NODE_ARRAYS),
+            columns=columns
+        )
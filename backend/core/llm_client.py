@@ -0,0 +1,118 @@
+"""
+LLM client
+Process-wide pooled HTTP client for the LLM API, so annotation requests
+reuse keep-alive connections (HTTP/2 when h2 is installed) instead of a
+new handshake each, paced to the provider's rate limit
+"""
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+
+from config.settings import settings
+
+try:
+    import h2  # noqa: F401 - installed by httpx[http2]
+    HTTP2 = True
+except ImportError:  # pragma: no cover - plain httpx
+    HTTP2 = False
+
+# Responses worth retrying after a pause
+RETRY_STATUSES = (429, 503)
+
+
+class RatePacer:
+    """Spaces request starts evenly to stay under a per-minute limit (0 = no limit)"""
+
+    def __init__(self, per_minute: int):
+        self.per_minute = per_minute
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = 0.0
+
+    async def wait(self):
+        if not self.interval:
+            return
+        # Claim the next slot before sleeping, so concurrent callers queue up
+        now = time.monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_pacer: Optional[RatePacer] = None
+# Replaces the network for clients created from now on (tests, see set_transport)
+_transport: Optional[httpx.AsyncBaseTransport] = None
+
+
+def set_transport(transport: Optional[httpx.AsyncBaseTransport]):
+    """Send LLM requests through transport (e.g. httpx.MockTransport), or the network again with None"""
+    global _transport, _client
+    _transport = transport
+    _client = None
+
+
+def get_llm_client() -> httpx.AsyncClient:
+    """Return the shared client, (re)creating it for the running event loop"""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    # Pooled connections belong to the loop that opened them
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        width = max(1, settings.LLM_CONCURRENCY)
+        _client = httpx.AsyncClient(
+            base_url=settings.LLM_API_BASE,
+            http2=HTTP2,
+            transport=_transport,
+            timeout=settings.LLM_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=width, max_keepalive_connections=width)
+        )
+        _client_loop = loop
+    return _client
+
+
+def get_rate_pacer() -> RatePacer:
+    """Return the process-wide pacer for LLM_REQUESTS_PER_MINUTE"""
+    global _pacer
+    if _pacer is None or _pacer.per_minute != settings.LLM_REQUESTS_PER_MINUTE:
+        _pacer = RatePacer(settings.LLM_REQUESTS_PER_MINUTE)
+    return _pacer
+
+
+async def post_json(path: str, payload: Dict[str, Any], params: Optional[Dict[str, str]] = None) -> httpx.Response:
+    """
+    POST to the LLM API on the shared client
+
+    Waits for a rate slot before each attempt and retries 429/503
+    responses up to LLM_MAX_RETRIES times, after their Retry-After (or
+    an exponential backoff); the last response is returned either way.
+    """
+    client = get_llm_client()
+    pacer = get_rate_pacer()
+    attempt = 0
+    while True:
+        await pacer.wait()
+        response = await client.post(path, json=payload, params=params)
+        if response.status_code not in RETRY_STATUSES or attempt >= settings.LLM_MAX_RETRIES:
+            return response
+        await asyncio.sleep(_retry_delay(response, attempt))
+        attempt += 1
+
+
+def _retry_delay(response: httpx.Response, attempt: int) -> float:
+    try:
+        return max(0.0, float(response.headers["retry-after"]))
+    except (KeyError, ValueError):
+        return 2.0 ** attempt
+
+
+async def close_llm_client():
+    """Close the shared client (called on application shutdown)"""
+    global _client, _client_loop
+    if _client is not None:
+        if _client_loop is asyncio.get_running_loop():
+            await _client.aclose()
+        _client = None
+        _client_loop = None
@@ -0,0 +1,117 @@
+"""
+Module resolver
+Maps source files to the module names they are imported by, and import
+specifiers (dotted, relative, or JS/TS relative paths) back to files
+"""
+import posixpath
+from typing import Dict, Iterable, Optional, Set
+
+PYTHON_EXTENSIONS = ('.py',)
+SCRIPT_EXTENSIONS = ('.ts', '.tsx', '.js', '.jsx')
+
+
+def module_name(path: str) -> Optional[str]:
+    """
+    Module name of a source file
+
+    Python files get their dotted path from the repository root
+    ("pkg/sub/__init__.py" -> "pkg.sub"); JS/TS files get their path
+    without extension, with index files standing for their directory.
+    """
+    stem, ext = posixpath.splitext(path)
+    if ext in PYTHON_EXTENSIONS:
+        parts = stem.split('/')
+        if parts[-1] == '__init__':
+            parts = parts[:-1]
+        return '.'.join(parts) or None
+    if ext in SCRIPT_EXTENSIONS:
+        if stem.endswith('/index'):
+            return stem[:-len('/index')]
+        return stem
+    return None
+
+
+class ModuleResolver:
+    """
+    Two-way lookup between files and module names
+
+    Python imports may be written relative to a source root below the
+    repository root ("agents.mapper" for "backend/agents/mapper.py"), so
+    every dotted suffix of a module name is indexed as well; an exact
+    match always wins over a suffix match.
+    """
+
+    def __init__(self, files: Iterable[str] = ()):
+        self.module_to_file: Dict[str, str] = {}
+        self.file_to_module: Dict[str, str] = {}
+        # Python packages, including directories without an __init__.py
+        self.packages: Set[str] = set()
+        # Dotted suffix -> full module name (first file added wins)
+        self._suffixes: Dict[str, str] = {}
+        self.add_files(files)
+
+    def add_files(self, files: Iterable[str]):
+        for path in files:
+            if path in self.file_to_module:
+                continue
+            name = module_name(path)
+            if name is None:
+                continue
+            self.file_to_module[path] = name
+            self.module_to_file.setdefault(name, path)
+            if path.endswith(PYTHON_EXTENSIONS):
+                parts = name.split('.')
+                for end in range(len(parts), 0, -1):
+                    prefix = parts[:end]
+                    if end < len(parts):
+                        self.packages.add('.'.join(prefix))
+                    for start in range(1, end):
+                        self._suffixes.setdefault('.'.join(prefix[start:]), '.'.join(prefix))
+
+    def remove_files(self, files: Iterable[str]):
+        """Forget files; package and suffix entries are kept, they only widen lookups"""
+        for path in files:
+            name = self.file_to_module.pop(path, None)
+            if name is not None and self.module_to_file.get(name) == path:
+                del self.module_to_file[name]
+
+    def has_module(self, name: str) -> bool:
+        return name in self.module_to_file or name in self.packages
+
+    def file_of(self, name: str) -> Optional[str]:
+        return self.module_to_file.get(name)
+
+    def resolve(self, specifier: str, from_file: str) -> Optional[str]:
+        """
+        Canonical module name for an import specifier written in from_file
+
+        Returns None for modules outside the repository (stdlib, packages).
+        """
+        if from_file.endswith(SCRIPT_EXTENSIONS):
+            return self._resolve_script(specifier, from_file)
+        return self._resolve_python(specifier, from_file)
+
+    def _resolve_python(self, specifier: str, from_file: str) -> Optional[str]:
+        if not specifier.startswith('.'):
+            if self.has_module(specifier):
+                return specifier
+            return self._suffixes.get(specifier)
+
+        level = len(specifier) - len(specifier.lstrip('.'))
+        package = module_name(from_file) or ''
+        if not from_file.endswith('__init__.py'):
+            package = package.rpartition('.')[0]
+        for _ in range(level - 1):
+            package = package.rpartition('.')[0]
+        rest = specifier[level:]
+        name = f"{package}.{rest}" if package and rest else (package or rest)
+        return name if self.has_module(name) else None
+
+    def _resolve_script(self, specifier: str, from_file: str) -> Optional[str]:
+        if not specifier.startswith('.'):
+            return None
+        target = posixpath.normpath(posixpath.join(posixpath.dirname(from_file), specifier))
+        stem, ext = posixpath.splitext(target)
+        if ext in SCRIPT_EXTENSIONS:
+            target = stem
+        return target if target in self.module_to_file else None
@@ -0,0 +1,186 @@
+"""
+Persistent parse cache
+Stores per-file parse output on disk, keyed by git blob hash, language and
+parser version, so re-analysis only parses files whose content changed
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.settings import settings
+
+
+def git_blob_hash(data: bytes) -> str:
+    """Hash bytes the same way `git hash-object` does"""
+    header = f"blob {len(data)}\0".encode()
+    return hashlib.sha1(header + data).hexdigest()
+
+
+def blob_hashes(repo_path: str, rel_paths: Iterable[str]) -> Dict[str, str]:
+    """
+    Map each relative path to its git blob hash
+
+    Hashes of clean tracked files come straight from the git index, so
+    those files are never read. Modified, untracked or non-git files are
+    hashed from their contents.
+    """
+    wanted = set(rel_paths)
+    hashes: Dict[str, str] = {}
+
+    try:
+        from git import Repo
+        git = Repo(repo_path).git
+        dirty = set(git.ls_files('-m').splitlines())
+        for line in git.ls_files('-s').splitlines():
+            # "<mode> <sha> <stage>\t<path>"
+            meta, _, path = line.partition('\t')
+            if path in wanted and path not in dirty:
+                hashes[path] = meta.split()[1]
+    except Exception:
+        pass
+
+    root = Path(repo_path)
+    for rel_path in wanted - hashes.keys():
+        try:
+            hashes[rel_path] = git_blob_hash((root / rel_path).read_bytes())
+        except OSError:
+            continue
+    return hashes
+
+
+def pack_result(result: Tuple[List[Dict], List[Dict], Dict[str, List[str]]], rel_path: str) -> Dict:
+    """Strip the file path out of a _parse_file result so it can be shared by identical blobs"""
+    nodes, relationships, imports = result
+    return {
+        "nodes": [{k: v for k, v in n.items() if k not in ('id', 'file')} for n in nodes],
+        "relationships": [{k: v for k, v in r.items() if k != 'file'} for r in relationships],
+        "imports": imports.get(rel_path, [])
+    }
+
+
+def unpack_result(payload: Dict, rel_path: str) -> Tuple[List[Dict], List[Dict], Dict[str, List[str]]]:
+    """Inverse of pack_result: rebuild the exact _parse_file shape for rel_path"""
+    nodes = []
+    for n in payload["nodes"]:
+        nodes.append({
+            "id": f"{rel_path}::{n['name']}",
+            "name": n["name"],
+            "type": n["type"],
+            "file": rel_path,
+            **{k: v for k, v in n.items() if k not in ('name', 'type')}
+        })
+    relationships = [
+        {"type": r["type"], "file": rel_path, **{k: v for k, v in r.items() if k != 'type'}}
+        for r in payload["relationships"]
+    ]
+    imports = {rel_path: payload["imports"]} if payload["imports"] else {}
+    return nodes, relationships, imports
+
+
+class ParseCache:
+    """Size-bounded, LRU-evicted SQLite store of packed parse results"""
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(Path(cache_dir) / "parse_cache.db"),
+            check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(blob_hash: str, language: str, parser_version: int) -> str:
+        return f"{blob_hash}:{language}:{parser_version}"
+
+    def get_many(self, keys: List[str]) -> Dict[str, Dict]:
+        """Fetch every cached entry among keys and mark them as recently used"""
+        found: Dict[str, Dict] = {}
+        if not keys:
+            return found
+        now = time.time()
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({marks})", chunk
+                ).fetchall()
+                for key, value in rows:
+                    found[key] = json.loads(zlib.decompress(value))
+                self._conn.execute(
+                    f"UPDATE entries SET last_used = ? WHERE key IN ({marks})", [now, *chunk]
+                )
+            self._conn.commit()
+        return found
+
+    def put_many(self, entries: Dict[str, Dict]):
+        """Store packed results, then evict least-recently-used entries over budget"""
+        if not entries:
+            return
+        now = time.time()
+        rows = []
+        for key, payload in entries.items():
+            value = zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+            rows.append((key, value, len(value), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Trim to 90% of the budget so we don't evict on every write
+        target = int(self.max_bytes * 0.9)
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= target:
+                break
+            doomed.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+        self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+
+_parse_cache: Optional[ParseCache] = None
+_parse_cache_lock = threading.Lock()
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Return the process-wide parse cache, or None when disabled"""
+    global _parse_cache
+    if not settings.PARSE_CACHE_ENABLED:
+        return None
+    with _parse_cache_lock:
+        if _parse_cache is None:
+            _parse_cache = ParseCache(
+                settings.PARSE_CACHE_DIR,
+                settings.PARSE_CACHE_MAX_MB * 1024 * 1024
+            )
+    return _parse_cache
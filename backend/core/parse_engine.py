@@ -0,0 +1,206 @@
+"""
+Parallel parsing engine
+Fans RepoAnalyzer file parsing out to a process pool in chunked batches
+"""
+import asyncio
+import mmap
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import AsyncGenerator, Dict, Iterator, List, Optional, Tuple, Union
+
+from config.settings import settings
+
+# (path relative to repo root, language)
+FileTask = Tuple[str, str]
+# (nodes, relationships, imports) as returned by RepoAnalyzer._parse_file
+FileResult = Tuple[List[Dict], List[Dict], Dict[str, List[str]]]
+
+# Each worker process, and each thread of the in-process path, owns its
+# own parse-only RepoAnalyzer: tree-sitter parsers are neither picklable
+# nor safe to use from several threads at once. Workers never open the
+# parse or repo caches (a SQLite connection must not cross a fork).
+_worker_analyzer = None
+_thread_state = threading.local()
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_workers = 0
+
+
+def _parser_analyzer():
+    from agents.repo_analyzer import RepoAnalyzer
+    return RepoAnalyzer.parser_only()
+
+
+def _init_worker():
+    """Process pool initializer: build the per-worker parsers once"""
+    global _worker_analyzer
+    _worker_analyzer = _parser_analyzer()
+
+
+def _thread_analyzer():
+    """This thread's parse-only analyzer, built on first use"""
+    analyzer = getattr(_thread_state, 'analyzer', None)
+    if analyzer is None:
+        analyzer = _thread_state.analyzer = _parser_analyzer()
+    return analyzer
+
+
+@contextmanager
+def open_source(path: Path, mmap_threshold: int) -> Iterator[Union[bytes, mmap.mmap]]:
+    """
+    Yield a file's raw bytes without decoding them
+
+    Files of at least mmap_threshold bytes are memory-mapped instead of
+    being read onto the heap; tree-sitter parses either directly.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0 or size < mmap_threshold:
+            yield f.read()
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield mapped
+        finally:
+            try:
+                mapped.close()
+            except BufferError:
+                # Still exported to a live tree; freed with it
+                pass
+
+
+def parse_batch(analyzer, repo_path: str, batch: List[FileTask]) -> List[Optional[FileResult]]:
+    """
+    Read and parse a batch of files
+
+    Returns one entry per task, in order; None for files that failed to
+    read or parse (the serial path skips those as well).
+    """
+    root = Path(repo_path)
+    mmap_threshold = settings.PARSE_MMAP_THRESHOLD_KB * 1024
+    results = []
+    for rel_path, language in batch:
+        try:
+            with open_source(root / rel_path, mmap_threshold) as source:
+                results.append(analyzer._parse_file(rel_path, source, language))
+        except Exception:
+            results.append(None)
+    return results
+
+
+def _parse_batch_in_worker(repo_path: str, batch: List[FileTask]) -> List[Optional[FileResult]]:
+    return parse_batch(_worker_analyzer, repo_path, batch)
+
+
+def _parse_batch_in_thread(repo_path: str, batch: List[FileTask]) -> List[Optional[FileResult]]:
+    return parse_batch(_thread_analyzer(), repo_path, batch)
+
+
+def resolve_worker_count(workers: Optional[int] = None) -> int:
+    """Worker count from the argument, PARSE_WORKERS, or the CPU count"""
+    if workers is None:
+        workers = settings.PARSE_WORKERS
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def get_executor(workers: int) -> ProcessPoolExecutor:
+    """Return the process-wide parse pool, (re)creating it if the size changed"""
+    global _executor, _executor_workers
+    if _executor is None or _executor_workers != workers:
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+        _executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+        _executor_workers = workers
+    return _executor
+
+
+def shutdown_executor():
+    """Shut down the shared parse pool (called on application shutdown)"""
+    global _executor, _executor_workers
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+        _executor_workers = 0
+
+
+def chunk(tasks: List[FileTask], size: int) -> List[List[FileTask]]:
+    size = max(1, size)
+    return [tasks[i:i + size] for i in range(0, len(tasks), size)]
+
+
+class ParseEngine:
+    """Parses a list of files either in-process or on the shared process pool"""
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        parallel_threshold: Optional[int] = None
+    ):
+        self.workers = resolve_worker_count(workers)
+        self.batch_size = batch_size or settings.PARSE_BATCH_SIZE
+        self.parallel_threshold = (
+            settings.PARSE_PARALLEL_THRESHOLD if parallel_threshold is None else parallel_threshold
+        )
+
+    def use_pool(self, file_count: int) -> bool:
+        return self.workers > 1 and file_count >= self.parallel_threshold
+
+    async def parse_files(self, repo_path: str, tasks: List[FileTask]) -> List[Optional[FileResult]]:
+        """
+        Parse every task and return the per-file results in task order
+
+        Small repositories (or PARSE_WORKERS=1) are parsed in a worker
+        thread with that thread's own parsers; larger ones are split into
+        batches and fanned out to the process pool. Either way the event
+        loop stays free to serve other requests.
+        """
+        if not tasks:
+            return []
+
+        if not self.use_pool(len(tasks)):
+            return await asyncio.to_thread(_parse_batch_in_thread, repo_path, tasks)
+
+        loop = asyncio.get_running_loop()
+        executor = get_executor(self.workers)
+        futures = [
+            loop.run_in_executor(executor, _parse_batch_in_worker, repo_path, batch)
+            for batch in chunk(tasks, self.batch_size)
+        ]
+        results = []
+        for batch_results in await asyncio.gather(*futures):
+            results.extend(batch_results)
+        return results
+
+    async def iter_batches(
+        self,
+        repo_path: str,
+        tasks: List[FileTask]
+    ) -> AsyncGenerator[Tuple[List[FileTask], List[Optional[FileResult]]], None]:
+        """
+        Parse tasks batch by batch, yielding (batch, results) as each finishes
+
+        In-process batches finish in order; pool batches are yielded in
+        completion order, so callers that need task order (row numbering,
+        see RepoAnalyzer._iter_ast) must put results back in order.
+        """
+        batches = chunk(tasks, self.batch_size)
+
+        if not self.use_pool(len(tasks)):
+            for batch in batches:
+                yield batch, await asyncio.to_thread(_parse_batch_in_thread, repo_path, batch)
+            return
+
+        loop = asyncio.get_running_loop()
+        executor = get_executor(self.workers)
+
+        async def run(batch: List[FileTask]):
+            return batch, await loop.run_in_executor(executor, _parse_batch_in_worker, repo_path, batch)
+
+        for future in asyncio.as_completed([run(batch) for batch in batches]):
+            yield await future
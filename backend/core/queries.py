@@ -0,0 +1,107 @@
+"""
+Tree-sitter extraction queries
+Per-language query sources, compiled once per process and language
+"""
+from typing import Dict, List, Tuple
+
+from tree_sitter import Language, Node
+
+try:
+    # tree-sitter >= 0.25 runs queries through a QueryCursor
+    from tree_sitter import Query, QueryCursor
+except ImportError:  # pragma: no cover - older bindings
+    Query = None
+    QueryCursor = None
+
+# Capture names produced by the queries below
+DEFINITION_KINDS = ('class', 'method', 'function')
+IMPORT_KIND = 'import'
+CALL_KIND = 'call'
+REFERENCE_KIND = 'reference'
+EXPORT_KIND = 'export'
+
+# When one node is captured under several kinds, the highest priority wins
+# (a function_definition inside a class body also matches @function, and
+# the callee of obj.method() also matches @reference)
+_PRIORITY = {
+    'class': 3, 'method': 2, 'function': 1, 'import': 0, 'export': 0, 'call': 0, 'reference': -1
+}
+
+PYTHON_QUERY = """
+(class_definition) @class
+(class_definition body: (block (function_definition) @method))
+(class_definition body: (block (decorated_definition definition: (function_definition) @method)))
+(function_definition) @function
+(import_statement) @import
+(import_from_statement) @import
+(call function: [(identifier) (attribute)] @call)
+(attribute object: (identifier) attribute: (identifier)) @reference
+"""
+
+JAVASCRIPT_QUERY = """
+(class_declaration) @class
+(method_definition) @method
+(function_declaration) @function
+(generator_function_declaration) @function
+(variable_declarator
+  name: (identifier)
+  value: [(arrow_function) (function_expression)]) @function
+(import_statement) @import
+(export_statement) @export
+(call_expression function: [(identifier) (member_expression)] @call)
+(new_expression constructor: [(identifier) (member_expression)] @call)
+(member_expression object: [(identifier) (this)] property: (property_identifier)) @reference
+"""
+
+TYPESCRIPT_QUERY = JAVASCRIPT_QUERY + """
+(abstract_class_declaration) @class
+"""
+
+QUERY_SOURCES = {
+    'python': PYTHON_QUERY,
+    'javascript': JAVASCRIPT_QUERY,
+    'typescript': TYPESCRIPT_QUERY,
+    'tsx': TYPESCRIPT_QUERY
+}
+
+_compiled: Dict[str, object] = {}
+
+
+def get_query(language_name: str, language: Language):
+    """Compile the extraction query for a language once and reuse it"""
+    query = _compiled.get(language_name)
+    if query is None:
+        source = QUERY_SOURCES[language_name]
+        query = Query(language, source) if Query is not None else language.query(source)
+        _compiled[language_name] = query
+    return query
+
+
+def run_query(query, root: Node) -> List[Tuple[Node, str]]:
+    """
+    Run a compiled query and return (node, kind) captures in source order
+
+    Outer nodes come before the nodes they contain, and a node captured
+    under several kinds is reported once, under its highest priority kind.
+    """
+    if QueryCursor is not None:
+        captures = QueryCursor(query).captures(root)
+    else:
+        captures = query.captures(root)
+
+    if isinstance(captures, dict):
+        flat = [(node, kind) for kind, nodes in captures.items() for node in nodes]
+    else:
+        flat = list(captures)
+
+    flat.sort(key=lambda c: (c[0].start_byte, -c[0].end_byte, -_PRIORITY[c[1]]))
+
+    results = []
+    last_key = None
+    for node, kind in flat:
+        key = (node.start_byte, node.end_byte, node.type)
+        if key == last_key:
+            continue
+        last_key = key
+        results.append((node, kind))
+    return results
@@ -0,0 +1,337 @@
+"""
+Reachability
+Descendant sets of many start nodes at once (one pass over the
+condensation DAG carrying a bitset per component, one bit per start),
+and a precomputed index answering "does A reach B" and "how many nodes
+does A reach" without a traversal
+"""
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from core.csr_graph import CSRGraph, Condensation, expand, sorted_unique
+
+# Starts handled per pass; each component carries CHUNK / 64 words
+_CHUNK = 512
+
+# HyperLogLog registers per component = 2 ** precision (64: about 13% error)
+_HLL_PRECISION = 6
+
+
+def descendant_bits(dag: CSRGraph, starts: np.ndarray) -> np.ndarray:
+    """
+    Bitsets of the DAG nodes reachable from each start, start included
+
+    Returns a (dag nodes, words) uint64 array where bit j of a row is set
+    when starts[j] reaches that node. Only the part of the DAG reachable
+    from some start is visited; it is walked in topological order (Kahn),
+    so each node ORs in its predecessors' bits once, after they are final.
+    """
+    count = dag.num_nodes
+    starts = np.asarray(starts, dtype=np.int64)
+    bits = np.zeros((count, (len(starts) + 63) // 64), dtype=np.uint64)
+    positions = np.arange(len(starts))
+    np.bitwise_or.at(
+        bits, (starts, positions // 64), np.left_shift(np.uint64(1), (positions % 64).astype(np.uint64))
+    )
+
+    region = np.flatnonzero(dag.reachable(starts))
+    _, heads = expand(dag.fwd_offsets, dag.fwd_targets, region)
+    # Predecessors inside the region whose bits are not final yet
+    waiting = np.bincount(heads, minlength=count)
+    frontier = region[waiting[region] == 0]
+    while len(frontier):
+        tails, heads = expand(dag.fwd_offsets, dag.fwd_targets, frontier)
+        np.bitwise_or.at(bits, heads, bits[tails])
+        np.subtract.at(waiting, heads, 1)
+        frontier = sorted_unique(heads[waiting[heads] == 0])
+    return bits
+
+
+def _set_bits(bits: np.ndarray):
+    """(row, bit position) of every set bit"""
+    rows, words = np.nonzero(bits)
+    values = bits[rows, words].astype('<u8').view(np.uint8).reshape(-1, 8)
+    hits, offsets = np.nonzero(np.unpackbits(values, axis=1, bitorder='little'))
+    return rows[hits], words[hits] * 64 + offsets
+
+
+def batch_descendants(graph: CSRGraph, targets: List[int]) -> List[np.ndarray]:
+    """
+    Sorted descendants of each target (like nx.descendants, target excluded)
+
+    Targets are propagated over graph.condensation in chunks of _CHUNK,
+    one topological pass per chunk, so the cost grows with the reachable
+    part of the DAG and the output size rather than with len(targets).
+    """
+    condensation = graph.condensation
+    results: List[np.ndarray] = []
+    for begin in range(0, len(targets), _CHUNK):
+        chunk = np.asarray(targets[begin:begin + _CHUNK], dtype=np.int64)
+        components, positions = _set_bits(descendant_bits(condensation.dag, condensation.component_of[chunk]))
+
+        # Component hits -> member nodes, still tagged with their start
+        offsets = condensation.member_offsets
+        positions = np.repeat(positions, offsets[components + 1] - offsets[components])
+        _, nodes = condensation.members(components)
+        keep = nodes != chunk[positions]
+        positions, nodes = positions[keep], nodes[keep]
+
+        order = np.lexsort((nodes, positions))
+        nodes = nodes[order]
+        bounds = np.cumsum(np.bincount(positions, minlength=len(chunk)))[:-1]
+        results.extend(np.split(nodes, bounds))
+    return results
+
+
+def _height_levels(dag: CSRGraph) -> List[np.ndarray]:
+    """
+    DAG nodes grouped by height (longest path to a sink), lowest first
+
+    Every successor of a node sits in an earlier group, so walking the
+    groups in order sees a node only after all of its descendants.
+    """
+    waiting = dag.out_degrees().copy()
+    frontier = np.flatnonzero(waiting == 0)
+    levels = []
+    while len(frontier):
+        levels.append(frontier)
+        _, heads = expand(dag.rev_offsets, dag.rev_sources, frontier)
+        np.subtract.at(waiting, heads, 1)
+        frontier = sorted_unique(heads[waiting[heads] == 0])
+    return levels
+
+
+def _hash64(values: np.ndarray) -> np.ndarray:
+    """splitmix64 of each value: well mixed 64-bit hashes of node ids"""
+    z = values.astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """int.bit_length() of each uint64"""
+    values = values.copy()
+    length = np.zeros(len(values), dtype=np.int64)
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = values >= (np.uint64(1) << np.uint64(shift))
+        length[big] += shift
+        values[big] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def estimate_reach(condensation: Condensation, precision: int = _HLL_PRECISION) -> np.ndarray:
+    """
+    Approximate number of nodes each component reaches, its own members
+    included, with one HyperLogLog sketch per component
+
+    Members are added to their component's sketch, then sketches are
+    merged (register-wise max) into every predecessor, walking the DAG
+    by height so a sketch is final before it is merged. Memory is
+    2 ** precision bytes per component.
+    """
+    count = condensation.count
+    registers = 1 << precision
+    sketches = np.zeros((count, registers), dtype=np.uint8)
+    components, nodes = condensation.members(np.arange(count))
+    hashes = _hash64(nodes)
+    low_bits = 64 - precision
+    buckets = (hashes >> np.uint64(low_bits)).astype(np.int64)
+    ranks = low_bits - _bit_length(hashes & np.uint64((1 << low_bits) - 1)) + 1
+    np.maximum.at(sketches, (components, buckets), ranks.astype(np.uint8))
+
+    dag = condensation.dag
+    for level in _height_levels(dag)[1:]:
+        tails, heads = expand(dag.fwd_offsets, dag.fwd_targets, level)
+        np.maximum.at(sketches, tails, sketches[heads])
+
+    alpha = 0.7213 / (1 + 1.079 / registers)
+    powers = 2.0 ** -np.arange(low_bits + 2)
+    estimates = np.empty(count)
+    # Bounded chunks keep the float expansion of the registers small
+    for begin in range(0, count, 65536):
+        rows = sketches[begin:begin + 65536]
+        raw = alpha * registers * registers / powers[rows].sum(axis=1)
+        zeros = (rows == 0).sum(axis=1)
+        # Linear counting is more accurate for small sets
+        small = (raw <= 2.5 * registers) & (zeros > 0)
+        raw[small] = registers * np.log(registers / zeros[small])
+        estimates[begin:begin + 65536] = raw
+    return estimates
+
+
+def descendant_counts(graph: CSRGraph) -> Tuple[np.ndarray, bool]:
+    """
+    Number of descendants of every node id (0 for ids not in the graph),
+    and whether the counts are estimates
+
+    Exact when the graph's reachability index has a closure (see
+    GRAPH_REACHABILITY_CLOSURE_MAX), HyperLogLog estimates otherwise.
+    """
+    condensation = graph.condensation
+    if graph.reachability.counts is not None:
+        per_component, approximate = graph.reachability.counts, False
+    else:
+        reach = np.rint(estimate_reach(condensation)).astype(np.int64)
+        # A node never reaches fewer nodes than the rest of its own component
+        per_component, approximate = np.maximum(reach - 1, condensation.sizes() - 1), True
+    counts = np.zeros(graph.num_nodes, dtype=np.int64)
+    nodes = graph.node_array()
+    counts[nodes] = per_component[condensation.component_of[nodes]]
+    return counts, approximate
+
+
+class ReachabilityIndex:
+    """
+    Constant-time-ish reachability between graph nodes
+
+    Works on the condensation, where A reaches B iff A's component
+    reaches B's (or they share a component with more than one member).
+    Three filters are tried in order:
+
+    - topological order: component ids are reverse topological, so a
+      component never reaches one with a higher id
+    - interval labels (GRAIL): for a few reverse topological orderings
+      `rank`, low[c] is the smallest rank c reaches. If c reaches d then
+      d's [low, rank] interval lies inside c's, so a non-nested pair is
+      answered "no" at once
+    - transitive closure: for condensations of up to closure_max
+      components, one bit per (component, component) pair, which also
+      gives every node's affected count up front
+
+    Pairs the filters cannot settle (large graphs only) fall back to one
+    vectorized search of the DAG for all of them, pruned by the same
+    filters.
+    """
+
+    def __init__(
+        self,
+        condensation: Condensation,
+        ranks: np.ndarray,
+        lows: np.ndarray,
+        closure: Optional[np.ndarray] = None,
+        counts: Optional[np.ndarray] = None
+    ):
+        self.condensation = condensation
+        # (components, labels) arrays
+        self.ranks = ranks
+        self.lows = lows
+        # (components, words) bitsets, and descendant node count per component
+        self.closure = closure
+        self.counts = counts
+
+    @classmethod
+    def build(cls, graph: CSRGraph, labels: int = 3, closure_max: Optional[int] = None) -> 'ReachabilityIndex':
+        """Index a graph: `labels` interval labels, plus the closure when small enough"""
+        if closure_max is None:
+            closure_max = settings.GRAPH_REACHABILITY_CLOSURE_MAX
+        condensation = graph.condensation
+        dag, count = condensation.dag, condensation.count
+        levels = _height_levels(dag)
+
+        # Label 0 is the Tarjan order itself; the others sort by height,
+        # ties broken at random so each label prunes different pairs
+        heights = np.zeros(count, dtype=np.int64)
+        for height, level in enumerate(levels):
+            heights[level] = height
+        rng = np.random.default_rng(0)
+        ranks = np.empty((count, labels), dtype=np.int32)
+        ranks[:, 0] = np.arange(count)
+        for label in range(1, labels):
+            ranks[np.lexsort((rng.random(count), heights)), label] = np.arange(count)
+
+        lows = ranks.copy()
+        closure = None
+        if count <= closure_max:
+            closure = np.zeros((count, (count + 63) // 64), dtype=np.uint64)
+            components = np.arange(count)
+            closure[components, components // 64] = np.left_shift(np.uint64(1), (components % 64).astype(np.uint64))
+        for level in levels[1:]:
+            tails, heads = expand(dag.fwd_offsets, dag.fwd_targets, level)
+            np.minimum.at(lows, tails, lows[heads])
+            if closure is not None:
+                np.bitwise_or.at(closure, tails, closure[heads])
+
+        counts = None
+        if closure is not None:
+            counts = np.zeros(count, dtype=np.int64)
+            sizes = np.zeros(closure.shape[1] * 64, dtype=np.int64)
+            sizes[:count] = condensation.sizes()
+            # A few hundred rows at a time keeps the unpacked bits small
+            for begin in range(0, count, 256):
+                rows = closure[begin:begin + 256].astype('<u8').view(np.uint8)
+                counts[begin:begin + 256] = np.unpackbits(rows, axis=1, bitorder='little') @ sizes - 1
+        return cls(condensation, ranks, lows, closure, counts)
+
+    def reaches(self, source: int, target: int) -> bool:
+        """Whether target is a descendant of source (never true for source itself, like nx.descendants)"""
+        return bool(self.reaches_many([source], [target])[0])
+
+    def reaches_many(self, sources: Iterable[int], targets: Iterable[int]) -> np.ndarray:
+        """reaches() for many (source, target) pairs at once, as a bool array"""
+        component_of = self.condensation.component_of
+        sources = np.asarray(list(sources), dtype=np.int64)
+        targets = np.asarray(list(targets), dtype=np.int64)
+        answer = np.zeros(len(sources), dtype=bool)
+        if not len(sources):
+            return answer
+        tails, heads = component_of[sources], component_of[targets]
+
+        same = tails == heads
+        answer[same] = (self.condensation.sizes()[tails[same]] > 1) & (sources[same] != targets[same])
+        open_pairs = ~same & (tails > heads) & self._nested(tails, heads)
+        if self.closure is not None:
+            bits = self.closure[tails[open_pairs], heads[open_pairs] // 64]
+            answer[open_pairs] = (bits >> (heads[open_pairs] % 64).astype(np.uint64)) & np.uint64(1) == 1
+        elif open_pairs.any():
+            answer[open_pairs] = self._search(tails[open_pairs], heads[open_pairs])
+        return answer
+
+    def affected_count(self, node: int) -> int:
+        """Number of descendants of node"""
+        component = int(self.condensation.component_of[node])
+        if self.counts is not None:
+            return int(self.counts[component])
+        reached = self.condensation.dag.reachable([component])
+        return int(self.condensation.sizes()[reached].sum()) - 1
+
+    def _nested(self, tails: np.ndarray, heads: np.ndarray) -> np.ndarray:
+        """Whether every label interval of heads lies inside the one of tails"""
+        return (
+            (self.lows[tails] <= self.lows[heads]) & (self.ranks[heads] <= self.ranks[tails])
+        ).all(axis=-1)
+
+    def _search(self, tails: np.ndarray, heads: np.ndarray) -> np.ndarray:
+        """
+        Search the DAG for many (source, target) component pairs at once
+
+        Level by level, the frontier holds (pair, component) entries; a
+        successor is kept only while it can still reach the pair's target
+        (higher id, nested intervals) and was not visited for that pair.
+        """
+        dag = self.condensation.dag
+        count = dag.num_nodes
+        found = np.zeros(len(tails), dtype=bool)
+        pairs, components = np.arange(len(tails)), np.asarray(tails, dtype=np.int64)
+        seen = np.zeros(0, dtype=np.int64)
+        while len(pairs):
+            offsets = dag.fwd_offsets
+            pairs = np.repeat(pairs, offsets[components + 1] - offsets[components])
+            _, successors = expand(offsets, dag.fwd_targets, components)
+            goals = heads[pairs]
+            found[pairs[successors == goals]] = True
+            keep = (successors > goals) & ~found[pairs]
+            keep[keep] = self._nested(successors[keep], goals[keep])
+            keys = sorted_unique(pairs[keep] * count + successors[keep])
+            if len(seen):
+                positions = np.minimum(np.searchsorted(seen, keys), len(seen) - 1)
+                keys = keys[seen[positions] != keys]
+            seen = np.sort(np.concatenate((seen, keys)))
+            pairs, components = keys // count, keys % count
+        return found
+
+    def arrays(self) -> Tuple[np.ndarray, ...]:
+        """What core.graph_store persists: components, ranks, lows, closure and counts (None if absent)"""
+        return self.condensation.component_of, self.ranks, self.lows, self.closure, self.counts
@@ -0,0 +1,294 @@
+"""
+Repository mirror cache
+Keeps one bare mirror per repo URL, refreshed with incremental fetches, and
+makes shallow, blobless, sparse checkouts from it
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from git import Repo
+
+from config.settings import settings
+
+
+class RepoTooLargeError(Exception):
+    """Raised when the files to check out exceed MAX_REPO_SIZE_MB"""
+
+
+# "@@ -<old>[,<n>] +<new>[,<n>] @@" hunk header of a zero-context diff
+_HUNK_RE = re.compile(r'^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@')
+
+
+def _dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+class RepoMirrorCache:
+    """
+    LRU-evicted cache of bare mirrors under a disk budget
+
+    Mirrors in use hold a lease (see lease()) and are never evicted, so a
+    checkout cannot lose its mirror to another repository's sync.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, cache_dir: str, max_bytes: int, max_checkout_bytes: int):
+        self.root = Path(cache_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_checkout_bytes = max_checkout_bytes
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+        # Mirror directory name -> number of live leases
+        self._leases: Dict[str, int] = {}
+
+    def mirror_path(self, repo_url: str) -> Path:
+        key = hashlib.sha1(repo_url.encode()).hexdigest()[:16]
+        return self.root / f"{key}.git"
+
+    def _url_lock(self, repo_url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(repo_url, threading.Lock())
+
+    def _load_index(self) -> Dict[str, Dict]:
+        try:
+            return json.loads((self.root / self.INDEX_FILE).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index: Dict[str, Dict]):
+        tmp = self.root / f"{self.INDEX_FILE}.tmp"
+        tmp.write_text(json.dumps(index))
+        tmp.replace(self.root / self.INDEX_FILE)
+
+    def _acquire(self, name: str):
+        with self._lock:
+            self._leases[name] = self._leases.get(name, 0) + 1
+
+    def _release(self, name: str):
+        with self._lock:
+            self._leases[name] -= 1
+            if not self._leases[name]:
+                del self._leases[name]
+
+    @contextmanager
+    def lease(self, repo_url: str) -> Iterator[Repo]:
+        """Sync the mirror for repo_url and keep it from being evicted until the block exits"""
+        name = self.mirror_path(repo_url).name
+        self._acquire(name)
+        try:
+            yield self.sync(repo_url)
+        finally:
+            self._release(name)
+
+    def sync(self, repo_url: str) -> Repo:
+        """
+        Create the mirror for repo_url, or fetch only what changed since last time
+
+        The mirror is only protected from eviction while this runs; callers
+        that keep using it should go through lease().
+        """
+        path = self.mirror_path(repo_url)
+        self._acquire(path.name)
+        try:
+            with self._url_lock(repo_url):
+                if path.exists():
+                    mirror = Repo(path)
+                    mirror.git.fetch('--prune', 'origin')
+                else:
+                    tmp = path.with_suffix('.tmp')
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    mirror = Repo.clone_from(repo_url, tmp, mirror=True)
+                    # Lets checkouts request --filter from this mirror
+                    mirror.git.config('uploadpack.allowFilter', 'true')
+                    tmp.rename(path)
+                    mirror = Repo(path)
+
+            with self._lock:
+                index = self._load_index()
+                index[path.name] = {
+                    "url": repo_url,
+                    "last_used": time.time(),
+                    "size": _dir_size(path)
+                }
+                self._save_index(index)
+                self._evict(index)
+        finally:
+            self._release(path.name)
+        return mirror
+
+    def _evict(self, index: Dict[str, Dict]):
+        """Drop least-recently-used mirrors without a lease until the cache fits its budget"""
+        total = sum(entry["size"] for entry in index.values())
+        for name, entry in sorted(index.items(), key=lambda item: item[1]["last_used"]):
+            if total <= self.max_bytes:
+                break
+            if name in self._leases:
+                continue
+            shutil.rmtree(self.root / name, ignore_errors=True)
+            total -= entry["size"]
+            del index[name]
+        self._save_index(index)
+
+    @staticmethod
+    def sparse_patterns(extensions: Iterable[str], exclude_dirs: Iterable[str]) -> List[str]:
+        """Non-cone sparse-checkout patterns for the given file types"""
+        patterns = [f"*{ext}" for ext in extensions]
+        patterns += [f"!{name}/" for name in exclude_dirs]
+        return patterns
+
+    def checkout_size(self, mirror: Repo, extensions: Iterable[str], exclude_dirs: Iterable[str], rev: str = 'HEAD') -> int:
+        """Total size of the blobs a sparse checkout of rev would write"""
+        extensions = tuple(extensions)
+        exclude_dirs = set(exclude_dirs)
+        total = 0
+        for line in mirror.git.ls_tree('-r', '-l', rev).splitlines():
+            # "<mode> <type> <sha> <size>\t<path>"
+            meta, _, file_path = line.partition('\t')
+            parts = meta.split()
+            if parts[1] != 'blob' or not file_path.endswith(extensions):
+                continue
+            if exclude_dirs.intersection(file_path.split('/')[:-1]):
+                continue
+            total += int(parts[3])
+        return total
+
+    def checkout(
+        self,
+        repo_url: str,
+        dest: str,
+        extensions: Iterable[str],
+        exclude_dirs: Iterable[str] = ()
+    ) -> Repo:
+        """
+        Check out the default branch of repo_url into dest
+
+        The checkout is shallow (depth 1), blobless and sparse, so only the
+        blobs of files with the given extensions are copied out of the mirror.
+        The size limit is enforced before anything is written to dest.
+        """
+        extensions = list(extensions)
+        exclude_dirs = list(exclude_dirs)
+        with self.lease(repo_url) as mirror:
+            size = self.checkout_size(mirror, extensions, exclude_dirs)
+            if size > self.max_checkout_bytes:
+                raise RepoTooLargeError(
+                    f"Repository source is {size / (1024 * 1024):.1f} MB, "
+                    f"limit is {self.max_checkout_bytes / (1024 * 1024):.1f} MB"
+                )
+
+            repo = Repo.clone_from(
+                f"file://{Path(mirror.git_dir).resolve()}",
+                dest,
+                depth=1,
+                filter='blob:none',
+                sparse=True,
+                no_checkout=True
+            )
+            repo.git.sparse_checkout('set', '--no-cone', *self.sparse_patterns(extensions, exclude_dirs))
+            # Blobs are fetched from the mirror here, so it is still leased
+            repo.git.checkout()
+        return repo
+
+    @staticmethod
+    def changed_files(mirror: Repo, base: str, head: str) -> Dict[str, str]:
+        """
+        Map every path that differs between base and head to its status
+
+        Statuses are 'A' (added), 'M' (modified) or 'D' (deleted); renames
+        are reported as a deletion plus an addition.
+        """
+        changes = {}
+        for line in mirror.git.diff('--name-status', '--no-renames', base, head).splitlines():
+            status, _, path = line.partition('\t')
+            changes[path] = 'M' if status[0] == 'T' else status[0]
+        return changes
+
+    @staticmethod
+    def changed_lines(mirror: Repo, base: str, head: str) -> Dict[str, List[Tuple[int, int]]]:
+        """
+        Line ranges (first, last; 1-based, inclusive) touched in each head file
+
+        A pure deletion is reported as the one-line range where the lines used
+        to be, so symbols that lost lines still count as changed.
+        """
+        ranges: Dict[str, List[Tuple[int, int]]] = {}
+        current = None
+        output = mirror.git.diff('-U0', '--no-renames', '--no-color', '--no-ext-diff', base, head)
+        for line in output.splitlines():
+            if line.startswith('+++ '):
+                current = line[6:] if line.startswith('+++ b/') else None
+                if current is not None:
+                    ranges.setdefault(current, [])
+                continue
+            match = _HUNK_RE.match(line)
+            if match and current is not None:
+                start = int(match.group(1))
+                count = int(match.group(2)) if match.group(2) is not None else 1
+                ranges[current].append((max(start, 1), max(start, 1) + max(count, 1) - 1))
+        return ranges
+
+    @staticmethod
+    def export_files(mirror: Repo, rev: str, paths: Iterable[str], dest: str) -> List[str]:
+        """
+        Write the rev versions of paths under dest, straight from the object store
+
+        Returns the paths that were written; paths missing at rev are skipped.
+        """
+        tree = mirror.commit(rev).tree
+        root = Path(dest)
+        written = []
+        for path in paths:
+            try:
+                blob = tree / path
+            except KeyError:
+                continue
+            target = root / path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(blob.data_stream.read())
+            written.append(path)
+        return written
+
+    @staticmethod
+    def resolve(mirror: Repo, rev: str) -> str:
+        """Full commit hash for a rev, fetching it first if the mirror lacks it"""
+        try:
+            return mirror.commit(rev).hexsha
+        except Exception:
+            mirror.git.fetch('origin', rev)
+            return mirror.commit(rev).hexsha
+
+
+_repo_cache: Optional[RepoMirrorCache] = None
+_repo_cache_lock = threading.Lock()
+
+
+def get_repo_cache() -> Optional[RepoMirrorCache]:
+    """Return the process-wide mirror cache, or None when disabled"""
+    global _repo_cache
+    if not settings.REPO_CACHE_ENABLED:
+        return None
+    with _repo_cache_lock:
+        if _repo_cache is None:
+            _repo_cache = RepoMirrorCache(
+                settings.REPO_CACHE_DIR,
+                settings.REPO_CACHE_MAX_MB * 1024 * 1024,
+                settings.MAX_REPO_SIZE_MB * 1024 * 1024
+            )
+    return _repo_cache
@@ -0,0 +1,40 @@
+"""
+Risk rating
+HIGH / MEDIUM / LOW change risk of a symbol from how much depends on it,
+for one node (impact analysis) or every node at once (the risk heatmap)
+"""
+import numpy as np
+
+RISK_LEVELS = ('HIGH', 'MEDIUM', 'LOW')
+
+# HIGH when any of these is exceeded: nodes affected transitively, direct
+# dependents, or (for classes) own dependencies
+HIGH_AFFECTED = 20
+HIGH_IN_DEGREE = 10
+HIGH_CLASS_OUT_DEGREE = 5
+# MEDIUM when any of these is exceeded
+MEDIUM_AFFECTED = 5
+MEDIUM_IN_DEGREE = 3
+
+
+def risk_rating(affected: int, in_degree: int, out_degree: int, node_type: str) -> str:
+    """Rating of one node"""
+    if affected > HIGH_AFFECTED or in_degree > HIGH_IN_DEGREE:
+        return 'HIGH'
+    if node_type == 'class' and out_degree > HIGH_CLASS_OUT_DEGREE:
+        return 'HIGH'
+    if affected > MEDIUM_AFFECTED or in_degree > MEDIUM_IN_DEGREE:
+        return 'MEDIUM'
+    return 'LOW'
+
+
+def risk_ratings(affected: np.ndarray, in_degrees: np.ndarray, out_degrees: np.ndarray,
+                 is_class: np.ndarray) -> np.ndarray:
+    """risk_rating() of every node from per-node arrays, as a string array"""
+    high = (
+        (affected > HIGH_AFFECTED)
+        | (in_degrees > HIGH_IN_DEGREE)
+        | (is_class & (out_degrees > HIGH_CLASS_OUT_DEGREE))
+    )
+    medium = (affected > MEDIUM_AFFECTED) | (in_degrees > MEDIUM_IN_DEGREE)
+    return np.where(high, 'HIGH', np.where(medium, 'MEDIUM', 'LOW'))
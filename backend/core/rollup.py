@@ -0,0 +1,182 @@
+"""
+Graph rollup
+Aggregated views of the symbol graph at the directory, package and file
+levels, with edge weights counting the symbol edges they stand for, so a
+client can start from a small overview and drill down one node at a time
+"""
+import posixpath
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.symbol_table import SymbolTable
+
+# Coarsest first; each level's nodes expand into the next level's
+LEVELS = ('directory', 'package', 'file', 'symbol')
+
+
+def _directory(file_path: str) -> str:
+    """Top-level directory of a file ('.' for files at the root)"""
+    return file_path.split('/', 1)[0] if '/' in file_path else '.'
+
+
+def _package(file_path: str) -> str:
+    """Directory that directly contains a file"""
+    return posixpath.dirname(file_path) or '.'
+
+
+def aggregate_path(level: str, file_path: str) -> str:
+    """Path of the directory, package or file aggregate a file falls in"""
+    if level == 'directory':
+        return _directory(file_path)
+    if level == 'package':
+        return _package(file_path)
+    return file_path
+
+
+def weighted_pairs(sources: np.ndarray, targets: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Distinct (source, target) pairs and how often each occurs"""
+    if not len(sources):
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    low = min(int(sources.min()), int(targets.min()))
+    span = max(int(sources.max()), int(targets.max())) - low + 1
+    keys = np.sort((sources - low) * span + (targets - low))
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    weights = np.diff(np.append(starts, len(keys)))
+    keys = keys[starts]
+    return keys // span + low, keys % span + low, weights
+
+
+class GraphRollup:
+    """
+    Directory / package / file / symbol hierarchy over a symbol graph
+
+    Every live row gets an integer code per level (its aggregate), so a
+    level's edges are the symbol edges with both ends mapped to codes and
+    counted per pair. Aggregate ids are "<level>:<path>"; symbols keep
+    their own ids.
+    """
+
+    def __init__(self, symbols: SymbolTable, sources: np.ndarray, targets: np.ndarray):
+        self.symbols = symbols
+        self.rows = np.fromiter(symbols.live_rows(), dtype=np.int64)
+        file_ids = np.asarray(symbols.file_ids, dtype=np.int64)
+
+        # level -> code -> path, path -> code, and row -> code (-1 = no row)
+        self.names: Dict[str, List[str]] = {'file': list(symbols.files.values)}
+        self.codes: Dict[str, np.ndarray] = {}
+        for level, key in (('directory', _directory), ('package', _package)):
+            names: Dict[str, int] = {}
+            per_file = np.array(
+                [names.setdefault(key(path), len(names)) for path in symbols.files.values], dtype=np.int64
+            )
+            self.names[level] = list(names)
+            self.codes[level] = self._row_codes(per_file[file_ids[self.rows]] if len(self.rows) else self.rows)
+        self.codes['file'] = self._row_codes(file_ids[self.rows])
+        self.codes['symbol'] = self._row_codes(self.rows)
+        self._index = {level: {name: code for code, name in enumerate(names)} for level, names in self.names.items()}
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        alive = self.codes['symbol']
+        keep = (alive[sources] >= 0) & (alive[targets] >= 0) if len(sources) else np.zeros(0, dtype=bool)
+        self.sources, self.targets = sources[keep], targets[keep]
+
+    def level(self, level: str) -> Dict[str, Any]:
+        """Every aggregate node of a level and the weighted edges between them"""
+        if level not in LEVELS:
+            raise ValueError(f"Unknown level {level}; expected one of {', '.join(LEVELS)}")
+        codes = self.codes[level]
+        sources, targets = codes[self.sources], codes[self.targets]
+        between = sources != targets
+        return {
+            "level": level,
+            "nodes": self._nodes(level, self.rows, sources[~between]),
+            "edges": self._edges(
+                *weighted_pairs(sources[between], targets[between]),
+                lambda code: self._id(level, code)
+            )
+        }
+
+    def expand(self, node_id: str) -> Dict[str, Any]:
+        """
+        Children of one aggregate node, with the weighted edges among them
+        and between them and the other aggregates of the node's own level
+        """
+        level, code = self._parse(node_id)
+        child_level = LEVELS[LEVELS.index(level) + 1]
+        codes, child_codes = self.codes[level], self.codes[child_level]
+        inside = codes == code
+        rows = self.rows[inside[self.rows]]
+
+        # Children keep their code; other aggregates of the level become ~code
+        source_in, target_in = inside[self.sources], inside[self.targets]
+        touching = source_in | target_in
+        sources, targets = self.sources[touching], self.targets[touching]
+        source_in, target_in = source_in[touching], target_in[touching]
+        sources = np.where(source_in, child_codes[sources], ~codes[sources])
+        targets = np.where(target_in, child_codes[targets], ~codes[targets])
+        between = sources != targets
+
+        def key_id(key: int) -> str:
+            return self._id(child_level, key) if key >= 0 else self._id(level, ~key)
+
+        return {
+            "node": node_id,
+            "level": child_level,
+            "nodes": self._nodes(child_level, rows, sources[~between]),
+            "edges": self._edges(*weighted_pairs(sources[between], targets[between]), key_id)
+        }
+
+    def _nodes(self, level: str, rows: np.ndarray, internal: np.ndarray) -> List[Dict[str, Any]]:
+        """Nodes of the aggregates that rows fall in; internal = codes of edges kept inside one"""
+        codes = self.codes[level][rows]
+        if level == 'symbol':
+            return [
+                {**self.symbols.to_dict(row), "level": level, "parent": self._id('file', self.codes['file'][row])}
+                for row in rows.tolist()
+            ]
+        size = len(self.names[level])
+        symbol_counts = np.bincount(codes, minlength=size)
+        internal_counts = np.bincount(internal[internal >= 0], minlength=size) if len(internal) else np.zeros(size, dtype=np.int64)
+        # Some row of each aggregate, for its parent (later writes win, so the first)
+        first_rows = np.full(size, -1, dtype=np.int64)
+        first_rows[codes[::-1]] = rows[::-1]
+        parent_level = LEVELS[LEVELS.index(level) - 1] if level != LEVELS[0] else None
+        nodes = []
+        for row in first_rows[first_rows >= 0].tolist():
+            code = int(self.codes[level][row])
+            nodes.append({
+                "id": self._id(level, code),
+                "name": self.names[level][code],
+                "level": level,
+                "parent": self._id(parent_level, self.codes[parent_level][row]) if parent_level else None,
+                "symbol_count": int(symbol_counts[code]),
+                "internal_edges": int(internal_counts[code])
+            })
+        return nodes
+
+    @staticmethod
+    def _edges(sources: np.ndarray, targets: np.ndarray, weights: np.ndarray, key_id) -> List[Dict[str, Any]]:
+        return [
+            {"source": key_id(source), "target": key_id(target), "weight": weight}
+            for source, target, weight in zip(sources.tolist(), targets.tolist(), weights.tolist())
+        ]
+
+    def _id(self, level: str, code: int) -> str:
+        if level == 'symbol':
+            return self.symbols.id(int(code))
+        return f"{level}:{self.names[level][int(code)]}"
+
+    def _parse(self, node_id: str) -> Tuple[str, int]:
+        level, sep, name = node_id.partition(':')
+        code = self._index.get(level, {}).get(name) if sep else None
+        if code is None or not (self.codes[level][self.rows] == code).any():
+            raise KeyError(f"Unknown aggregate node {node_id}")
+        return level, code
+
+    def _row_codes(self, values: np.ndarray) -> np.ndarray:
+        codes = np.full(len(self.symbols), -1, dtype=np.int64)
+        codes[self.rows] = values
+        return codes
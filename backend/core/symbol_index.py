@@ -0,0 +1,274 @@
+"""
+Global symbol index
+Resolves call sites, attribute references and imports to symbol rows with
+hash lookups: (file, qualified name) -> row, per-file import bindings and
+per-file export tables
+"""
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from core.module_resolver import ModuleResolver
+from core.symbol_table import SymbolTable
+
+# Receivers that refer to the enclosing class
+SELF_NAMES = ('self', 'cls', 'this')
+
+_IDENTIFIER = re.compile(r'^[A-Za-z_$][\w$]*$')
+
+# How many import-then-export hops a lookup follows
+MAX_REEXPORT_DEPTH = 3
+
+# alias -> (module specifier as written, imported name or None for the module)
+Binding = Tuple[str, Optional[str]]
+
+
+class SymbolIndex:
+    """
+    Name resolution over a SymbolTable
+
+    Methods are indexed under "Class.method" as well as their bare name
+    (which is what the table keys them by), and remember the class that
+    encloses them so self/this references resolve to sibling methods.
+
+    A file's export table is what other files can import from it: its
+    explicit export statements for JS/TS, otherwise its top-level symbols.
+    """
+
+    def __init__(self, symbols: SymbolTable):
+        self.symbols = symbols
+        self.modules = ModuleResolver()
+        # file -> qualified or bare name -> row
+        self._by_file: Dict[str, Dict[str, int]] = {}
+        # method row -> qualified name of its class
+        self._class_of: Dict[int, str] = {}
+        # file -> names of its top-level symbols
+        self._top_level: Dict[str, Set[str]] = {}
+        # file -> exported name -> local name, for files with export statements
+        self.exports: Dict[str, Dict[str, str]] = defaultdict(dict)
+        # file -> alias -> binding, and file -> wildcard-imported modules
+        self.bindings: Dict[str, Dict[str, Binding]] = defaultdict(dict)
+        self.wildcards: Dict[str, List[str]] = defaultdict(list)
+
+    def add_rows(self, rows: Iterable[int]):
+        """Index a batch of rows; every symbol of a file must arrive together"""
+        rows_by_file = defaultdict(list)
+        for row in rows:
+            rows_by_file[self.symbols.file(row)].append(row)
+        self.modules.add_files(rows_by_file.keys())
+
+        line_start, line_end = self.symbols.line_start, self.symbols.line_end
+        for file_path, file_rows in rows_by_file.items():
+            names = self._by_file.setdefault(file_path, {})
+            top_level = self._top_level.setdefault(file_path, set())
+            # Outer definitions sort before the ones they contain
+            file_rows.sort(key=lambda r: (line_start[r], -line_end[r]))
+            # Open definitions as (line_end, qualified name, type)
+            scopes: List[Tuple[int, str, str]] = []
+            for row in file_rows:
+                while scopes and scopes[-1][0] < line_start[row]:
+                    scopes.pop()
+                name = self.symbols.name(row)
+                names.setdefault(name, row)
+                kind = self.symbols.type(row)
+                if not scopes:
+                    top_level.add(name)
+                    qualname = name
+                elif scopes[-1][2] == 'class' and kind != 'function':
+                    qualname = f"{scopes[-1][1]}.{name}"
+                    names[qualname] = row
+                    self._class_of[row] = scopes[-1][1]
+                else:
+                    qualname = name
+                scopes.append((line_end[row], qualname, kind))
+
+    def add_relationships(self, relationships: Iterable[Dict]):
+        """Record the import bindings and export statements among a file's relationships"""
+        relationships = list(relationships)
+        # Files made only of imports (package __init__ files) are modules too
+        self.modules.add_files({rel['file'] for rel in relationships})
+        for rel in relationships:
+            kind = rel.get('type')
+            if kind == 'export':
+                self.exports[rel['file']][rel['alias']] = rel['name']
+            elif kind != 'import':
+                continue
+            elif rel['name'] == '*':
+                self.wildcards[rel['file']].append(rel['module'])
+            else:
+                self.bindings[rel['file']][rel['alias']] = (rel['module'], rel['name'])
+
+    def remove_files(self, files: Iterable[str]):
+        for file_path in files:
+            for row in self._by_file.pop(file_path, {}).values():
+                self._class_of.pop(row, None)
+            self._top_level.pop(file_path, None)
+            self.exports.pop(file_path, None)
+            self.bindings.pop(file_path, None)
+            self.wildcards.pop(file_path, None)
+        self.modules.remove_files(files)
+
+    def resolve(self, file_path: str, target: str, caller: Optional[int] = None) -> Optional[int]:
+        """
+        Row that a reference such as "helper", "self.save", "mod.func" or
+        "Class.method" written in file_path points to, or None
+
+        Each step is a dictionary lookup, so resolution costs O(1) per
+        reference regardless of repository size.
+        """
+        parts = re.sub(r'\s+', '', target).replace('?.', '.').split('.')
+        if not all(_IDENTIFIER.match(part) for part in parts):
+            return None
+        head, rest = parts[0], parts[1:]
+
+        if head in SELF_NAMES:
+            if len(rest) != 1:
+                return None
+            cls = self._class_of.get(caller) if caller is not None else None
+            if cls is not None:
+                row = self._lookup(file_path, [cls, rest[0]])
+                if row is not None:
+                    return row
+            return self._lookup(file_path, rest)
+
+        binding = self.bindings.get(file_path, {}).get(head)
+        if binding is not None:
+            specifier, name = binding
+            module = self.modules.resolve(specifier, file_path)
+            if module is None:
+                return None
+            if name is None:
+                return self._lookup_in_module(module, rest)
+            row = self._lookup_in_module(module, [name] + rest)
+            if row is None and name == 'default':
+                # Default exports are usually named after the binding
+                row = self._lookup_in_module(module, [head] + rest)
+            return row
+
+        if head in self._by_file.get(file_path, {}):
+            return self._lookup(file_path, parts)
+
+        if not rest:
+            for specifier in self.wildcards.get(file_path, []):
+                module = self.modules.resolve(specifier, file_path)
+                if module is not None and not head.startswith('_'):
+                    row = self._lookup_in_module(module, parts)
+                    if row is not None:
+                        return row
+        return None
+
+    def importing_files(self) -> List[str]:
+        return sorted(set(self.bindings) | set(self.wildcards))
+
+    def files_importing(self, names: Iterable[str]) -> List[str]:
+        """
+        Files whose imports could bring in a symbol called one of names,
+        under any alias or re-export on the way
+
+        A superset found from the binding and export tables alone, without
+        resolving anything; imported_rows gives the exact answer.
+        """
+        names = set(names)
+        for _ in range(MAX_REEXPORT_DEPTH):
+            aliases = {
+                alias
+                for file_bindings in self.bindings.values()
+                for alias, (_, name) in file_bindings.items() if name in names
+            }
+            aliases.update(
+                exported
+                for table in self.exports.values()
+                for exported, local in table.items() if local in names
+            )
+            if aliases <= names:
+                break
+            names |= aliases
+        files = set(self.wildcards)
+        for file_path, file_bindings in self.bindings.items():
+            if any(
+                name in names or (name == 'default' and alias in names)
+                for alias, (_, name) in file_bindings.items()
+            ):
+                files.add(file_path)
+        return sorted(files)
+
+    def imported_rows(self, file_path: str) -> List[int]:
+        """
+        Rows that file_path's imports bring in
+
+        Named and default imports give the one symbol they name, wildcard
+        imports every public export; importing a module itself brings in
+        no particular symbol.
+        """
+        rows = []
+        for alias, (specifier, name) in self.bindings.get(file_path, {}).items():
+            if name is None:
+                continue
+            module = self.modules.resolve(specifier, file_path)
+            if module is None:
+                continue
+            row = self._lookup_in_module(module, [name])
+            if row is None and name == 'default':
+                row = self._lookup_in_module(module, [alias])
+            if row is not None:
+                rows.append(row)
+        for specifier in self.wildcards.get(file_path, []):
+            module = self.modules.resolve(specifier, file_path)
+            target = self.modules.file_of(module) if module is not None else None
+            if target is not None:
+                rows.extend(
+                    row for name, row in self._export_table(target).items()
+                    if not name.startswith('_')
+                )
+        return rows
+
+    def _lookup_in_module(self, module: str, parts: List[str], depth: int = 0) -> Optional[int]:
+        # Walk down submodules as far as the dotted path goes (pkg.mod.func)
+        while parts and self.modules.has_module(f"{module}.{parts[0]}"):
+            module = f"{module}.{parts[0]}"
+            parts = parts[1:]
+        if not parts:
+            return None
+        file_path = self.modules.file_of(module)
+        if file_path is None:
+            return None
+        row = self._exported(file_path, parts[0], depth)
+        if row is None or len(parts) == 1:
+            return row
+        return self._lookup(file_path, [self.symbols.name(row)] + parts[1:])
+
+    def _exported(self, file_path: str, name: str, depth: int = 0) -> Optional[int]:
+        """Row exported from file_path under name, following re-exported imports"""
+        explicit = self.exports.get(file_path)
+        if explicit:
+            local = explicit.get(name)
+            if local is None:
+                return None
+            row = self._lookup(file_path, [local])
+        else:
+            local = name
+            row = self._lookup(file_path, [name]) if name in self._top_level.get(file_path, ()) else None
+        if row is not None or depth >= MAX_REEXPORT_DEPTH:
+            return row
+
+        # "from .sub import name" in a package __init__, or import-then-export in JS
+        binding = self.bindings.get(file_path, {}).get(local)
+        if binding is None or binding[1] is None:
+            return None
+        module = self.modules.resolve(binding[0], file_path)
+        if module is None:
+            return None
+        return self._lookup_in_module(module, [binding[1]], depth + 1)
+
+    def _export_table(self, file_path: str) -> Dict[str, int]:
+        explicit = self.exports.get(file_path)
+        names = explicit.items() if explicit else ((n, n) for n in self._top_level.get(file_path, ()))
+        table = {}
+        for name, local in names:
+            row = self._lookup(file_path, [local])
+            if row is not None:
+                table[name] = row
+        return table
+
+    def _lookup(self, file_path: str, parts: List[str]) -> Optional[int]:
+        return self._by_file.get(file_path, {}).get('.'.join(parts))
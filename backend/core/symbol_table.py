@@ -0,0 +1,369 @@
+"""
+Symbol table
+Columnar store for AST symbols with interned file, name and type tables.
+Rows are addressed by integer index; the {"id", "name", ...} dict shape is
+only produced when results leave the process (see to_json).
+"""
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Columns every symbol has, in the order they appear in the JSON shape
+CORE_FIELDS = ('id', 'name', 'type', 'file', 'line_start', 'line_end')
+
+
+class _Interner:
+    """Append-only string table"""
+
+    __slots__ = ('values', 'index')
+
+    def __init__(self):
+        self.values: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def add(self, value: str) -> int:
+        idx = self.index.get(value)
+        if idx is None:
+            idx = len(self.values)
+            self.index[value] = idx
+            self.values.append(value)
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+class SymbolView:
+    """
+    Lightweight read view of one symbol row
+
+    Supports the mapping protocol (node['name'], node.get('file'), {**node})
+    so code written against the old dict shape keeps working.
+    """
+
+    __slots__ = ('table', 'row')
+
+    def __init__(self, table: 'SymbolTable', row: int):
+        self.table = table
+        self.row = row
+
+    @property
+    def id(self) -> str:
+        return self.table.id(self.row)
+
+    @property
+    def name(self) -> str:
+        return self.table.name(self.row)
+
+    @property
+    def type(self) -> str:
+        return self.table.type(self.row)
+
+    @property
+    def file(self) -> str:
+        return self.table.file(self.row)
+
+    @property
+    def line_start(self) -> int:
+        return self.table.line_start[self.row]
+
+    @property
+    def line_end(self) -> int:
+        return self.table.line_end[self.row]
+
+    def keys(self) -> List[str]:
+        return list(CORE_FIELDS) + [
+            key for key, column in self.table.columns.items() if column[self.row] is not None
+        ]
+
+    def __getitem__(self, key: str) -> Any:
+        if key in CORE_FIELDS:
+            return getattr(self, key)
+        column = self.table.columns.get(key)
+        if column is None or column[self.row] is None:
+            raise KeyError(key)
+        return column[self.row]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.keys()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return self.table.to_dict(self.row)
+
+    def __repr__(self) -> str:
+        return f"SymbolView({self.id!r})"
+
+
+class SymbolTable:
+    """
+    Columnar symbol store
+
+    Symbols are unique by (file, name): adding an existing pair updates
+    that row in place, matching how the dependency graph used to merge
+    nodes with the same id. Removed rows become tombstones so row numbers
+    stay stable; iteration and serialization skip them.
+    """
+
+    def __init__(self):
+        self.files = _Interner()
+        self.names = _Interner()
+        self.types = _Interner()
+        self.file_ids = array('I')
+        self.name_ids = array('I')
+        self.type_ids = array('B')
+        self.line_start = array('I')
+        self.line_end = array('I')
+        self.alive = array('B')
+        self._dead = 0
+        # Optional per-row columns (metrics, annotations); None = unset
+        self.columns: Dict[str, List[Any]] = {}
+        # (file_id << 32 | name_id) -> row
+        self._rows: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        """Size of the row space, tombstones included"""
+        return len(self.file_ids)
+
+    def __iter__(self) -> Iterator[SymbolView]:
+        for row in self.live_rows():
+            yield SymbolView(self, row)
+
+    def live_rows(self) -> Iterator[int]:
+        if not self._dead:
+            return iter(range(len(self)))
+        return (row for row, alive in enumerate(self.alive) if alive)
+
+    def live_count(self) -> int:
+        return len(self) - self._dead
+
+    def is_alive(self, row: int) -> bool:
+        return bool(self.alive[row])
+
+    def __getitem__(self, row: int) -> SymbolView:
+        return SymbolView(self, row)
+
+    def add(
+        self,
+        file: str,
+        name: str,
+        type: str,
+        line_start: int = 0,
+        line_end: int = 0,
+        **extra: Any
+    ) -> int:
+        """Add (or update) a symbol and return its row"""
+        file_id = self.files.add(file)
+        name_id = self.names.add(name)
+        type_id = self.types.add(type)
+        key = (file_id << 32) | name_id
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self)
+            self._rows[key] = row
+            self.file_ids.append(file_id)
+            self.name_ids.append(name_id)
+            self.type_ids.append(type_id)
+            self.line_start.append(line_start)
+            self.line_end.append(line_end)
+            self.alive.append(1)
+            for column in self.columns.values():
+                column.append(None)
+        else:
+            self.type_ids[row] = type_id
+            self.line_start[row] = line_start
+            self.line_end[row] = line_end
+        for key_name, value in extra.items():
+            self.set(row, key_name, value)
+        return row
+
+    def add_dict(self, node: Dict[str, Any]) -> int:
+        """Add a symbol given in the JSON dict shape"""
+        extra = {k: v for k, v in node.items() if k not in CORE_FIELDS}
+        return self.add(
+            node.get('file', ''),
+            node.get('name', ''),
+            node.get('type', ''),
+            node.get('line_start', 0),
+            node.get('line_end', 0),
+            **extra
+        )
+
+    @classmethod
+    def from_dicts(cls, nodes: Iterable[Dict[str, Any]]) -> 'SymbolTable':
+        table = cls()
+        for node in nodes:
+            table.add_dict(node)
+        return table
+
+    @classmethod
+    def from_columns(
+        cls,
+        files: List[str],
+        names: List[str],
+        types: List[str],
+        file_ids,
+        name_ids,
+        type_ids,
+        line_start,
+        line_end,
+        alive,
+        columns: Optional[Dict[str, List[Any]]] = None
+    ) -> 'SymbolTable':
+        """
+        Rebuild a table from its string tables and row columns (any buffers
+        of the matching item sizes, e.g. numpy arrays; see core.graph_store)
+        """
+        table = cls()
+        for interner, values in ((table.files, files), (table.names, names), (table.types, types)):
+            interner.values = list(values)
+            interner.index = {value: idx for idx, value in enumerate(interner.values)}
+        for attr, values in (
+            ('file_ids', file_ids), ('name_ids', name_ids), ('type_ids', type_ids),
+            ('line_start', line_start), ('line_end', line_end), ('alive', alive)
+        ):
+            column = getattr(table, attr)
+            column.frombytes(memoryview(values).cast('B'))
+        live = [row for row, flag in enumerate(table.alive) if flag]
+        table._dead = len(table) - len(live)
+        table._rows = {(table.file_ids[row] << 32) | table.name_ids[row]: row for row in live}
+        table.columns = {key: list(values) for key, values in (columns or {}).items()}
+        return table
+
+    def set(self, row: int, key: str, value: Any):
+        """Set an optional column value for one row"""
+        column = self.columns.get(key)
+        if column is None:
+            column = self.columns[key] = [None] * len(self)
+        column[row] = value
+
+    def set_column(self, key: str, values: List[Any]):
+        """Replace a whole optional column (one value per row)"""
+        if len(values) != len(self):
+            raise ValueError(f"Column {key} has {len(values)} values for {len(self)} rows")
+        self.columns[key] = list(values)
+
+    def remove_files(self, files: Iterable[str]) -> List[int]:
+        """Tombstone every symbol of the given files and return their rows"""
+        file_ids = {self.files.index[f] for f in files if f in self.files.index}
+        if not file_ids:
+            return []
+        removed = []
+        for row in self.live_rows():
+            file_id = self.file_ids[row]
+            if file_id in file_ids:
+                removed.append(row)
+        for row in removed:
+            self.alive[row] = 0
+            del self._rows[(self.file_ids[row] << 32) | self.name_ids[row]]
+            for column in self.columns.values():
+                column[row] = None
+        self._dead += len(removed)
+        return removed
+
+    def rows_of_files(self, files: Iterable[str]) -> List[int]:
+        file_ids = {self.files.index[f] for f in files if f in self.files.index}
+        return [row for row in self.live_rows() if self.file_ids[row] in file_ids]
+
+    def live_files(self) -> List[str]:
+        """Files with at least one live symbol"""
+        if not self._dead:
+            return list(self.files.values)
+        return [self.files.values[file_id] for file_id in sorted({self.file_ids[row] for row in self.live_rows()})]
+
+    def file_count(self) -> int:
+        """Number of files with at least one live symbol"""
+        if not self._dead:
+            return len(self.files)
+        return len({self.file_ids[row] for row in self.live_rows()})
+
+    def row_of(self, symbol_id: str) -> Optional[int]:
+        """Row for a "file::name" id, or None"""
+        file, sep, name = symbol_id.rpartition('::')
+        if not sep:
+            return None
+        file_id = self.files.index.get(file)
+        name_id = self.names.index.get(name)
+        if file_id is None or name_id is None:
+            return None
+        return self._rows.get((file_id << 32) | name_id)
+
+    def id(self, row: int) -> str:
+        return f"{self.file(row)}::{self.name(row)}"
+
+    def name(self, row: int) -> str:
+        return self.names.values[self.name_ids[row]]
+
+    def type(self, row: int) -> str:
+        return self.types.values[self.type_ids[row]]
+
+    def file(self, row: int) -> str:
+        return self.files.values[self.file_ids[row]]
+
+    def rows_of_type(self, *types: str) -> List[int]:
+        codes = {self.types.index[t] for t in types if t in self.types.index}
+        return [row for row in self.live_rows() if self.type_ids[row] in codes]
+
+    def to_dict(self, row: int) -> Dict[str, Any]:
+        node = {
+            "id": self.id(row),
+            "name": self.name(row),
+            "type": self.type(row),
+            "file": self.file(row),
+            "line_start": self.line_start[row],
+            "line_end": self.line_end[row]
+        }
+        for key, column in self.columns.items():
+            if column[row] is not None:
+                node[key] = column[row]
+        return node
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [self.to_dict(row) for row in self.live_rows()]
+
+
+class EdgeList:
+    """Edges between symbol rows, kept as two parallel arrays"""
+
+    def __init__(self, table: SymbolTable, sources: Iterable[int] = (), targets: Iterable[int] = ()):
+        self.table = table
+        self.sources = array('I', sources)
+        self.targets = array('I', targets)
+
+    @classmethod
+    def from_pairs(cls, table: SymbolTable, pairs: Iterable[Tuple[int, int]]) -> 'EdgeList':
+        edges = cls(table)
+        for source, target in pairs:
+            edges.sources.append(source)
+            edges.targets.append(target)
+        return edges
+
+    def __len__(self) -> int:
+        return len(self.sources)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for source, target in zip(self.sources, self.targets):
+            yield {"source": self.table.id(source), "target": self.table.id(target), "weight": 1}
+
+    def pairs(self) -> Iterator[Tuple[int, int]]:
+        return zip(self.sources, self.targets)
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+
+def to_json(value: Any) -> Any:
+    """Convert symbol tables and edge lists inside a result into plain JSON data"""
+    if isinstance(value, (SymbolTable, EdgeList)):
+        return value.to_dicts()
+    if isinstance(value, SymbolView):
+        return value.to_dict()
+    if isinstance(value, dict):
+        return {k: to_json(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json(v) for v in value]
+    return value
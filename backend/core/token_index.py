@@ -0,0 +1,90 @@
+"""
+Name token index
+Inverted index from the words in symbol names to the rows that contain
+them, used to find related names without comparing every pair
+"""
+import re
+from typing import Dict, FrozenSet, Iterable, List, Set
+
+# Verbs that say what a function does, not what it is about
+NAME_VERBS = frozenset(('get', 'set', 'delete', 'update', 'display', 'show', 'save', 'load'))
+
+# Shorter words are too generic to relate two names
+MIN_TOKEN_LENGTH = 3
+
+_WORD = re.compile(r'[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+')
+
+
+def split_name(name: str) -> FrozenSet[str]:
+    """
+    Lowercase words of an identifier, camelCase and snake_case aware
+
+    getProductList -> {product, list}; HTTPServer_init -> {http, server, init}
+    """
+    return frozenset(
+        word
+        for word in (w.lower() for w in _WORD.findall(name))
+        if len(word) >= MIN_TOKEN_LENGTH and word not in NAME_VERBS
+    )
+
+
+class TokenIndex:
+    """
+    Word -> rows postings
+
+    Names are related when every word of one also appears in the other
+    (getProduct -> displayProductList). Words with more than `cap`
+    postings are never used to find candidates, so a word like "data"
+    cannot link everything to everything.
+    """
+
+    def __init__(self, cap: int):
+        self.cap = cap
+        self.tokens: Dict[int, FrozenSet[str]] = {}
+        self.postings: Dict[str, Set[int]] = {}
+
+    def add(self, row: int, name: str):
+        tokens = split_name(name)
+        if not tokens:
+            return
+        self.tokens[row] = tokens
+        for token in tokens:
+            self.postings.setdefault(token, set()).add(row)
+
+    def remove(self, rows: Iterable[int]):
+        for row in rows:
+            for token in self.tokens.pop(row, ()):
+                posting = self.postings[token]
+                posting.discard(row)
+                if not posting:
+                    del self.postings[token]
+
+    def _rarest(self, tokens: FrozenSet[str]) -> Set[int]:
+        posting = min((self.postings[token] for token in tokens), key=len)
+        return posting if len(posting) <= self.cap else set()
+
+    def related_to(self, row: int) -> List[int]:
+        """Rows whose names contain every word of row's name"""
+        tokens = self.tokens.get(row)
+        if not tokens:
+            return []
+        # Every match contains the rarest word, so its posting is the candidate set
+        return [
+            other for other in sorted(self._rarest(tokens))
+            if other != row and tokens <= self.tokens[other]
+        ]
+
+    def related_from(self, row: int) -> List[int]:
+        """Rows whose name words all appear in row's name (inverse of related_to)"""
+        tokens = self.tokens.get(row)
+        if not tokens:
+            return []
+        candidates = set()
+        for token in tokens:
+            posting = self.postings[token]
+            if len(posting) <= self.cap:
+                candidates |= posting
+        return [
+            other for other in sorted(candidates)
+            if other != row and self.tokens[other] <= tokens and self._rarest(self.tokens[other])
+        ]
@@ -43,4 +43,14 @@ class ConnectionManager:
             "agent": agent,
             "data": result
         })
+    
+    async def send_partial(self, client_id: str, agent: str, data: dict):
+        await self.send_to_client(client_id, {
+            "type": "partial",
+            "agent": agent,
+            "data": data
+        })
+
+# Shared by the WebSocket endpoint and the analysis routes
+manager = ConnectionManager()
 
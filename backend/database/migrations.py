@@ -0,0 +1,47 @@
+"""
+Schema upgrades
+create_all() only creates missing tables, so columns added to a table
+after it first shipped are added here, at startup, to databases that
+already have the table. Every step is idempotent.
+"""
+from typing import Dict, List, Tuple
+
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.engine import Engine
+
+from database.models import DependencyGraph
+
+# Columns added to existing tables, oldest first
+ADDED_COLUMNS: List[Tuple[Table, Tuple[str, ...]]] = [
+    # Binary graph store (core.graph_store)
+    (DependencyGraph.__table__, ('analysis_id', 'format_version', 'data')),
+]
+
+
+def upgrade_schema(engine: Engine) -> Dict[str, List[str]]:
+    """
+    Add any missing columns in ADDED_COLUMNS (with their foreign keys and
+    indexes) to existing tables, and return {table: [added columns]}
+    """
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    added: Dict[str, List[str]] = {}
+    with engine.begin() as connection:
+        for table, names in ADDED_COLUMNS:
+            if not inspector.has_table(table.name):
+                continue  # create_all() builds it complete
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            missing = [name for name in names if name not in existing]
+            for name in missing:
+                column = table.c[name]
+                ddl = f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column.type.compile(dialect=engine.dialect)}"
+                for foreign_key in column.foreign_keys:
+                    target = foreign_key.column
+                    ddl += f" REFERENCES {preparer.format_table(target.table)} ({preparer.format_column(target)})"
+                connection.execute(text(ddl))
+            for index in table.indexes:
+                if any(column.name in missing for column in index.columns):
+                    index.create(connection, checkfirst=True)
+            if missing:
+                added[table.name] = missing
+    return added
@@ -1,7 +1,7 @@
 """
 Database models for Codebase Archeologist
 """
-from sqlalchemy import Column, Integer, String, Text, Float, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Float, DateTime, JSON, ForeignKey, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database.database import Base
@@ -37,8 +37,13 @@ class DependencyGraph(Base):
     
     id = Column(Integer, primary_key=True, index=True)
     project_id = Column(Integer, ForeignKey("projects.id"))
+    # dependency_mapper analysis this graph was stored from
+    analysis_id = Column(Integer, ForeignKey("analyses.id"), index=True)
     nodes = Column(JSON)
     edges = Column(JSON)
     graph_metadata = Column(JSON)  # Renamed from 'metadata' to avoid SQLAlchemy reserved word conflict
+    # Binary graph (core.graph_store) and the format version it was written with
+    format_version = Column(Integer)
+    data = Column(LargeBinary)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
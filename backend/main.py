@@ -10,9 +10,12 @@ import uvicorn
 import os
 
 from api.routes import analysis, projects, chat
-from core.websocket_manager import ConnectionManager
+from core.websocket_manager import manager
 from database.database import engine, Base
+from database.migrations import upgrade_schema
 from config.settings import settings
+from core.parse_engine import shutdown_executor
+from core.llm_client import close_llm_client
 
 
 # -----------------------------
@@ -21,7 +24,12 @@ from config.settings import settings
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     Base.metadata.create_all(bind=engine)
+    # Add columns introduced since the tables were created
+    for table, columns in upgrade_schema(engine).items():
+        print(f"✅ Upgraded {table}: added {', '.join(columns)}")
     yield
+    shutdown_executor()
+    await close_llm_client()
 
 
 # -----------------------------
@@ -60,12 +68,6 @@ app.add_middleware(
 )
 
 
-# -----------------------------
-# WebSocket manager
-# -----------------------------
-manager = ConnectionManager()
-
-
 # -----------------------------
 # Routers
 # -----------------------------
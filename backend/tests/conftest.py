@@ -0,0 +1,7 @@
+"""
+Shared test setup: make the backend packages (agents, core, ...) importable
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,37 @@
+"""
+Centrality tests
+"""
+import networkx as nx
+import numpy as np
+
+from core.centrality import betweenness, pagerank
+from core.csr_graph import CSRGraph
+
+
+def _graph(num_nodes, edges):
+    graph = nx.DiGraph()
+    graph.add_nodes_from(range(num_nodes))
+    graph.add_edges_from(edges)
+    return graph, CSRGraph.from_networkx(graph, num_nodes)
+
+
+def test_pagerank_ranks_sink_highest():
+    # Star into node 0: every other node's rank flows to it
+    _, csr = _graph(5, [(node, 0) for node in range(1, 5)])
+    rank = pagerank(csr)
+    assert np.isclose(rank.sum(), 1.0)
+    assert rank[0] > rank[1] and np.allclose(rank[1:], rank[1])
+
+
+def test_pagerank_without_edges():
+    # Regression: an edgeless graph used to fail casting the int bincount
+    for num_nodes in (1, 4):
+        _, csr = _graph(num_nodes, [])
+        assert np.allclose(pagerank(csr), np.full(num_nodes, 1.0 / num_nodes))
+        assert not betweenness(csr).any()
+
+
+if __name__ == "__main__":
+    test_pagerank_ranks_sink_highest()
+    test_pagerank_without_edges()
+    print("✅ Centrality tests passed")
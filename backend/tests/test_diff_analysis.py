@@ -0,0 +1,113 @@
+"""
+Diff analysis: a stored graph patched with apply_delta must match a full analysis at head
+"""
+import asyncio
+import subprocess
+
+import pytest
+
+from agents.orchestrator import Orchestrator
+from config.settings import settings
+from core import parse_cache, repo_cache
+from core.symbol_table import to_json
+
+BASE = {
+    "shop/models.py": (
+        "class Product:\n    def price(self):\n        return 1\n\n"
+        "class Cart:\n    def total(self):\n        from shop.pricing import cart_total\n        return cart_total(self)\n"
+    ),
+    "shop/pricing.py": (
+        "from shop.models import Product\n\n"
+        "def cart_total(cart):\n    return sum(p.price() for p in cart.items) + shipping(cart)\n\n"
+        "def shipping(cart):\n    return cart_total(cart) if cart.retry else 0\n"
+    ),
+    "shop/report.py": "from shop.pricing import shipping\n\ndef report(cart):\n    return shipping(cart)\n",
+    "tools/cleanup.py": "def unused_helper():\n    return None\n",
+}
+
+HEAD = {
+    # Modified: a new function, and shipping() calls it instead of cart_total()
+    "shop/pricing.py": (
+        "from shop.models import Product\n\n"
+        "def cart_total(cart):\n    return sum(p.price() for p in cart.items) + shipping(cart)\n\n"
+        "def shipping(cart):\n    return discount(cart)\n\n"
+        "def discount(cart):\n    return 0\n"
+    ),
+    # Added, importing an existing symbol
+    "shop/checkout.py": "from shop.pricing import cart_total\n\ndef checkout(cart):\n    return cart_total(cart)\n",
+}
+REMOVED = ["tools/cleanup.py"]
+
+
+def _git(path, *args):
+    return subprocess.run(
+        ['git', '-C', str(path), '-c', 'user.email=test@example.com', '-c', 'user.name=test', *args],
+        check=True, capture_output=True, text=True
+    ).stdout.strip()
+
+
+def _write(path, files):
+    for name, text in files.items():
+        (path / name).parent.mkdir(parents=True, exist_ok=True)
+        (path / name).write_text(text)
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "")
+    monkeypatch.setattr(settings, "PARSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "REPO_CACHE_DIR", str(tmp_path / "mirrors"))
+    monkeypatch.setattr(parse_cache, "_parse_cache", None)
+    monkeypatch.setattr(repo_cache, "_repo_cache", None)
+    path = tmp_path / "repo"
+    path.mkdir()
+    _git(path, 'init', '-q', '-b', 'main')
+    _write(path, BASE)
+    _git(path, 'add', '-A')
+    _git(path, 'commit', '-qm', 'base')
+    return path
+
+
+async def _collect(stream):
+    results = {}
+    async for result in stream:
+        assert result["agent"] != "error", result.get("error")
+        if "data" in result:
+            results[result["agent"]] = to_json(result["data"])
+    return results
+
+
+def _graph(results):
+    graph = results["dependency_mapper"]
+    analysis = graph["analysis"]
+    return {
+        "nodes": sorted((node["id"], node["fan_in"], node["fan_out"], node["risk"]) for node in graph["nodes"]),
+        "edges": sorted((edge["source"], edge["target"]) for edge in graph["edges"]),
+        "dead": sorted(analysis["dead_functions"]),
+        "cycles": sorted(sorted(component["members"]) for component in analysis["cycle_components"]),
+    }
+
+
+@pytest.mark.parametrize("heuristics", [False, True])
+def test_delta_matches_full_rebuild(repo, monkeypatch, heuristics):
+    monkeypatch.setattr(settings, "GRAPH_HEURISTIC_EDGES", heuristics)
+    url = str(repo)
+    base_results = asyncio.run(_collect(Orchestrator().analyze(url)))
+    base_graph = _graph(base_results)
+    base = _git(repo, 'rev-parse', 'HEAD')
+
+    _write(repo, HEAD)
+    for name in REMOVED:
+        (repo / name).unlink()
+    _git(repo, 'add', '-A')
+    _git(repo, 'commit', '-qm', 'head')
+
+    patched = asyncio.run(_collect(Orchestrator().analyze_diff(url, base, 'HEAD', base_results)))
+    full = asyncio.run(_collect(Orchestrator().analyze(url)))
+
+    assert _graph(patched) == _graph(full)
+    assert _graph(full) != base_graph
+    diff = patched["diff_analysis"]
+    assert diff["files"] == {"added": ["shop/checkout.py"], "modified": ["shop/pricing.py"], "removed": REMOVED}
+    assert "shop/pricing.py::discount" in diff["changed_symbols"]["added"]
+    assert "tools/cleanup.py::unused_helper" in diff["changed_symbols"]["removed"]
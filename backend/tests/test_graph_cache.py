@@ -0,0 +1,122 @@
+"""
+Graph cache tests: single-flight loads, invalidation and size accounting
+"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from core.csr_graph import CSRGraph
+from core.graph_cache import _ROW_BYTES, GraphCache, graph_nbytes
+from core.graph_store import StoredGraph, encode_graph
+from core.symbol_table import SymbolTable
+
+
+def _graph(num_nodes=4):
+    symbols = SymbolTable.from_dicts(
+        {"file": f"pkg/mod{row % 2}.py", "name": f"f{row}", "type": "function"} for row in range(num_nodes)
+    )
+    graph = CSRGraph(num_nodes, range(num_nodes - 1), range(1, num_nodes), np.ones(num_nodes, dtype=bool))
+    return symbols, graph
+
+
+class SlowLoader:
+    def __init__(self, delay=0.1, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return _graph()
+
+
+def _get_concurrently(cache, key, load, threads=8):
+    results, errors = [], []
+
+    def get():
+        try:
+            results.append(cache.get(key, load))
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=get) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return results, errors
+
+
+def test_concurrent_misses_share_one_load():
+    cache = GraphCache(10 ** 6)
+    load = SlowLoader()
+    results, errors = _get_concurrently(cache, (1, 1), load)
+    assert not errors and load.calls == 1
+    assert all(result is results[0] for result in results)
+    # Cached from now on
+    assert cache.get((1, 1), load) is results[0] and load.calls == 1
+
+
+def test_failed_load_reaches_every_waiter_and_is_not_cached():
+    cache = GraphCache(10 ** 6)
+    load = SlowLoader(error=LookupError("gone"))
+    results, errors = _get_concurrently(cache, (1, 1), load)
+    assert not results and len(errors) == 8 and load.calls == 1
+    assert all(isinstance(error, LookupError) for error in errors)
+    retry = SlowLoader(delay=0)
+    cache.get((1, 1), retry)
+    assert retry.calls == 1
+
+
+def test_invalidate_during_load_keeps_nothing():
+    cache = GraphCache(10 ** 6)
+    load = SlowLoader(delay=0.2)
+    loader = threading.Thread(target=cache.get, args=((1, 1), load))
+    loader.start()
+    time.sleep(0.05)
+    cache.invalidate(1)
+    loader.join()
+    assert cache.size == 0
+    cache.get((1, 1), load)
+    assert load.calls == 2
+
+
+def test_least_recently_used_graphs_are_evicted():
+    size = graph_nbytes(*_graph())
+    cache = GraphCache(2 * size)
+    for analysis_id in (1, 2):
+        cache.get((1, analysis_id), _graph)
+    cache.get((1, 1), pytest.fail)
+    cache.get((1, 3), _graph)
+    assert cache.size == 2 * size
+    cache.get((1, 1), pytest.fail)
+    load = SlowLoader(delay=0)
+    cache.get((1, 2), load)
+    assert load.calls == 1
+
+
+def test_rollup_is_kept_and_sized_with_its_graph():
+    cache = GraphCache(10 ** 6)
+    rollup = cache.rollup((1, 1), _graph)
+    size = cache.size
+    assert size > graph_nbytes(*cache.get((1, 1), pytest.fail))
+    assert cache.rollup((1, 1), pytest.fail) is rollup and cache.size == size
+    cache.invalidate(1)
+    assert cache.size == 0
+
+
+def test_stored_graph_counts_its_blob_once():
+    symbols, graph = _graph(1000)
+    blob = encode_graph(symbols, graph, graph.reachability)
+    stored = StoredGraph(blob)
+    row_bytes = len(stored.symbols) * _ROW_BYTES
+    # Every array is a view into the blob
+    assert graph_nbytes(stored.symbols, stored.graph) == row_bytes + len(blob)
+    # A built graph counts its own arrays, index included
+    index_bytes = sum(array.nbytes for array in graph.reachability.arrays() if array is not None)
+    assert graph_nbytes(symbols, graph) > row_bytes + index_bytes
@@ -0,0 +1,85 @@
+"""
+Incrementally maintained graph metrics against networkx after random deltas
+"""
+import random
+
+import networkx as nx
+
+from core.graph_metrics import GraphMetrics
+
+
+def _cyclic_components(graph):
+    return sorted(
+        sorted(component) for component in nx.strongly_connected_components(graph)
+        if len(component) > 1 or graph.has_edge(*(next(iter(component)),) * 2)
+    )
+
+
+def _degrees(graph, k=10):
+    ranked = sorted(graph.nodes(), key=lambda node: (-graph.degree(node), node))
+    ranked_in = sorted(graph.nodes(), key=lambda node: (-graph.in_degree(node), node))
+    return ranked[:k], ranked_in[:k], sorted(node for node in graph if graph.degree(node) == 0)
+
+
+def _check(metrics, graph):
+    assert sorted(members for _, members in metrics.components()) == _cyclic_components(graph)
+    assert (metrics.degree.top(10), metrics.in_degree.top(10), metrics.isolated()) == _degrees(graph)
+
+
+def _random_delta(rng, graph, next_node):
+    """Change the graph like apply_delta does and return what update() is given"""
+    nodes = list(graph.nodes())
+    removed_nodes = rng.sample(nodes, min(len(nodes), rng.randint(0, 3)))
+    removed_edges = set(graph.in_edges(removed_nodes)) | set(graph.out_edges(removed_nodes))
+    graph.remove_nodes_from(removed_nodes)
+    edges = list(graph.edges())
+    dropped = rng.sample(edges, min(len(edges), rng.randint(0, 4)))
+    graph.remove_edges_from(dropped)
+    removed_edges.update(dropped)
+
+    added_nodes = list(range(next_node, next_node + rng.randint(0, 3)))
+    graph.add_nodes_from(added_nodes)
+    nodes = list(graph.nodes())
+    added_edges = set()
+    for _ in range(rng.randint(0, 6)):
+        source, target = rng.choice(nodes), rng.choice(nodes)
+        if not graph.has_edge(source, target):
+            graph.add_edge(source, target)
+            added_edges.add((source, target))
+    # Every edge of a new node is new
+    added_edges.update(graph.in_edges(added_nodes))
+    added_edges.update(graph.out_edges(added_nodes))
+    return removed_nodes, removed_edges, added_nodes, added_edges
+
+
+def test_incremental_updates_match_networkx():
+    rng = random.Random(7)
+    for _ in range(20):
+        graph = nx.gnp_random_graph(30, 0.06, seed=rng.randrange(10 ** 6), directed=True)
+        metrics = GraphMetrics(graph)
+        metrics.rebuild()
+        _check(metrics, graph)
+        next_node = graph.number_of_nodes()
+        for _ in range(15):
+            delta = _random_delta(rng, graph, next_node)
+            next_node += len(delta[2])
+            metrics.update(*delta)
+            _check(metrics, graph)
+
+
+def test_self_loop_is_a_cycle():
+    graph = nx.DiGraph([(0, 1)])
+    metrics = GraphMetrics(graph)
+    metrics.rebuild()
+    graph.add_edge(1, 1)
+    metrics.update([], [], [], [(1, 1)])
+    assert [members for _, members in metrics.components()] == [[1]]
+    graph.remove_edge(1, 1)
+    metrics.update([], [(1, 1)], [], [])
+    assert metrics.components() == []
+
+
+if __name__ == "__main__":
+    test_incremental_updates_match_networkx()
+    test_self_loop_is_a_cycle()
+    print("✅ Graph metrics tests passed")
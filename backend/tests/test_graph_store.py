@@ -0,0 +1,68 @@
+"""
+Binary graph store round trip tests
+"""
+import numpy as np
+import pytest
+
+from core.csr_graph import CSRGraph
+from core.graph_store import GraphFormatError, StoredGraph, encode_graph
+from core.symbol_table import SymbolTable
+
+NODES = [
+    {"file": "app/models.py", "name": "User", "type": "class", "line_start": 1, "line_end": 9,
+     "pagerank": 0.25, "fan_in": 2, "params": ["self"]},
+    {"file": "app/models.py", "name": "User.save", "type": "method", "line_start": 3, "line_end": 5, "fan_in": 0},
+    {"file": "app/service.py", "name": "create_user", "type": "function", "line_start": 1, "line_end": 4,
+     "pagerank": 0.5, "docstring": "Make a user"},
+    {"file": "app/old.py", "name": "legacy", "type": "function", "line_start": 1, "line_end": 2, "fan_in": 7},
+    {"file": "app/service.py", "name": "delete_user", "type": "function", "line_start": 6, "line_end": 8},
+]
+EDGES = [(2, 0), (0, 1), (1, 0), (4, 2), (2, 3)]
+
+
+def _stored_graph():
+    symbols = SymbolTable.from_dicts(NODES)
+    # Tombstoned rows keep their id, with no edges left
+    symbols.remove_files(["app/old.py"])
+    edges = [edge for edge in EDGES if symbols.alive[edge[0]] and symbols.alive[edge[1]]]
+    graph = CSRGraph(len(symbols), *zip(*edges), np.asarray(symbols.alive, dtype=bool))
+    return symbols, graph
+
+
+def test_round_trip():
+    symbols, graph = _stored_graph()
+    stored = StoredGraph(encode_graph(symbols, graph, graph.reachability))
+
+    assert (stored.num_nodes, stored.num_edges) == (graph.num_nodes, graph.number_of_edges())
+    assert stored.symbols.to_dicts() == symbols.to_dicts()
+    assert stored.symbols.row_of("app/service.py::create_user") == 2
+    assert stored.symbols.row_of("app/old.py::legacy") is None
+    for name in ("present", "fwd_offsets", "fwd_targets", "rev_offsets", "rev_sources"):
+        assert getattr(stored.graph, name).tolist() == getattr(graph, name).tolist()
+
+    # The stored index is attached instead of being rebuilt, and answers the same
+    loaded = stored.graph.reachability
+    for expected, array in zip(graph.reachability.arrays(), loaded.arrays()):
+        assert (expected is None) == (array is None)
+        if expected is not None:
+            assert array.tolist() == expected.tolist()
+    nodes = stored.graph.node_array().tolist()
+    sources, targets = zip(*[(source, target) for source in nodes for target in nodes])
+    assert loaded.reaches_many(sources, targets).tolist() == graph.reachability.reaches_many(sources, targets).tolist()
+
+
+def test_without_reachability_index():
+    symbols, graph = _stored_graph()
+    stored = StoredGraph(encode_graph(symbols, graph))
+    assert "reachability" not in vars(stored.graph)
+    assert stored.graph.reachability.affected_count(4) == 3
+
+
+def test_rejects_other_blobs():
+    symbols, graph = _stored_graph()
+    data = encode_graph(symbols, graph)
+    for blob in (data[:6], b"not a graph at all", data[:8] + b"\x63" + data[9:]):
+        with pytest.raises(GraphFormatError):
+            StoredGraph(blob)
+    with pytest.raises(ValueError):
+        encode_graph(SymbolTable.from_dicts(NODES[:2]), graph)
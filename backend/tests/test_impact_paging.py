@@ -0,0 +1,85 @@
+"""
+Impact analysis paging: cursors, page limits and max_depth against networkx distances
+"""
+import networkx as nx
+import pytest
+
+from agents.impact_analyzer import ImpactAnalyzer
+from core.csr_graph import CSRGraph
+from core.symbol_table import SymbolTable
+
+NUM_NODES = 120
+
+
+@pytest.fixture(scope="module")
+def graph():
+    graph = nx.gnp_random_graph(NUM_NODES, 0.04, seed=11, directed=True)
+    symbols = SymbolTable.from_dicts(
+        {"file": f"pkg/mod{row // 10}.py", "name": f"f{row}", "type": "function"} for row in range(NUM_NODES)
+    )
+    return graph, symbols, ImpactAnalyzer(CSRGraph.from_networkx(graph, NUM_NODES), symbols)
+
+
+def _target(graph):
+    """Node with the most descendants, so paging and depths matter"""
+    return max(graph.nodes(), key=lambda node: (len(nx.descendants(graph, node)), -node))
+
+
+def _expected(graph, symbols, target, max_depth):
+    lengths = nx.single_source_shortest_path_length(graph, target, cutoff=max_depth)
+    order = sorted((distance, node) for node, distance in lengths.items() if node != target)
+    return [symbols.id(node) for _, node in order], [distance for distance, _ in order]
+
+
+@pytest.mark.parametrize("max_depth", [None, 0, 1, 2, 3])
+def test_pages_cover_affected_nodes_nearest_first(graph, max_depth):
+    graph, symbols, analyzer = graph
+    target = symbols.id(_target(graph))
+    expected_ids, expected_distances = _expected(graph, symbols, _target(graph), max_depth)
+
+    ids, distances, cursor, pages = [], [], None, 0
+    while True:
+        page = analyzer.analyze_impact(target, max_depth=max_depth, cursor=cursor, limit=7)
+        assert len(page["affected_nodes"]) <= 7
+        assert page["affected_count"] == len(expected_ids)
+        assert ("report" in page) == (cursor is None)
+        ids += page["affected_nodes"]
+        distances += page["affected_distances"]
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        assert cursor == page["affected_nodes"][-1]
+
+    assert ids == expected_ids
+    assert distances == expected_distances
+    assert pages == max(1, -(-len(expected_ids) // 7))
+    assert page["depth_counts"] == [expected_distances.count(depth) for depth in range(1, max(expected_distances, default=0) + 1)]
+
+
+def test_count_only_and_stream_agree_with_pages(graph):
+    graph, symbols, analyzer = graph
+    target = symbols.id(_target(graph))
+    full = analyzer.analyze_impact(target, max_depth=2, limit=NUM_NODES)
+    counts = analyzer.analyze_impact(target, max_depth=2, count_only=True)
+    assert "affected_nodes" not in counts
+    assert {key: full[key] for key in counts} == counts
+
+    records = list(analyzer.stream_impact(target, max_depth=2))
+    assert records[0] == counts
+    assert [record["id"] for record in records[1:]] == full["affected_nodes"]
+    assert [record["distance"] for record in records[1:]] == full["affected_distances"]
+
+
+def test_invalid_cursor_and_unknown_target(graph):
+    graph, symbols, analyzer = graph
+    target = symbols.id(_target(graph))
+    two_hops = _expected(graph, symbols, _target(graph), 2)[0][-1]
+    # Cursors must be affected nodes of this target within max_depth
+    for cursor in (target, two_hops):
+        with pytest.raises(ValueError):
+            analyzer.analyze_impact(target, max_depth=1, cursor=cursor)
+    assert analyzer.analyze_impact(target, max_depth=2, cursor=two_hops)["next_cursor"] is None
+    with pytest.raises(ValueError):
+        analyzer.analyze_impact(target, cursor="pkg/none.py::missing")
+    assert analyzer.analyze_impact("pkg/none.py::missing")["risk"] == "UNKNOWN"
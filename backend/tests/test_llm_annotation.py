@@ -0,0 +1,106 @@
+"""
+Concurrent LLM annotation tests against a stub transport (no network)
+"""
+import asyncio
+import json
+import re
+import time
+
+import httpx
+import pytest
+
+from agents.business_logic_extractor import BusinessLogicExtractor
+from config.settings import settings
+from core import llm_client
+
+
+class StubLLM:
+    """Gemini-shaped endpoint: echoes the node name, optionally failing first"""
+
+    def __init__(self, delay=0.01, failures=None):
+        self.delay = delay
+        # name -> statuses to answer with before succeeding
+        self.failures = {name: list(statuses) for name, statuses in (failures or {}).items()}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        prompt = json.loads(request.content)["contents"][0]["parts"][0]["text"]
+        name = re.search(r"Name: (\S+)", prompt).group(1)
+        self.requests.append((name, time.monotonic()))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.in_flight -= 1
+        pending = self.failures.get(name)
+        if pending:
+            return httpx.Response(pending.pop(0), headers={"Retry-After": "0"})
+        text = f"Validates the payment for {name}"
+        return httpx.Response(200, json={"candidates": [{"content": {"parts": [{"text": text}]}}]})
+
+    def count(self, name):
+        return sum(1 for requested, _ in self.requests if requested == name)
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_API_BASE", "http://llm.test/v1beta")
+    monkeypatch.setattr(settings, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(settings, "LLM_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "LLM_REQUESTS_PER_MINUTE", 0)
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 3)
+    server = StubLLM()
+    llm_client.set_transport(httpx.MockTransport(server))
+    yield server
+    llm_client.set_transport(None)
+
+
+def _nodes(names):
+    return [{"id": f"app.py::{name}", "name": name, "type": "function", "file": "app.py"} for name in names]
+
+
+def test_order_preserved_with_bounded_concurrency(stub):
+    names = [f"n{i}" for i in range(30)]
+    annotated = asyncio.run(BusinessLogicExtractor().extract_logic(_nodes(names), {}))
+
+    assert [node["name"] for node in annotated] == names
+    assert all(node["description"].endswith(node["name"]) for node in annotated)
+    assert stub.max_in_flight == settings.LLM_CONCURRENCY
+
+
+def test_duplicates_share_one_request(stub):
+    annotated = asyncio.run(BusinessLogicExtractor().extract_logic(_nodes(["a", "b", "a", "a", "b"]), {}))
+
+    assert [node["name"] for node in annotated] == ["a", "b", "a", "a", "b"]
+    assert stub.count("a") == 1 and stub.count("b") == 1
+
+
+def test_rate_limited_and_unavailable_responses_are_retried(stub):
+    stub.failures = {"flaky": [429, 503]}
+    annotated = asyncio.run(BusinessLogicExtractor().extract_logic(_nodes(["flaky", "ok"]), {}))
+
+    assert stub.count("flaky") == 3
+    assert annotated[0]["description"] == "Validates the payment for flaky"
+
+
+def test_retries_give_up_after_max_retries(stub, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 1)
+    stub.failures = {"down": [503, 503, 503]}
+    annotated = asyncio.run(BusinessLogicExtractor().extract_logic(_nodes(["down"]), {}))
+
+    assert stub.count("down") == 2
+    assert annotated[0]["description"] == "Analysis unavailable"
+
+
+def test_retries_wait_for_the_rate_pacer(stub, monkeypatch):
+    # 1200 a minute: request starts at least 50 ms apart, retries included
+    monkeypatch.setattr(settings, "LLM_REQUESTS_PER_MINUTE", 1200)
+    stub.failures = {"limited": [429, 429]}
+    asyncio.run(BusinessLogicExtractor().extract_logic(_nodes(["limited", "other"]), {}))
+
+    starts = sorted(started for _, started in stub.requests)
+    assert len(starts) == 4
+    assert min(later - earlier for earlier, later in zip(starts, starts[1:])) >= 0.045
@@ -0,0 +1,35 @@
+"""
+Schema upgrade test: a dependency_graphs table from before the binary
+graph store gets the new columns, and the upgrade is idempotent
+"""
+from sqlalchemy import create_engine, inspect, text
+
+from database.database import Base
+from database.migrations import upgrade_schema
+
+
+def test_upgrade_adds_graph_store_columns(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE dependency_graphs (id INTEGER PRIMARY KEY, project_id INTEGER, "
+            "nodes JSON, edges JSON, graph_metadata JSON, created_at DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO dependency_graphs (project_id) VALUES (1)"))
+    Base.metadata.create_all(bind=engine)
+
+    assert upgrade_schema(engine) == {"dependency_graphs": ["analysis_id", "format_version", "data"]}
+    inspector = inspect(engine)
+    columns = {column["name"] for column in inspector.get_columns("dependency_graphs")}
+    assert {"analysis_id", "format_version", "data"} <= columns
+    assert any(index["column_names"] == ["analysis_id"] for index in inspector.get_indexes("dependency_graphs"))
+    with engine.connect() as connection:
+        assert connection.execute(text("SELECT project_id, data FROM dependency_graphs")).fetchall() == [(1, None)]
+
+    assert upgrade_schema(engine) == {}
+
+
+def test_fresh_database_needs_no_upgrade(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'new.db'}")
+    Base.metadata.create_all(bind=engine)
+    assert upgrade_schema(engine) == {}
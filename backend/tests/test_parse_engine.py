@@ -0,0 +1,82 @@
+"""
+Pool vs in-process parsing: both must number symbols and build the graph identically
+"""
+import asyncio
+
+import pytest
+
+from agents.dependency_mapper import DependencyMapper
+from agents.repo_analyzer import RepoAnalyzer
+from config.settings import settings
+from core import parse_cache, parse_engine
+
+FILES = {
+    "app/main.py": (
+        "from app.models import User, Order\n"
+        "from app.service import place_order\n\n"
+        "def run():\n    user = User()\n    return place_order(user, Order())\n"
+    ),
+    "app/models.py": (
+        "class User:\n    def orders(self):\n        from app.service import load_orders\n"
+        "        return load_orders(self)\n\n"
+        "class Order:\n    def total(self):\n        return 0\n"
+    ),
+    "app/service.py": (
+        "from app.models import Order\n\n"
+        "def place_order(user, order):\n    return load_orders(user) + [order]\n\n"
+        "def load_orders(user):\n    return user.orders()\n"
+    ),
+    "app/util/format.py": "def format_order(order):\n    return str(order.total())\n",
+    "web/client.js": (
+        "import { formatPrice } from './price';\n"
+        "export function showOrder(order) { return formatPrice(order.total); }\n"
+    ),
+    "web/price.js": "export function formatPrice(value) { return `$${value}`; }\n",
+}
+
+
+@pytest.fixture
+def repo(tmp_path):
+    for name, text in FILES.items():
+        path = tmp_path / "repo" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text)
+    return str(tmp_path / "repo")
+
+
+@pytest.fixture(autouse=True)
+def no_caches(monkeypatch):
+    monkeypatch.setattr(settings, "PARSE_CACHE_ENABLED", False)
+    monkeypatch.setattr(settings, "REPO_CACHE_ENABLED", False)
+    monkeypatch.setattr(parse_cache, "_parse_cache", None)
+    yield
+    parse_engine.shutdown_executor()
+
+
+def analyze(monkeypatch, repo, pool):
+    monkeypatch.setattr(settings, "PARSE_PARALLEL_THRESHOLD", 1 if pool else 10 ** 9)
+    monkeypatch.setattr(settings, "PARSE_BATCH_SIZE", 1)
+    monkeypatch.setattr(settings, "PARSE_WORKERS", 2)
+    ast_data = asyncio.run(RepoAnalyzer()._extract_ast(repo))
+    graph = DependencyMapper().build_graph(ast_data)
+    return ast_data["nodes"].to_dicts(), graph["analysis"], sorted(graph["edges"].to_dicts(), key=str)
+
+
+def test_pool_matches_in_process(monkeypatch, repo):
+    serial = analyze(monkeypatch, repo, pool=False)
+    assert len(serial[0]) > len(FILES)
+    assert analyze(monkeypatch, repo, pool=True) == serial
+
+
+def test_partially_cached_run_matches_cold_run(monkeypatch, repo, tmp_path):
+    cold = analyze(monkeypatch, repo, pool=True)
+
+    monkeypatch.setattr(settings, "PARSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(settings, "PARSE_CACHE_DIR", str(tmp_path / "cache"))
+    analyze(monkeypatch, repo, pool=False)
+    # Evict every other file so cache hits and fresh parses interleave
+    cache = parse_cache.get_parse_cache()
+    cache._conn.execute("DELETE FROM entries WHERE rowid % 2 = 0")
+    cache._conn.commit()
+
+    assert analyze(monkeypatch, repo, pool=True) == cold
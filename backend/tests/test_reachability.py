@@ -0,0 +1,81 @@
+"""
+Reachability tests against nx.descendants
+"""
+import random
+
+import networkx as nx
+import numpy as np
+
+from core import reachability
+from core.csr_graph import CSRGraph
+from core.reachability import ReachabilityIndex, batch_descendants, descendant_counts
+
+
+def _graphs(seed=3, count=10):
+    """Random graphs with cycles and gaps in the id space (rows of removed symbols)"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        num_nodes = rng.randint(1, 60)
+        graph = nx.gnp_random_graph(num_nodes, rng.choice((0.02, 0.05, 0.1)), seed=rng.randrange(10 ** 6), directed=True)
+        graph.remove_nodes_from(rng.sample(range(num_nodes), num_nodes // 5))
+        yield graph, CSRGraph.from_networkx(graph, num_nodes)
+
+
+def test_batch_descendants_match_networkx(monkeypatch):
+    # Several chunks per call
+    monkeypatch.setattr(reachability, "_CHUNK", 7)
+    for graph, csr in _graphs():
+        targets = list(graph.nodes())
+        for target, descendants in zip(targets, batch_descendants(csr, targets)):
+            assert descendants.tolist() == sorted(nx.descendants(graph, target))
+
+
+def test_batch_descendants_repeated_targets():
+    graph = nx.DiGraph([(0, 1), (1, 2), (2, 0), (2, 3)])
+    csr = CSRGraph.from_networkx(graph, 4)
+    results = batch_descendants(csr, [3, 0, 0, 2])
+    assert [result.tolist() for result in results] == [[], [1, 2, 3], [1, 2, 3], [0, 1, 3]]
+
+
+
+def test_reaches_many_matches_networkx():
+    for graph, csr in _graphs():
+        nodes = list(graph.nodes())
+        pairs = [(source, target) for source in nodes for target in nodes]
+        expected = [target in nx.descendants(graph, source) for source, target in pairs]
+        # With the full closure, and with interval labels plus search only
+        for closure_max in (10 ** 6, 0):
+            index = ReachabilityIndex.build(csr, closure_max=closure_max)
+            assert (index.closure is None) == (closure_max == 0)
+            answer = index.reaches_many([source for source, _ in pairs], [target for _, target in pairs])
+            assert answer.tolist() == expected
+
+
+def test_affected_counts_match_networkx():
+    for graph, csr in _graphs():
+        expected = np.zeros(csr.num_nodes, dtype=np.int64)
+        for node in graph.nodes():
+            expected[node] = len(nx.descendants(graph, node))
+        for closure_max in (10 ** 6, 0):
+            index = ReachabilityIndex.build(csr, closure_max=closure_max)
+            assert [index.affected_count(node) for node in graph.nodes()] == expected[list(graph.nodes())].tolist()
+        # The mapper's bulk counts: exact with a closure
+        counts, approximate = descendant_counts(csr)
+        assert not approximate
+        assert counts.tolist() == expected.tolist()
+
+
+def test_estimated_affected_counts():
+    # Without a closure the bulk counts are HyperLogLog estimates (about 13% error)
+    for graph, csr in _graphs(seed=5, count=5):
+        expected = np.zeros(csr.num_nodes, dtype=np.int64)
+        for node in graph.nodes():
+            expected[node] = len(nx.descendants(graph, node))
+        csr.reachability = ReachabilityIndex.build(csr, closure_max=0)
+        counts, approximate = descendant_counts(csr)
+        assert approximate
+        assert not counts[~csr.present].any()
+        assert (np.abs(counts - expected) <= np.maximum(3, 0.5 * expected)).all()
+        # Never below the rest of a node's own strongly connected component
+        sizes = csr.condensation.sizes()[csr.condensation.component_of]
+        assert (counts[csr.present] >= sizes[csr.present] - 1).all()
@@ -0,0 +1,91 @@
+"""
+Repository mirror cache tests against local file:// repositories
+"""
+import subprocess
+
+import pytest
+
+from core.repo_cache import RepoMirrorCache, RepoTooLargeError
+
+
+def _git(path, *args):
+    subprocess.run(
+        ['git', '-C', str(path), '-c', 'user.email=test@example.com', '-c', 'user.name=test', *args],
+        check=True, capture_output=True
+    )
+
+
+def _make_repo(path, files):
+    path.mkdir()
+    _git(path, 'init', '-q', '-b', 'main')
+    _commit(path, files)
+    return f"file://{path}"
+
+
+def _commit(path, files):
+    for name, text in files.items():
+        (path / name).parent.mkdir(parents=True, exist_ok=True)
+        (path / name).write_text(text)
+    _git(path, 'add', '-A')
+    _git(path, 'commit', '-qm', 'update')
+
+
+def _cache(tmp_path, max_bytes=1 << 30, max_checkout_bytes=1 << 30):
+    return RepoMirrorCache(str(tmp_path / 'cache'), max_bytes, max_checkout_bytes)
+
+
+def test_mirror_is_reused(tmp_path):
+    url = _make_repo(tmp_path / 'src', {'app.py': 'def main():\n    pass\n'})
+    cache = _cache(tmp_path)
+    cache.sync(url)
+    marker = cache.mirror_path(url) / 'marker'
+    marker.write_text('kept')
+
+    repo = cache.checkout(url, str(tmp_path / 'out'), ['.py'])
+
+    # Fetched into the existing mirror rather than cloned again
+    assert marker.exists()
+    assert (tmp_path / 'out' / 'app.py').exists()
+    assert repo.head.commit.hexsha == cache.sync(url).commit('HEAD').hexsha
+
+
+def test_new_commit_is_fetched(tmp_path):
+    src = tmp_path / 'src'
+    url = _make_repo(src, {'app.py': 'x = 1\n'})
+    cache = _cache(tmp_path)
+    cache.checkout(url, str(tmp_path / 'first'), ['.py'])
+
+    _commit(src, {'pkg/new.py': 'y = 2\n', 'README.md': 'docs\n'})
+    cache.checkout(url, str(tmp_path / 'second'), ['.py'])
+
+    assert (tmp_path / 'second' / 'pkg' / 'new.py').read_text() == 'y = 2\n'
+    # Sparse: only the requested file types are written
+    assert not (tmp_path / 'second' / 'README.md').exists()
+
+
+def test_checkout_size_limit(tmp_path):
+    url = _make_repo(tmp_path / 'src', {'big.py': 'x = 1\n' * 1000, 'notes.md': 'y' * 100000})
+    dest = tmp_path / 'out'
+
+    with pytest.raises(RepoTooLargeError):
+        _cache(tmp_path, max_checkout_bytes=1000).checkout(url, str(dest), ['.py'])
+    assert not dest.exists()
+
+    # Files outside the requested types don't count toward the limit
+    _cache(tmp_path, max_checkout_bytes=10000).checkout(url, str(dest), ['.py'])
+    assert (dest / 'big.py').exists()
+
+
+def test_leased_mirror_is_not_evicted(tmp_path):
+    first = _make_repo(tmp_path / 'a', {'a.py': 'a = 1\n'})
+    second = _make_repo(tmp_path / 'b', {'b.py': 'b = 1\n'})
+    # No budget: every sync evicts whatever it can
+    cache = _cache(tmp_path, max_bytes=0)
+
+    with cache.lease(first):
+        cache.sync(second)
+        assert cache.mirror_path(first).exists()
+
+    cache.sync(second)
+    assert not cache.mirror_path(first).exists()
+    assert cache.mirror_path(second).exists()
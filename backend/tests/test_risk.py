@@ -0,0 +1,22 @@
+"""
+Risk rating tests: the bulk heatmap must rate every node like impact analysis does
+"""
+import itertools
+
+import numpy as np
+
+from core.risk import risk_rating, risk_ratings
+
+
+def test_bulk_ratings_match_single_ratings():
+    values = range(0, 25, 2)
+    cases = list(itertools.product(values, values, values, ('class', 'function')))
+    affected, in_degrees, out_degrees, types = (np.array(column) for column in zip(*cases))
+    ratings = risk_ratings(affected, in_degrees, out_degrees, types == 'class')
+    assert ratings.tolist() == [risk_rating(*case) for case in cases]
+    assert set(ratings.tolist()) == {'HIGH', 'MEDIUM', 'LOW'}
+
+
+if __name__ == "__main__":
+    test_bulk_ratings_match_single_ratings()
+    print("✅ Risk tests passed")
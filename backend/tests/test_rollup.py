@@ -0,0 +1,103 @@
+"""
+Graph rollup tests: aggregate nodes and edge weights against a brute-force count
+"""
+import random
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from core.rollup import LEVELS, GraphRollup, aggregate_path
+from core.symbol_table import SymbolTable
+
+FILES = ["main.py", "app/api/routes.py", "app/api/auth.py", "app/models.py", "lib/util.py", "lib/text/format.py"]
+
+
+@pytest.fixture(scope="module")
+def rollup():
+    rng = random.Random(2)
+    symbols = SymbolTable.from_dicts(
+        {"file": file_path, "name": f"f{index}", "type": "function"}
+        for file_path in FILES for index in range(rng.randint(1, 5))
+    )
+    num_rows = len(symbols)
+    sources = np.array([rng.randrange(num_rows) for _ in range(80)])
+    targets = np.array([rng.randrange(num_rows) for _ in range(80)])
+    # Tombstoned rows and their edges drop out of every level
+    symbols.remove_files(["app/api/auth.py"])
+    return GraphRollup(symbols, sources, targets)
+
+
+def _aggregate(symbols, level, row):
+    if level == 'symbol':
+        return symbols.id(row)
+    return f"{level}:{aggregate_path(level, symbols.file(row))}"
+
+
+def _live_edges(rollup):
+    alive = rollup.symbols.alive
+    return [(s, t) for s, t in zip(rollup.sources.tolist(), rollup.targets.tolist()) if alive[s] and alive[t]]
+
+
+def _brute_force(rollup, key, rows):
+    """Nodes {id: (symbol_count, internal_edges)} and edge weights for a row -> aggregate mapping"""
+    weights, internal = Counter(), Counter()
+    for source, target in _live_edges(rollup):
+        if source not in rows and target not in rows:
+            continue
+        if key(source) == key(target):
+            internal[key(source)] += 1
+        else:
+            weights[key(source), key(target)] += 1
+    nodes = Counter(key(row) for row in rows)
+    return {node: (count, internal[node]) for node, count in nodes.items()}, dict(weights)
+
+
+def _result(level_result):
+    if level_result["level"] == 'symbol':
+        nodes = {node["id"]: None for node in level_result["nodes"]}
+    else:
+        nodes = {node["id"]: (node["symbol_count"], node["internal_edges"]) for node in level_result["nodes"]}
+    return nodes, {(edge["source"], edge["target"]): edge["weight"] for edge in level_result["edges"]}
+
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_level_weights(rollup, level):
+    rows = set(rollup.symbols.live_rows())
+    nodes, weights = _brute_force(rollup, lambda row: _aggregate(rollup.symbols, level, row), rows)
+    result_nodes, result_weights = _result(rollup.level(level))
+    assert result_weights == weights
+    if level == 'symbol':
+        nodes = dict.fromkeys(nodes)
+    assert result_nodes == nodes
+    # Every symbol edge is counted once, between or inside aggregates
+    if level != 'symbol':
+        assert sum(weights.values()) + sum(internal for _, internal in nodes.values()) == len(_live_edges(rollup))
+
+
+@pytest.mark.parametrize("level", LEVELS[:-1])
+def test_expand_weights(rollup, level):
+    child_level = LEVELS[LEVELS.index(level) + 1]
+    for node in rollup.level(level)["nodes"]:
+        rows = {row for row in rollup.symbols.live_rows() if _aggregate(rollup.symbols, level, row) == node["id"]}
+
+        def key(row):
+            return _aggregate(rollup.symbols, child_level if row in rows else level, row)
+
+        nodes, weights = _brute_force(rollup, key, rows)
+        result = rollup.expand(node["id"])
+        result_nodes, result_weights = _result(result)
+        assert result["level"] == child_level
+        assert result_weights == weights
+        assert set(result_nodes) == set(nodes)
+        if child_level != 'symbol':
+            assert result_nodes == nodes
+        assert all(child["parent"] == node["id"] for child in result["nodes"])
+
+
+def test_unknown_nodes(rollup):
+    with pytest.raises(ValueError):
+        rollup.level("module")
+    for node_id in ("file:app/api/auth.py", "package:nowhere", "symbol"):
+        with pytest.raises(KeyError):
+            rollup.expand(node_id)
@@ -119,9 +119,9 @@ export default function AnalysisPanel() {
             console.log('📦 Final results:', results)
             setAnalysisResults(results.results)
             
-            // Extract and set graph nodes/edges from dependency_mapper results
+            // Extract and set graph nodes/edges from the dependency_mapper directory-level rollup
             if (results.results?.dependency_mapper) {
-              const { nodes, edges } = transformGraphData(results.results.dependency_mapper)
+              const { nodes, edges } = transformGraphData(results.results.dependency_mapper.rollup)
               console.log(`📈 Setting final graph: ${nodes.length} nodes, ${edges.length} edges`)
               setNodes(nodes)
               setEdges(edges)
@@ -74,7 +74,7 @@ export default function Dashboard() {
                 <span className="text-xs text-slate-400">Nodes</span>
               </div>
               <div className="text-3xl font-bold text-white">
-                {analysisResults.dependency_mapper?.nodes?.length || 0}
+                {analysisResults.dependency_mapper?.node_count ?? analysisResults.dependency_mapper?.nodes?.length ?? 0}
               </div>
             </div>
           </div>